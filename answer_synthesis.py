@@ -0,0 +1,212 @@
+# answer_synthesis.py
+import hashlib
+import logging
+import re
+from typing import TYPE_CHECKING, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
+from chunking import estimate_tokens
+from extractive_summarizer import rank_sentences
+from llm_scheduler import INTERACTIVE
+from metrics import REGISTRY, span
+from question_matcher import CANONICAL_STOPWORDS, POLARITY_TERMS, expand_negations, stem
+
+if TYPE_CHECKING:
+    from pdf_manager import LegalGuideManager
+
+SYNTHESIZED_STATEMENTS = REGISTRY.counter(
+    "synthesized_statements_total", "Statements from section answers, by outcome", ("outcome",)
+)
+
+REDUCE_PROMPT = (
+    "Question: {question}\n\n"
+    "These notes were taken from several sections of a guide to UK crypto law, most relevant first:\n\n"
+    "{notes}\n\n"
+    "Write one clear, concise answer to the question using only these notes. "
+    "Do not repeat points, and keep specific references."
+)
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(*])")
+_MARKUP_RE = re.compile(r"[*_`#>]+")
+_HEADING_RE = re.compile(r"^#{1,6}\s")
+_BULLET_RE = re.compile(r"^\s*(?:[-*+•▪◦]|\d+[.)])\s+")
+MIN_STATEMENT_WORDS = 4
+# Lines like "**1. Key relevant information:**" only introduce the statements below them
+MAX_LABEL_WORDS = 6
+
+# How much each signal adds to a statement's relevance
+COVERAGE_WEIGHT = 2.0
+SUPPORT_WEIGHT = 0.5
+
+
+class Statement:
+    """One sentence of a section answer, with the sections that made the same point"""
+
+    __slots__ = ('text', 'terms', 'section', 'support', 'score')
+
+    def __init__(self, text: str, terms: FrozenSet[str], section: int):
+        self.text = text
+        self.terms = terms
+        self.section = section
+        self.support = 1
+        self.score = 0.0
+
+
+def _terms(text: str) -> FrozenSet[str]:
+    # Negation is kept: "are regulated" and "are not regulated" are different statements
+    return frozenset(
+        stem(word) for word in _WORD_RE.findall(expand_negations(_MARKUP_RE.sub(" ", text)))
+        if word not in CANONICAL_STOPWORDS and len(word) > 1
+    )
+
+
+def split_statements(text: str) -> List[str]:
+    """Sentences of a model answer, markup kept; headings and list labels are dropped"""
+    statements = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or _HEADING_RE.match(line):
+            continue
+        line = _BULLET_RE.sub("", line)
+        if line.rstrip('*_ ').endswith(':') and len(line.split()) <= MAX_LABEL_WORDS:
+            continue
+        for sentence in _SENTENCE_END_RE.split(line):
+            sentence = sentence.strip()
+            if len(sentence.split()) >= MIN_STATEMENT_WORDS:
+                statements.append(sentence)
+    return statements
+
+
+def merge_answers(question: str, answers: List[str], threshold: float = 0.6,
+                  max_chars: int = 3000) -> List[Statement]:
+    """Distinct statements from `answers` (most relevant section first), best first.
+
+    A statement is a duplicate if its content terms hash the same as one already
+    kept, or overlap them by at least `threshold` (Jaccard) with the same polarity
+    words (see question_matcher.POLARITY_WORDS); the first one stays and counts
+    the other as support. Statements are scored by how much of the
+    question they cover, how many sections made them and their TextRank centrality,
+    and taken best first until `max_chars`.
+    """
+    kept: List[Statement] = []
+    seen = {}
+    duplicates = 0
+    for section, answer in enumerate(answers):
+        for text in split_statements(answer):
+            terms = _terms(text)
+            if not terms:
+                continue
+            digest = hashlib.sha1(" ".join(sorted(terms)).encode()).digest()
+            polarity = terms & POLARITY_TERMS
+            match = seen.get(digest) or next(
+                (statement for statement in kept
+                 if statement.terms & POLARITY_TERMS == polarity
+                 and len(terms & statement.terms) >= threshold * len(terms | statement.terms)),
+                None
+            )
+            if match is not None:
+                if match.section != section:
+                    match.support += 1
+                duplicates += 1
+                continue
+            statement = Statement(text, terms, section)
+            seen[digest] = statement
+            kept.append(statement)
+    SYNTHESIZED_STATEMENTS.inc(duplicates, outcome='duplicate')
+    if not kept:
+        return []
+
+    question_terms = _terms(question)
+    centrality = rank_sentences([statement.text for statement in kept])
+    centrality = centrality / centrality.max()
+    for statement, central in zip(kept, centrality):
+        coverage = len(statement.terms & question_terms) / len(question_terms) if question_terms else 0.0
+        statement.score = COVERAGE_WEIGHT * coverage + SUPPORT_WEIGHT * (statement.support - 1) + float(central)
+
+    chosen, length = [], 0
+    # Stable, so equal scores keep the sections' relevance order
+    for index in np.argsort([-statement.score for statement in kept], kind="stable"):
+        statement = kept[index]
+        if chosen and length + len(statement.text) > max_chars:
+            continue
+        chosen.append(statement)
+        length += len(statement.text) + 3
+    SYNTHESIZED_STATEMENTS.inc(len(chosen), outcome='kept')
+    SYNTHESIZED_STATEMENTS.inc(len(kept) - len(chosen), outcome='dropped')
+    return chosen
+
+
+class LocalSynthesizer:
+    """Merges section answers into one: deduplicated statements, most relevant first, no model call"""
+
+    name = "local"
+
+    def __init__(self, threshold: float = 0.6, max_chars: int = 3000):
+        self.threshold = threshold
+        self.max_chars = max_chars
+        self.stats = {'answers': 0, 'sections': 0, 'statements': 0}
+
+    async def synthesize(self, guide: "LegalGuideManager", question: str, sections: List[Tuple[str, str]],
+                         user_id: Optional[int] = None, priority: int = INTERACTIVE) -> str:
+        """One answer from (section label, answer) pairs, ordered most relevant first"""
+        with span('synthesis', synthesizer=self.name):
+            statements = merge_answers(question, [answer for _, answer in sections], self.threshold,
+                                       self.max_chars)
+            self.stats['answers'] += 1
+            self.stats['sections'] += len(sections)
+            self.stats['statements'] += len(statements)
+            if not statements:
+                return "\n\n".join(answer for _, answer in sections)
+            body = await self.reduce(guide, question, statements, user_id, priority)
+        used = sorted({statement.section for statement in statements})
+        return body + "\n\n_Sources: " + "; ".join(sections[section][0] for section in used) + "_"
+
+    async def reduce(self, guide: "LegalGuideManager", question: str, statements: List[Statement],
+                     user_id: Optional[int], priority: int) -> str:
+        return "\n".join(f"• {statement.text}" for statement in statements)
+
+
+class ModelSynthesizer(LocalSynthesizer):
+    """Has the answer model rewrite the merged statements as one answer.
+
+    Only the deduplicated statements are sent, not the sections, so the call is
+    small. A failed call falls back to the local merge.
+    """
+
+    name = "model"
+
+    def __init__(self, threshold: float = 0.6, max_chars: int = 3000):
+        super().__init__(threshold, max_chars)
+        self.stats.update(calls=0, failures=0)
+
+    async def reduce(self, guide: "LegalGuideManager", question: str, statements: List[Statement],
+                     user_id: Optional[int], priority: int) -> str:
+        merged = await super().reduce(guide, question, statements, user_id, priority)
+        prompt = REDUCE_PROMPT.format(question=question, notes=merged)
+        try:
+            # A rewrite is about as long as its notes
+            async with guide.scheduler.slot('gemini', user_id, priority, estimate_tokens(prompt) * 2):
+                self.stats['calls'] += 1
+                with span('model_call', chunk='all', mode='reduce'):
+                    response = await guide.model.start_chat().send_message_async(prompt)
+            text = response.text.strip() if response else ""
+            if not text:
+                raise ValueError("empty response")
+        except Exception as e:
+            self.stats['failures'] += 1
+            logging.warning(f"Reduce call failed, sending the merged statements: {str(e)}")
+            return merged
+        return text
+
+
+def get_synthesizer(name: str, threshold: float = 0.6, max_chars: int = 3000) -> Optional[LocalSynthesizer]:
+    """Synthesizer for the SYNTHESIS setting; None when each section is sent on its own"""
+    if name == 'off':
+        return None
+    if name == LocalSynthesizer.name:
+        return LocalSynthesizer(threshold, max_chars)
+    if name == ModelSynthesizer.name:
+        return ModelSynthesizer(threshold, max_chars)
+    raise ValueError(f"Unknown synthesis mode: {name}")
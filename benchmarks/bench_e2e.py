@@ -0,0 +1,259 @@
+# benchmarks/bench_e2e.py
+"""End-to-end benchmark of the bot against in-process fake backends.
+
+    python benchmarks/bench_e2e.py --chats 20 --questions 5
+    python benchmarks/bench_e2e.py --replay data/interactions.jsonl --chats 50
+    python benchmarks/bench_e2e.py --gemini-latency 4 --gemini-errors 0.05 --pacing real
+
+Each simulated chat asks its questions in turn through
+LexCommunisBot.process_question. It then presses TL;DR for a fraction of the
+answers and sends /rate or /feedback for another fraction. Gemini, OpenAI and
+Telegram are replaced by the fakes in benchmarks/fakes.py, each with its own
+latency and error rate.
+
+The report covers:
+- p50/p95/p99 latency per operation, and time to the first section (or merged answer) message;
+- question throughput;
+- hit rates for the response, TL;DR and answer caches;
+- Gemini calls per question (compare --screening modes for the calls avoided);
+- Telegram sends per question (compare --synthesis modes, which send one merged answer).
+
+--metrics also prints what /metrics would serve, including per-stage latency histograms.
+
+The guide's chunk artifacts are built once in --cache-dir. Response caches there
+are cleared before each run unless --warm is given.
+"""
+import argparse
+import asyncio
+import glob
+import gzip
+import json
+import logging
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fakes import (  # noqa: E402
+    FakeBot, FakeChatClient, FakeGenerativeModel, Latency, callback_update, context, question_update
+)
+
+DEFAULT_QUESTIONS = [
+    "What is a DAO and how is it regulated in the UK?",
+    "what's a DAO",
+    "Do I need FCA authorisation to issue a governance token?",
+    "How do the financial promotion rules apply to crypto marketing?",
+    "Are NFTs treated as securities?",
+    "What are the tax implications of staking rewards?",
+    "Is a stablecoin issuer regulated as an e-money institution?",
+    "How should a DAO limit the liability of its members?",
+    "What AML registration does a crypto exchange need?",
+    "Can I airdrop tokens to UK users?",
+]
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))] if ordered else 0.0
+
+
+def load_replay(paths: List[str]) -> List[Tuple[int, str]]:
+    """(user_id, question) for every logged question, oldest first"""
+    questions = []
+    for path in paths:
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get('message_type') == 'question' and record.get('content'):
+                    questions.append((record['timestamp'], record.get('user_id') or 0, record['content']))
+    questions.sort()
+    return [(user_id, question) for _, user_id, question in questions]
+
+
+class Run:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.question_started: Dict[int, float] = {}
+        self.errors = 0
+
+    def on_send(self, chat_id: int, text: str) -> None:
+        started = self.question_started.get(chat_id)
+        if started is not None and text.startswith(("📍", "💡")):
+            self.latencies['first_section'].append(time.perf_counter() - started)
+            del self.question_started[chat_id]
+        if text.startswith("I apologize"):
+            self.errors += 1
+
+    async def timed(self, name: str, call) -> None:
+        started = time.perf_counter()
+        await call
+        self.latencies[name].append(time.perf_counter() - started)
+
+
+async def simulate_chat(bot, fake_bot: FakeBot, run: Run, chat_id: int, user_id: int,
+                        questions: List[str], args) -> None:
+    for question in questions:
+        update = question_update(fake_bot, chat_id, user_id, question)
+        run.question_started[chat_id] = time.perf_counter()
+        await run.timed('question', bot.process_question(update, context(fake_bot), question))
+        run.question_started.pop(chat_id, None)
+        message_id = update.message.message_id
+
+        if random.random() < args.tldr_rate:
+            tldr = callback_update(fake_bot, chat_id, user_id, f"tldr_{message_id}")
+            await run.timed('tldr', bot.handle_tldr(tldr, context(fake_bot)))
+        if random.random() < args.feedback_rate:
+            if random.random() < 0.5:
+                rate = question_update(fake_bot, chat_id, user_id, f"/rate {message_id} 8")
+                await run.timed('feedback', bot.handle_rate_command(
+                    rate, context(fake_bot, [str(message_id), str(random.randint(1, 10))])))
+            else:
+                comment = question_update(fake_bot, chat_id, user_id, f"/feedback {message_id} Helpful")
+                await run.timed('feedback', bot.handle_feedback_command(
+                    comment, context(fake_bot, [str(message_id), "Very", "helpful"])))
+        if args.think_time:
+            await asyncio.sleep(random.uniform(0, 2 * args.think_time))
+
+
+def clear_response_caches(cache_dir: str) -> None:
+    for name in ('response_cache.db', 'tldr_cache.db', 'answers.db', 'payloads.db', 'questions.db'):
+        for path in glob.glob(os.path.join(cache_dir, name + '*')):
+            os.remove(path)
+
+
+def hit_rate(stats: Dict[str, int]) -> str:
+    lookups = stats['hits'] + stats['misses']
+    return f"{stats['hits'] / lookups:6.1%} of {lookups}" if lookups else "   n/a"
+
+
+async def main_async(args) -> None:
+    from bot import LexCommunisBot
+    from telegram_outbox import TelegramOutbox
+
+    logging.getLogger().setLevel(args.log_level)
+    if not args.warm:
+        clear_response_caches(args.cache_dir)
+
+    run = Run()
+    model = FakeGenerativeModel(Latency(args.gemini_latency, args.sigma, args.gemini_errors))
+    openai_client = FakeChatClient(Latency(args.openai_latency, args.sigma, args.openai_errors))
+    fake_bot = FakeBot(Latency(args.telegram_latency, args.sigma, args.telegram_errors), on_send=run.on_send)
+    if args.pacing == 'real':
+        outbox = TelegramOutbox()
+    else:
+        outbox = TelegramOutbox(global_rate=1e6, chat_interval=0, group_interval=0)
+
+    screening_model = FakeGenerativeModel(Latency(args.screening_latency, args.sigma),
+                                          reply=lambda: str(random.randint(0, 10)))
+
+    setup_started = time.perf_counter()
+    bot = LexCommunisBot(model=model, openai_client=openai_client, outbox=outbox,
+                         cache_dir=args.cache_dir, storage_dir=os.path.join(args.cache_dir, 'data'),
+                         screening=args.screening, screening_model=screening_model, synthesis=args.synthesis)
+    await bot.guide_manager.ready()
+    print(f"Bot ready in {time.perf_counter() - setup_started:.2f}s "
+          f"({len(bot.guide_manager.pdf_chunks)} chunks)")
+
+    if args.replay:
+        by_user: Dict[int, List[str]] = defaultdict(list)
+        for user_id, question in load_replay(args.replay):
+            by_user[user_id].append(question)
+        sessions = list(by_user.items())
+        print(f"Replaying {sum(len(q) for _, q in sessions)} questions from {len(sessions)} users")
+    else:
+        sessions = [(1000 + i, [random.choice(DEFAULT_QUESTIONS) for _ in range(args.questions)])
+                    for i in range(args.chats)]
+
+    semaphore = asyncio.Semaphore(args.chats)
+
+    async def session(index: int, user_id: int, questions: List[str]) -> None:
+        async with semaphore:
+            await simulate_chat(bot, fake_bot, run, 10_000 + index, user_id, questions, args)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(session(i, user_id, questions) for i, (user_id, questions) in enumerate(sessions)))
+    elapsed = time.perf_counter() - started
+    await bot.shutdown(None)
+
+    report(run, bot, model, openai_client, fake_bot, elapsed)
+    if bot.guide_manager.screener:
+        print(f"  screening       {args.screening}: {bot.guide_manager.screener.stats}, "
+              f"{screening_model.stats['calls']} screening model calls")
+    if bot.guide_manager.synthesizer:
+        print(f"  synthesis       {args.synthesis}: {bot.guide_manager.synthesizer.stats}")
+    if args.metrics:
+        from metrics import REGISTRY
+        print("\n" + REGISTRY.render())
+
+
+def report(run: Run, bot, model: FakeGenerativeModel, openai_client: FakeChatClient,
+           fake_bot: FakeBot, elapsed: float) -> None:
+    questions = len(run.latencies['question'])
+    print(f"\n{questions} questions in {elapsed:.2f}s: {questions / elapsed:.2f} questions/s, "
+          f"{run.errors} answered with an error")
+    print(f"{'operation':<15}{'n':>6}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    for name in ('question', 'first_section', 'tldr', 'feedback'):
+        samples = run.latencies.get(name, [])
+        if samples:
+            print(f"{name:<15}{len(samples):>6}" + "".join(
+                f"{percentile(samples, q) * 1000:>8.0f}ms" for q in (0.5, 0.95, 0.99, 1.0)))
+
+    guide = bot.guide_manager
+    print("\nCache hit rates")
+    print(f"  responses       {hit_rate(guide.cache.stats)}")
+    print(f"  tl;dr           {hit_rate(bot.tldr_handler.cache.stats)}")
+    print(f"  answer store    {hit_rate(bot.answer_store.stats)}")
+    print(f"  payloads        {hit_rate(bot.payload_cache.stats)}")
+    print("\nBackend calls")
+    print(f"  gemini          {model.stats['calls']} calls ({model.stats['calls'] / max(questions, 1):.2f}/question), "
+          f"{model.stats['errors']} failed, {guide.inflight.stats['coalesced']} coalesced")
+    print(f"  openai          {openai_client.stats['requests']} calls, {openai_client.stats['failures']} failed; "
+          f"tl;dr {bot.tldr_handler.stats}")
+    print(f"  telegram        {fake_bot.stats}")
+    print(f"  scheduler       {bot.scheduler.metrics()}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--chats', type=int, default=10, help="concurrent simulated chats")
+    parser.add_argument('--questions', type=int, default=3, help="questions per chat (ignored with --replay)")
+    parser.add_argument('--replay', nargs='+', help="interactions.jsonl[.gz] files to take questions from")
+    parser.add_argument('--tldr-rate', type=float, default=0.5)
+    parser.add_argument('--feedback-rate', type=float, default=0.2)
+    parser.add_argument('--think-time', type=float, default=0.0, help="mean pause between questions, seconds")
+    parser.add_argument('--gemini-latency', type=float, default=2.0)
+    parser.add_argument('--gemini-errors', type=float, default=0.0)
+    parser.add_argument('--openai-latency', type=float, default=1.0)
+    parser.add_argument('--openai-errors', type=float, default=0.0)
+    parser.add_argument('--screening', choices=('off', 'keyword', 'model'), default='off',
+                        help="relevance screening before the answer model")
+    parser.add_argument('--screening-latency', type=float, default=0.4,
+                        help="fake screening model; it rates chunks at random")
+    parser.add_argument('--synthesis', choices=('off', 'local', 'model'), default='off',
+                        help="merge section answers into one message")
+    parser.add_argument('--telegram-latency', type=float, default=0.05)
+    parser.add_argument('--telegram-errors', type=float, default=0.0, help="fraction of calls hit by RetryAfter")
+    parser.add_argument('--sigma', type=float, default=0.5, help="log-normal spread of every latency")
+    parser.add_argument('--pacing', choices=('off', 'real'), default='off',
+                        help="'real' keeps the outbox's Telegram rate limits")
+    parser.add_argument('--cache-dir', default=os.path.join('.cache', 'bench'))
+    parser.add_argument('--warm', action='store_true', help="keep response caches from earlier runs")
+    parser.add_argument('--metrics', action='store_true', help="print the /metrics exposition afterwards")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--log-level', default='WARNING')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    asyncio.run(main_async(args))
+
+
+if __name__ == '__main__':
+    main()
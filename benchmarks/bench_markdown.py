@@ -0,0 +1,69 @@
+# benchmarks/bench_markdown.py
+"""Throughput of the MarkdownV2 renderer on large model outputs.
+
+    python benchmarks/bench_markdown.py [--sizes 10 100 1000] [--repeat 20]
+
+Compares telegram_markdown.render_messages (render, escape and split into
+4096-character messages) with the old per-line count/replace sanitiser that it
+replaced, which produced legacy Markdown and could not split.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram_markdown import render_messages  # noqa: E402
+
+SAMPLE = """## Token classification
+**Key point:** a governance token that gives rights to profits may be a *specified investment* (see PERG 2.6).
+- Check the token's rights against the RAO before launch; snake_case_names and 2 * 3 stay literal.
+- Financial promotions to UK consumers must be approved by an authorised person [FCA](https://www.fca.org.uk/).
+1. Map the rights.
+2. Take advice on `s.21 FSMA` exemptions!
+An unbalanced *marker appears here and an _underscore too.
+
+"""
+
+
+def legacy_sanitize(text: str) -> str:
+    """The pre-renderer cleanup from LegalGuideManager._sanitize_response"""
+    text = text.replace('```', '')
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line:
+            if line.count('*') % 2 != 0:
+                line = line.replace('*', '')
+            if line.count('_') % 2 != 0:
+                line = line.replace('_', '')
+            lines.append(line)
+    return '\n\n'.join(lines)
+
+
+def bench(label: str, function, text: str, repeat: int) -> None:
+    function(text)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = function(text)
+    elapsed = (time.perf_counter() - started) / repeat
+    parts = len(result) if isinstance(result, list) else 1
+    print(f"{label:<10} {len(text) / 1024:9.1f} KiB  {elapsed * 1000:9.2f} ms  "
+          f"{len(text) / elapsed / 1024 / 1024:7.1f} MiB/s  messages={parts}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000], help="sample repetitions")
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        text = SAMPLE * size
+        bench("render", render_messages, text, args.repeat)
+        bench("legacy", legacy_sanitize, text, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+# benchmarks/bench_tldr.py
+"""TL;DR latency: local extractive summarizer vs the remote OpenAI path.
+
+    python benchmarks/bench_tldr.py                 # local engine only
+    python benchmarks/bench_tldr.py --remote 5      # plus 5 OpenAI calls (needs OPENAI_API_KEY)
+
+Inputs are combined answers shaped like process_question output, at several sizes.
+The remote path goes through TLDRHandler with the latency budget disabled and a
+fresh cache directory, so every call is a real round-trip.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extractive_summarizer import summarize  # noqa: E402
+
+SAMPLE_SECTION = """📍 *Key points*
+- A DAO that issues governance tokens may be carrying on a regulated activity if those tokens are specified investments.
+- Founders should check whether the token gives rights to profits, which can make it a security token under the FCA perimeter guidance.
+- The financial promotion regime applies to cryptoasset promotions communicated to UK consumers, including social media posts.
+*Next steps*
+1. Map each token right against the Regulated Activities Order before launch.
+2. Take legal advice on whether an authorised person needs to approve promotions.
+3. Keep records of the analysis, since the FCA expects firms to evidence their conclusions.
+Unincorporated DAOs may be treated as general partnerships, which exposes members to unlimited liability.
+Wrapping the DAO in a company limited by guarantee is one common way to limit that exposure.
+"""
+
+
+def make_answer(sections: int) -> str:
+    return "\n\n".join(SAMPLE_SECTION.replace("Key points", f"Key points {i}") for i in range(sections))
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def report(label: str, samples) -> None:
+    print(f"{label:<28} n={len(samples):<4} p50={percentile(samples, 0.5) * 1000:9.2f}ms "
+          f"p95={percentile(samples, 0.95) * 1000:9.2f}ms mean={statistics.mean(samples) * 1000:9.2f}ms")
+
+
+def bench_local(sections: int, repeat: int) -> None:
+    answer = make_answer(sections)
+    summarize(answer)  # warm up imports and numpy
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        summarize(answer)
+        samples.append(time.perf_counter() - started)
+    report(f"local {len(answer):>6} chars", samples)
+
+
+async def bench_remote(sections: int, repeat: int) -> None:
+    from tldr_handler import TLDRHandler
+
+    answer = make_answer(sections)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        handler = TLDRHandler(cache_dir=cache_dir, engine='remote', latency_budget=0, speculative=False)
+        samples = []
+        for i in range(repeat):
+            started = time.perf_counter()
+            await handler.generate_tldr(answer + f"\n(run {i})")
+            samples.append(time.perf_counter() - started)
+        await handler.close()
+    report(f"remote {len(answer):>6} chars", samples)
+    if handler.stats['local_after_error']:
+        print(f"  {handler.stats['local_after_error']} remote calls failed and fell back to local")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 4, 12, 30], help="sections per answer")
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--remote', type=int, default=0, help="remote calls per size (0 skips the remote path)")
+    args = parser.parse_args()
+
+    for sections in args.sizes:
+        bench_local(sections, args.repeat)
+    if args.remote:
+        for sections in args.sizes:
+            asyncio.run(bench_remote(sections, args.remote))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+# benchmarks/bench_webhook.py
+"""Load test for webhook mode: POST synthetic Telegram updates and time the acks.
+
+    python benchmarks/bench_webhook.py --updates 2000 --rate 200
+    python benchmarks/bench_webhook.py --url https://bot.example.run.app/telegram --secret $WEBHOOK_SECRET
+
+With no --url, the script starts webhook_server.create_app in-process on a free
+port, in front of a LexCommunisBot wired to the fakes in benchmarks/fakes.py. A
+question is answered in a task, as Application would, so the HTTP server and the
+bot share one event loop just as they do in production. Against a real
+deployment, use chat ids the bot may safely message, or a staging token.
+
+Updates are sent open-loop at --rate per second. Most are questions and the
+rest are TL;DR button presses; --bad-secret-rate of them carry a wrong secret
+token and should be refused with 403. The report covers:
+- ack latency percentiles and status codes;
+- in-process runs: how long each question took to be answered.
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import os
+import random
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, List
+
+import aiohttp
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_e2e import DEFAULT_QUESTIONS, clear_response_caches, percentile  # noqa: E402
+from fakes import (  # noqa: E402
+    FakeBot, FakeChatClient, FakeGenerativeModel, Latency, callback_update, context, question_update
+)
+
+_update_ids = itertools.count(1)
+_message_ids = itertools.count(1)
+
+
+def synthetic_update(chat_id: int, tldr_rate: float) -> Dict[str, Any]:
+    """A private-chat message or TL;DR button press, shaped like Telegram's JSON"""
+    user = {'id': chat_id, 'is_bot': False, 'first_name': 'Load', 'username': f'load{chat_id}'}
+    chat = {'id': chat_id, 'type': 'private', 'first_name': 'Load'}
+    message = {'message_id': next(_message_ids), 'date': int(time.time()), 'chat': chat, 'from': user}
+    if random.random() < tldr_rate:
+        return {'update_id': next(_update_ids), 'callback_query': {
+            'id': str(next(_update_ids)), 'from': user, 'chat_instance': str(chat_id),
+            'data': f"tldr_{message['message_id']}", 'message': dict(message, text='✅ Analysis Complete'),
+        }}
+    return {'update_id': next(_update_ids), 'message': dict(message, text=random.choice(DEFAULT_QUESTIONS))}
+
+
+class LocalTarget:
+    """The webhook app on a local port, dispatching to a bot with fake backends"""
+
+    def __init__(self, args):
+        self.args = args
+        self.tasks: List[asyncio.Task] = []
+        self.answered: List[float] = []
+
+    async def start(self) -> str:
+        from bot import LexCommunisBot
+        from telegram_outbox import TelegramOutbox
+        from webhook_server import create_app
+
+        args = self.args
+        logging.getLogger().setLevel(logging.WARNING)
+        clear_response_caches(args.cache_dir)
+        self.fake_bot = FakeBot(Latency(args.telegram_latency))
+        self.bot = LexCommunisBot(
+            model=FakeGenerativeModel(Latency(args.gemini_latency)),
+            openai_client=FakeChatClient(Latency(args.openai_latency)),
+            outbox=TelegramOutbox(global_rate=1e6, chat_interval=0, group_interval=0),
+            cache_dir=args.cache_dir, storage_dir=os.path.join(args.cache_dir, 'data')
+        )
+        await self.bot.guide_manager.ready()
+        self.runner = web.AppRunner(create_app(self.bot, self.submit, args.secret), access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        return f"http://127.0.0.1:{port}/telegram"
+
+    async def submit(self, payload: Dict[str, Any]) -> None:
+        self.tasks.append(asyncio.create_task(self.handle(payload)))
+
+    async def handle(self, payload: Dict[str, Any]) -> None:
+        started = time.perf_counter()
+        if 'message' in payload:
+            message = payload['message']
+            update = question_update(self.fake_bot, message['chat']['id'], message['from']['id'], message['text'])
+            await self.bot.process_question(update, context(self.fake_bot), message['text'])
+            self.answered.append(time.perf_counter() - started)
+        else:
+            query = payload['callback_query']
+            update = callback_update(self.fake_bot, query['message']['chat']['id'], query['from']['id'], query['data'])
+            await self.bot.handle_tldr(update, context(self.fake_bot))
+
+    async def stop(self) -> None:
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        await self.runner.cleanup()
+        await self.bot.shutdown(None)
+
+
+async def post(session: aiohttp.ClientSession, url: str, payload: Dict[str, Any], secret: str,
+               latencies: List[float], statuses: Counter) -> None:
+    started = time.perf_counter()
+    try:
+        async with session.post(url, json=payload,
+                                headers={'X-Telegram-Bot-Api-Secret-Token': secret}) as response:
+            await response.read()
+            statuses[response.status] += 1
+    except aiohttp.ClientError as e:
+        statuses[type(e).__name__] += 1
+        return
+    latencies.append(time.perf_counter() - started)
+
+
+async def main_async(args) -> None:
+    local = None
+    url = args.url
+    if not url:
+        local = LocalTarget(args)
+        url = await local.start()
+    print(f"Posting {args.updates} updates to {url} at {args.rate}/s")
+
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    chats = [100_000 + i for i in range(args.chats)]
+    connector = aiohttp.TCPConnector(limit=args.connections)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        requests = []
+        started = time.perf_counter()
+        for i in range(args.updates):
+            # Open loop: keep the schedule even if the server falls behind
+            delay = started + i / args.rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            secret = args.secret if random.random() >= args.bad_secret_rate else 'wrong-secret'
+            payload = synthetic_update(random.choice(chats), args.tldr_rate)
+            requests.append(asyncio.create_task(post(session, url, payload, secret, latencies, statuses)))
+        await asyncio.gather(*requests)
+        elapsed = time.perf_counter() - started
+
+    print(f"\n{len(latencies)} acks in {elapsed:.2f}s ({len(latencies) / elapsed:.1f}/s); "
+          f"status codes {dict(statuses)}")
+    print(f"{'':<12}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    print(f"{'ack':<12}" + "".join(f"{percentile(latencies, q) * 1000:>8.1f}ms" for q in (0.5, 0.95, 0.99, 1.0)))
+    if local:
+        await local.stop()
+        answered = local.answered
+        print(f"{'answered':<12}" + "".join(
+            f"{percentile(answered, q) * 1000:>8.0f}ms" for q in (0.5, 0.95, 0.99, 1.0)) + f"  ({len(answered)})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help="webhook URL of a running deployment (default: in-process)")
+    parser.add_argument('--secret', default='bench-secret')
+    parser.add_argument('--updates', type=int, default=500)
+    parser.add_argument('--rate', type=float, default=100.0, help="updates per second")
+    parser.add_argument('--chats', type=int, default=50)
+    parser.add_argument('--connections', type=int, default=40, help="like setWebhook's max_connections")
+    parser.add_argument('--tldr-rate', type=float, default=0.2)
+    parser.add_argument('--bad-secret-rate', type=float, default=0.01)
+    parser.add_argument('--gemini-latency', type=float, default=2.0)
+    parser.add_argument('--openai-latency', type=float, default=1.0)
+    parser.add_argument('--telegram-latency', type=float, default=0.05)
+    parser.add_argument('--cache-dir', default=os.path.join('.cache', 'bench'))
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    asyncio.run(main_async(args))
+
+
+if __name__ == '__main__':
+    main()
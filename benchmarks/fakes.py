@@ -0,0 +1,195 @@
+# benchmarks/fakes.py
+"""In-process stand-ins for Vertex AI, OpenAI and Telegram used by the benchmarks.
+
+Each fake sleeps for a log-normally distributed latency (median `latency`, spread
+`sigma`) and fails a fraction `error_rate` of calls, so tail behaviour and error
+handling show up in the numbers. They implement only the surface the bot uses.
+"""
+import asyncio
+import itertools
+import random
+from datetime import timedelta
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+from telegram.error import BadRequest, RetryAfter
+
+from telegram_markdown import MESSAGE_LIMIT, utf16_len
+
+ANSWER_PARAGRAPHS = (
+    "**Summary:** the guide treats governance tokens that carry profit rights as potential "
+    "*specified investments*, so issuing them can be a regulated activity (see Chapter 3).",
+    "- Map each token right against the Regulated Activities Order before launch.\n"
+    "- Financial promotions to UK consumers need approval by an authorised person.\n"
+    "- Keep a written record of the analysis; the FCA expects firms to evidence it.",
+    "_Next steps:_ speak to a UK-qualified lawyer about the perimeter guidance and the "
+    "s.21 FSMA exemptions before marketing the token.",
+)
+
+
+class Latency:
+    def __init__(self, latency: float = 0.5, sigma: float = 0.5, error_rate: float = 0.0):
+        self.latency = latency
+        self.sigma = sigma
+        self.error_rate = error_rate
+
+    def sample(self) -> float:
+        return self.latency * random.lognormvariate(0, self.sigma) if self.latency > 0 else 0.0
+
+    def fails(self) -> bool:
+        return random.random() < self.error_rate
+
+
+class FakeGenerativeModel:
+    """Replaces vertexai GenerativeModel: start_chat().send_message_async(content, stream=...)"""
+
+    def __init__(self, latency: Latency, answer_paragraphs: int = 3, reply: Optional[Callable[[], str]] = None):
+        """`reply` replaces the canned legal answer, e.g. with a random rating for a screening model"""
+        self.latency = latency
+        self.answer = "\n\n".join(ANSWER_PARAGRAPHS[i % len(ANSWER_PARAGRAPHS)] for i in range(answer_paragraphs))
+        self.reply = reply
+        self.stats = {'calls': 0, 'errors': 0}
+
+    def start_chat(self) -> "FakeGenerativeModel._Chat":
+        return self._Chat(self)
+
+    class _Chat:
+        def __init__(self, model: "FakeGenerativeModel"):
+            self.model = model
+
+        async def send_message_async(self, content: Any, stream: bool = False):
+            model = self.model
+            model.stats['calls'] += 1
+            delay = model.latency.sample()
+            failed = model.latency.fails()
+            if not stream:
+                await asyncio.sleep(delay)
+                if failed:
+                    model.stats['errors'] += 1
+                    raise RuntimeError("injected Gemini failure")
+                return SimpleNamespace(text=model.reply() if model.reply else model.answer)
+            return self._stream(delay, failed)
+
+        async def _stream(self, delay: float, failed: bool):
+            model = self.model
+            words = model.answer.split(" ")
+            pieces = [" ".join(words[i:i + 8]) + " " for i in range(0, len(words), 8)]
+            # First token after a fifth of the latency, the rest spread over the remainder
+            await asyncio.sleep(delay * 0.2)
+            for piece in pieces:
+                if failed:
+                    model.stats['errors'] += 1
+                    raise RuntimeError("injected Gemini stream failure")
+                yield SimpleNamespace(text=piece)
+                await asyncio.sleep(delay * 0.8 / len(pieces))
+
+
+class FakeChatClient:
+    """Replaces openai_client.ChatClient"""
+
+    def __init__(self, latency: Latency):
+        self.latency = latency
+        self.stats = {'requests': 0, 'failures': 0}
+
+    async def complete(self, model: str, messages: List[Dict[str, str]], **kwargs) -> Any:
+        self.stats['requests'] += 1
+        await asyncio.sleep(self.latency.sample())
+        if self.latency.fails():
+            self.stats['failures'] += 1
+            raise RuntimeError("injected OpenAI failure")
+        content = "Governance tokens with profit rights may be regulated; check the RAO and promotion rules."
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    def metrics(self) -> Dict[str, int]:
+        return dict(self.stats)
+
+    async def close(self) -> None:
+        pass
+
+
+class FakeMessage:
+    def __init__(self, bot: "FakeBot", chat_id: int, message_id: int, text: str = ""):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.text = text
+
+    async def reply_text(self, text: str, **kwargs) -> "FakeMessage":
+        return await self.bot.send_message(chat_id=self.chat_id, text=text, **kwargs)
+
+    async def edit_text(self, text: str, **kwargs) -> "FakeMessage":
+        await self.bot.call(self.chat_id, text)
+        self.bot.stats['edits'] += 1
+        self.text = text
+        return self
+
+    async def delete(self) -> bool:
+        await self.bot.call(self.chat_id)
+        self.bot.stats['deletes'] += 1
+        return True
+
+
+class FakeBot:
+    """Replaces telegram.Bot for sends, and hands out messages that edit/delete through it.
+
+    Texts over Telegram's length limit raise BadRequest like the real API, and a
+    fraction `error_rate` of calls raise RetryAfter to exercise flood handling.
+    `on_send(chat_id, text)` is called for every delivered message.
+    """
+
+    def __init__(self, latency: Latency, on_send: Optional[Callable[[int, str], None]] = None):
+        self.latency = latency
+        self.on_send = on_send
+        self.message_ids = itertools.count(1_000_000)
+        self.stats = {'sent': 0, 'edits': 0, 'deletes': 0, 'retry_after': 0, 'too_long': 0}
+
+    async def call(self, chat_id: int, text: Optional[str] = None) -> None:
+        await asyncio.sleep(self.latency.sample())
+        if self.latency.fails():
+            self.stats['retry_after'] += 1
+            raise RetryAfter(timedelta(seconds=0.05))
+        if text is not None and utf16_len(text) > MESSAGE_LIMIT:
+            self.stats['too_long'] += 1
+            raise BadRequest("Message is too long")
+
+    async def send_message(self, chat_id: int, text: str, **kwargs) -> FakeMessage:
+        await self.call(chat_id, text)
+        self.stats['sent'] += 1
+        if self.on_send:
+            self.on_send(chat_id, text)
+        return FakeMessage(self, chat_id, next(self.message_ids), text)
+
+    def incoming(self, chat_id: int, text: str = "") -> FakeMessage:
+        """A message from the user, as it would arrive in an Update"""
+        return FakeMessage(self, chat_id, next(self.message_ids), text)
+
+
+class _CallbackQuery:
+    def __init__(self, data: str, message: FakeMessage):
+        self.data = data
+        self.message = message
+
+    async def answer(self) -> None:
+        pass
+
+
+def question_update(bot: FakeBot, chat_id: int, user_id: int, text: str) -> SimpleNamespace:
+    return SimpleNamespace(
+        effective_chat=SimpleNamespace(id=chat_id),
+        effective_user=SimpleNamespace(id=user_id, username=f"user{user_id}"),
+        message=bot.incoming(chat_id, text),
+        callback_query=None,
+    )
+
+
+def callback_update(bot: FakeBot, chat_id: int, user_id: int, data: str) -> SimpleNamespace:
+    return SimpleNamespace(
+        effective_chat=SimpleNamespace(id=chat_id),
+        effective_user=SimpleNamespace(id=user_id, username=f"user{user_id}"),
+        message=None,
+        callback_query=_CallbackQuery(data, bot.incoming(chat_id)),
+    )
+
+
+def context(bot: FakeBot, args: Optional[List[str]] = None) -> SimpleNamespace:
+    return SimpleNamespace(bot=bot, args=args or [])
@@ -0,0 +1,110 @@
+# benchmarks/openai_stub.py
+"""Local stand-in for the OpenAI chat completions endpoint.
+
+    python benchmarks/openai_stub.py --port 8099 --latency 0.3 --jitter 0.5 --error-rate 0.1
+    OPENAI_BASE_URL=http://127.0.0.1:8099/v1 OPENAI_API_KEY=stub python bot.py
+
+Responds to POST /v1/chat/completions with a canned completion after a random
+delay. A fraction of requests fails with 500 (or 429 with --throttle), so the
+client's retries, budget and hedging can be exercised without the real API.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+
+
+class StubSettings:
+    def __init__(self, latency: float = 0.2, jitter: float = 0.0, error_rate: float = 0.0,
+                 throttle: bool = False, reply: str = "Stub summary of the answer."):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle = throttle
+        self.reply = reply
+        self.requests = 0
+        self.lock = threading.Lock()
+
+
+def completion(model: str, text: str) -> dict:
+    return {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": text},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+
+def make_handler(settings: StubSettings):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, so connection pooling is visible
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            with settings.lock:
+                settings.requests += 1
+            time.sleep(settings.latency + random.uniform(0, settings.jitter))
+            if random.random() < settings.error_rate:
+                if settings.throttle:
+                    self._send(429, {"error": {"message": "stub rate limit", "type": "rate_limit"}},
+                               headers=(("retry-after", "0.1"),))
+                else:
+                    self._send(500, {"error": {"message": "stub failure", "type": "server_error"}})
+                return
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send(404, {"error": {"message": f"unknown path {self.path}"}})
+                return
+            self._send(200, completion(body.get("model", "stub"), settings.reply))
+
+        def _send(self, status: int, payload: dict, headers: Tuple[Tuple[str, str], ...] = ()) -> None:
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_stub(port: int = 0, settings: Optional[StubSettings] = None) -> Tuple[ThreadingHTTPServer, str]:
+    """Serve in a daemon thread; returns the server and its base URL"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(settings or StubSettings()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle", action="store_true", help="fail with 429 instead of 500")
+    args = parser.parse_args()
+
+    server, url = start_stub(args.port, StubSettings(args.latency, args.jitter, args.error_rate, args.throttle))
+    print(f"OpenAI stub listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
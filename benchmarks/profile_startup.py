@@ -0,0 +1,131 @@
+# benchmarks/profile_startup.py
+"""Cold-start profile: import time, bot construction and guide loading.
+
+    python benchmarks/profile_startup.py
+    python benchmarks/profile_startup.py --cold --record startup.jsonl
+    python benchmarks/profile_startup.py --fake-model --top 30
+
+It reports three things:
+1. Import time of server and bot, each measured in a fresh interpreter with
+   -X importtime, and the slowest packages they pull in.
+2. The time to construct LexCommunisBot. This is the part that blocks startup.
+3. The time for warm_up() to finish, split into the concurrent load steps
+   (model, response cache, guide) and the parts built after them.
+
+--record appends a JSON line with these numbers and the git revision, so cold-start
+time can be tracked from one release to the next. --cold deletes the guide
+artifacts first, so the PDF is split and its text extracted again, as on a
+fresh instance.
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_IMPORTTIME_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_profile(module: str) -> Tuple[float, List[Tuple[float, str]]]:
+    """(total seconds, [(cumulative seconds, package)]) for importing `module` in a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, env=dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    total = 0.0
+    packages: Dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        cumulative = int(match.group(2)) / 1e6
+        name = match.group(4)
+        if name == module:
+            total = cumulative
+        # Top-level packages only, so nested imports are not counted twice
+        if "." not in name:
+            packages[name] = max(packages.get(name, 0.0), cumulative)
+    return total, sorted(((seconds, name) for name, seconds in packages.items()), reverse=True)
+
+
+def profile_bot(args) -> Dict[str, float]:
+    timings = {}
+    started = time.perf_counter()
+    from bot import LexCommunisBot
+    timings['import_bot'] = time.perf_counter() - started
+
+    model = None
+    if args.fake_model:
+        from fakes import FakeGenerativeModel, Latency
+        model = FakeGenerativeModel(Latency(0))
+
+    started = time.perf_counter()
+    bot = LexCommunisBot(model=model, cache_dir=args.cache_dir, storage_dir=os.path.join(args.cache_dir, 'data'))
+    timings['construct'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    bot.warm_up().result()
+    timings['warm_up'] = time.perf_counter() - started
+    for step, seconds in bot.guide_manager.load_seconds.items():
+        timings[f'load_{step}'] = seconds
+    bot.tldr_handler.cache.close()
+    bot.answer_store.close()
+    bot.payload_cache.close()
+    return timings
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cache-dir', default=os.path.join('.cache', 'startup'))
+    parser.add_argument('--cold', action='store_true', help="delete guide artifacts before loading")
+    parser.add_argument('--fake-model', action='store_true', help="skip vertexai.init and model construction")
+    parser.add_argument('--top', type=int, default=15, help="slowest imported packages to list")
+    parser.add_argument('--record', help="append the results as a JSON line to this file")
+    args = parser.parse_args()
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    if args.cold:
+        shutil.rmtree(os.path.join(args.cache_dir, 'artifacts'), ignore_errors=True)
+
+    record = {'timestamp': datetime.now(timezone.utc).isoformat(), 'revision': git_revision()}
+    for module in ('server', 'bot'):
+        total, packages = import_profile(module)
+        record[f'import_{module}_fresh'] = total
+        print(f"import {module:<8} {total:6.2f}s")
+        for seconds, name in packages[:args.top] if module == 'bot' else []:
+            print(f"    {name:<28} {seconds:6.2f}s")
+
+    timings = profile_bot(args)
+    record.update(timings)
+    print(f"\nLexCommunisBot() {timings['construct']:6.2f}s  (blocks startup)")
+    print(f"warm_up()        {timings['warm_up']:6.2f}s  (background)")
+    for name, seconds in timings.items():
+        if name.startswith('load_'):
+            print(f"    {name[5:]:<28} {seconds:6.2f}s")
+
+    if args.record:
+        with open(args.record, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + "\n")
+        print(f"\nRecorded in {args.record}")
+
+
+if __name__ == '__main__':
+    main()
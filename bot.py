@@ -1,30 +1,203 @@
 # bot.py
 import logging
 import asyncio
+import json
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.constants import ChatAction, ParseMode
 from telegram import InputMediaVideo, Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters, ContextTypes
-from config import TELEGRAM_TOKEN, GOOGLE_PROJECT_ID
-from pdf_manager import LegalGuideManager
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, Optional
+from config import (
+    TELEGRAM_TOKEN, GOOGLE_PROJECT_ID, STREAM_RESPONSES, STREAM_EDIT_INTERVAL,
+    ANSWER_STORE_MEMORY_ENTRIES, ANSWER_STORE_MAX_ENTRIES, ANSWER_STORE_MAX_BYTES, ANSWER_STORE_TTL,
+    BOT_MODE, CONCURRENT_UPDATES, SCREENING, SYNTHESIS,
+    PAYLOAD_CACHE, PAYLOAD_CACHE_MEMORY_ENTRIES, PAYLOAD_CACHE_MAX_ENTRIES, PAYLOAD_CACHE_MAX_BYTES, PAYLOAD_CACHE_TTL
+)
+from pdf_manager import CHUNK_ERROR, LegalGuideManager
 from logger_config import setup_logger
 from interaction_tracker import InteractionTracker
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import CallbackQueryHandler, ConversationHandler, CommandHandler
 from tldr_handler import TLDRHandler
+from openai_client import ChatClient
 from feedback_handler import FeedbackHandler
-from response_formatter import ResponseFormatter
-from telegram.error import BadRequest
+from llm_scheduler import create_scheduler
+from telegram_outbox import TelegramOutbox
+from response_cache import LRUCache, TieredCache, create_cache_backend
+from telegram_markdown import MESSAGE_LIMIT, escape, render_messages, utf16_len, utf16_tail
+from metrics import REGISTRY, span, start_trace, trace_summary
 
 logger = setup_logger()
 
+# Buttons under an answer, as (label, callback action); the callback data is "<action>_<message id>"
+ANSWER_BUTTONS = [[("📝 TL;DR", "tldr"), ("✍️ Feedback", "feedback")]]
+
 class LexCommunisBot:
-    def __init__(self):
-        self.guide_manager = LegalGuideManager(GOOGLE_PROJECT_ID)
-        self.tracker = InteractionTracker()
-        self.tldr_handler = TLDRHandler()
+    def __init__(self, model=None, openai_client: Optional[ChatClient] = None,
+                 outbox: Optional[TelegramOutbox] = None, cache_dir: str = ".cache", storage_dir: str = "data",
+                 screening: str = SCREENING, screening_model=None, synthesis: str = SYNTHESIS):
+        """Backends default to the real services; benchmarks pass in fakes"""
+        # One scheduler for every model call, so quotas and fairness span Gemini and OpenAI
+        self.scheduler = create_scheduler()
+        self.guide_manager = LegalGuideManager(
+            GOOGLE_PROJECT_ID, cache_dir=cache_dir, scheduler=self.scheduler, model=model,
+            screening=screening, screening_model=screening_model, synthesis=synthesis
+        )
+        self.tracker = InteractionTracker(storage_dir)
+        self.tldr_handler = TLDRHandler(
+            scheduler=self.scheduler, cache_dir=self.guide_manager.cache_dir, client=openai_client
+        )
         self.feedback_handler = FeedbackHandler(self.tracker)
-        self.response_cache = {}  # To store responses for TL;DR generation
+        self.answer_store = self._open_answer_store()  # Answers for TL;DR, keyed "<chat_id>:<message_id>"
+        self.payload_cache = self._open_payload_cache()  # Rendered answers, keyed by guide version and question
+        self.outbox = outbox or TelegramOutbox()
+        self._warm_up_lock = threading.Lock()
+        self._openai_warm_up: Optional[threading.Thread] = None
+        self._register_metrics()
+
+    def _register_metrics(self) -> None:
+        """Expose the components' existing counters on /metrics"""
+        cache_events = REGISTRY.counter("cache_events_total", "Cache lookups and evictions", ("cache", "event"))
+        cache_entries = REGISTRY.gauge("cache_entries", "Entries held per cache tier", ("cache", "tier"))
+        cache_bytes = REGISTRY.gauge("cache_bytes", "Bytes held on disk per cache", ("cache",))
+        model_active = REGISTRY.gauge("model_calls_active", "Model calls holding a scheduler slot", ("provider",))
+        model_queued = REGISTRY.gauge("model_calls_queued", "Model calls waiting for a slot", ("provider", "priority"))
+        telegram_calls = REGISTRY.counter("telegram_calls_total", "Telegram API calls by outcome", ("event",))
+        telegram_chats = REGISTRY.gauge("telegram_chats_tracked", "Recently active chats with send latency kept")
+        telegram_latency = REGISTRY.gauge(
+            "telegram_chat_send_seconds", "Send latency of the slowest recently active chat", ("stat",)
+        )
+        coalesced = REGISTRY.counter("model_calls_coalesced_total", "Duplicate model calls served by one in flight", ("cache",))
+        def collect() -> None:
+            caches = {
+                'tldr': (self.tldr_handler.cache, self.tldr_handler.inflight),
+                'answers': (self.answer_store, None),
+                'payloads': (self.payload_cache, None),
+            }
+            if self.guide_manager.cache is not None:  # Opened when the guide loads
+                caches['response'] = (self.guide_manager.cache, self.guide_manager.inflight)
+            for name, (cache, inflight) in caches.items():
+                # Hits and misses are counted across tiers; evictions (and Redis errors) in the durable one
+                for event in ('hits', 'misses'):
+                    cache_events.set(cache.stats[event], cache=name, event=event)
+                for event in ('evictions', 'expirations', 'errors'):
+                    if event in cache.durable.stats:
+                        cache_events.set(cache.durable.stats[event], cache=name, event=event)
+                cache_entries.set(len(cache.memory), cache=name, tier='memory')
+                # Sizes the durable tier tracks itself; Redis has none (see RedisCache.usage)
+                usage = cache.durable.usage()
+                if 'entries' in usage:
+                    cache_entries.set(usage['entries'], cache=name, tier='durable')
+                if 'bytes' in usage:
+                    cache_bytes.set(usage['bytes'], cache=name)
+                if inflight is not None:
+                    coalesced.set(inflight.stats['coalesced'], cache=name)
+            for provider, queue in self.scheduler.providers.items():
+                model_active.set(queue.active, provider=provider)
+                for priority, depth in queue.depth().items():
+                    model_queued.set(depth, provider=provider, priority=str(priority))
+            outbox = self.outbox.metrics()
+            for event, total in outbox['totals'].items():
+                telegram_calls.set(total, event=event)
+            # Per chat would be a series per user; the slowest chat shows one being held back
+            chats = outbox['chats'].values()
+            telegram_chats.set(len(chats))
+            telegram_latency.set(max((chat['latency_avg'] for chat in chats), default=0.0), stat='avg')
+            telegram_latency.set(max((chat['latency_max'] for chat in chats), default=0.0), stat='max')
+
+        REGISTRY.on_collect(collect)
+
+    def warm_up(self) -> Future:
+        """Start loading the guide and the OpenAI client in the background.
+
+        Returns the guide's load future; questions wait on the same one, so calling
+        this early (at startup or from /_ah/warmup) only moves the work forward.
+        """
+        with self._warm_up_lock:
+            if self._openai_warm_up is None:
+                self._openai_warm_up = threading.Thread(
+                    target=self.tldr_handler.client.warm_up, name='openai-warm-up', daemon=True
+                )
+                self._openai_warm_up.start()
+        return self.guide_manager.start()
+
+    def _open_answer_store(self) -> TieredCache:
+        """Bounded in memory, persisted (compressed) so TL;DR survives restarts and other instances"""
+        ttl = ANSWER_STORE_TTL or None
+        durable = create_cache_backend(
+            "answers",
+            cache_dir=self.guide_manager.cache_dir,
+            max_entries=ANSWER_STORE_MAX_ENTRIES,
+            max_bytes=ANSWER_STORE_MAX_BYTES,
+            default_ttl=ttl,
+            compress=True
+        )
+        return TieredCache(LRUCache(max_entries=ANSWER_STORE_MEMORY_ENTRIES, default_ttl=ttl), durable)
+
+    def _open_payload_cache(self) -> TieredCache:
+        ttl = PAYLOAD_CACHE_TTL or None
+        durable = create_cache_backend(
+            "payloads",
+            cache_dir=self.guide_manager.cache_dir,
+            max_entries=PAYLOAD_CACHE_MAX_ENTRIES,
+            max_bytes=PAYLOAD_CACHE_MAX_BYTES,
+            default_ttl=ttl,
+            compress=True
+        )
+        return TieredCache(LRUCache(max_entries=PAYLOAD_CACHE_MEMORY_ENTRIES, default_ttl=ttl), durable)
+
+    @staticmethod
+    def _answer_key(chat_id: int, message_id) -> str:
+        return f"{chat_id}:{message_id}"
+
+    def _payload_key(self, question_key: str) -> str:
+        """Guide version, chunk layout, answer settings, presentation and canonical question:
+        what a sent answer depends on"""
+        guide = self.guide_manager
+        presentation = guide.synthesizer.name if guide.synthesizer else 'sections'
+        return f"{guide.guide_version}:{guide.layout_digest}:{guide.settings_digest}:{presentation}:{question_key}"
+
+    @staticmethod
+    def _keyboard(layout, message_id: str) -> InlineKeyboardMarkup:
+        return InlineKeyboardMarkup([
+            [InlineKeyboardButton(label, callback_data=f'{action}_{message_id}') for label, action in row]
+            for row in layout
+        ])
+
+    async def _replay_answer(self, update: Update, context: ContextTypes.DEFAULT_TYPE, question_key: str) -> bool:
+        """Send the stored messages of an earlier answer to this question; False if there are none"""
+        if not PAYLOAD_CACHE:
+            return False
+        with span('cache_lookup', cache='payloads', result='miss') as labels:
+            stored = await self.payload_cache.get(self._payload_key(question_key))
+            if stored is not None:
+                labels['result'] = 'hit'
+        if stored is None:
+            return False
+        payload = json.loads(stored)
+        chat_id = update.effective_chat.id
+        message_id = str(update.message.message_id)
+        with span('replay', messages=str(len(payload['messages']))):
+            for message in payload['messages']:
+                await self.outbox.send_message(
+                    context.bot, chat_id, message['text'],
+                    parse_mode=message['parse_mode'],
+                    reply_markup=self._keyboard(message['keyboard'], message_id) if message['keyboard'] else None
+                )
+        await self.answer_store.set(self._answer_key(chat_id, message_id), payload['answer'])
+        self.tldr_handler.speculate(payload['answer'], user_id=update.effective_user.id)
+        return True
+
+    async def shutdown(self, application: Application) -> None:
+        """Flush buffered state before the process exits"""
+        await self.tracker.close()
+        await self.tldr_handler.close()
+        logging.info(f"Answer store: {self.answer_store.metrics()}")
+        self.answer_store.close()
+        logging.info(f"Payload cache: {self.payload_cache.metrics()}")
+        self.payload_cache.close()
 
     async def log_command(self, update: Update, command: str):
         """Log command usage"""
@@ -75,7 +248,7 @@ class LexCommunisBot:
             return
             
         question = ' '.join(context.args)
-        await self.process_question(update, question)
+        await self.process_question(update, context, question)
 
     async def process_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Handler for direct text messages"""
@@ -83,63 +256,188 @@ class LexCommunisBot:
         await self.process_question(update, context, update.message.text)
 
     async def process_question(self, update: Update, context: ContextTypes.DEFAULT_TYPE, question: str) -> None:
+        """Answer a question under a fresh trace id, logging where the time went"""
+        start_trace()
+        with span('question'):
+            await self._answer_question(update, context, question)
+        logging.info(f"Answered question from user {update.effective_user.id}: {trace_summary()}")
+
+    async def _answer_question(self, update: Update, context: ContextTypes.DEFAULT_TYPE, question: str) -> None:
         """Simplified process_question with independent chunk handling"""
+        chat_id = update.effective_chat.id
+        progress_msg = None
+        progress = None
+        await self.tracker.log_interaction(
+            update.effective_user.id,
+            update.effective_user.username,
+            'question',
+            question,
+            message_id=update.message.message_id,
+            chat_id=update.effective_chat.id
+        )
         try:
+            # A repeat question is answered with the messages sent last time, all at once. Before
+            # the guide has loaded there is no version to look up, and the question is answered normally
+            question_key = None
+            if self.guide_manager.loaded():
+                question_key = self.guide_manager.resolve_question(question)
+                if await self._replay_answer(update, context, question_key):
+                    return
+
             # Initial progress message
-            progress_msg = await context.bot.send_message(
-                chat_id=update.effective_chat.id,
-                text="🔄 Analyzing your question...",
+            progress_msg = await self.outbox.send_message(
+                context.bot, chat_id,
+                "🔄 Analyzing your question...",
                 parse_mode=ParseMode.MARKDOWN
             )
+            progress = self.outbox.progress(progress_msg)
+            # Only waits on a cold start, before the guide has finished loading
+            with span('guide_ready'):
+                await self.guide_manager.ready()
+            # Resolved once: a near-duplicate answered meanwhile must not move this question's key
+            if question_key is None:
+                question_key = self.guide_manager.resolve_question(question)
+            payload_key = self._payload_key(question_key)
 
-            # Track responses for TL;DR
+            # Track responses for TL;DR, and the messages sent so they can be replayed
             all_responses = []
-            total_chunks = len(self.guide_manager.pdf_chunks)
+            sent = []
+            failed = False
+            total_sections = len(self.guide_manager.pdf_chunks)
+            # With synthesis the sections are merged into one answer, which a repeat question reuses
+            synthesizer = self.guide_manager.synthesizer
+            answer = await self.guide_manager.cached_synthesis(question_key) if synthesizer else None
+            section_responses = {}
+            routes = {}
+            if answer is None:
+                routes = await self.guide_manager.screen(
+                    question, self.guide_manager.route_question(question, question_key=question_key),
+                    user_id=update.effective_user.id, question_key=question_key
+                )
+            total_chunks = len(routes) or total_sections
             processed_chunks = 0
 
-            # Process each chunk independently
-            async for chunk_response in self.guide_manager.process_chunks_stream(question):
-                processed_chunks += 1
-                
-                # Update progress
-                await progress_msg.edit_text(
-                    f"📚 Processing section {processed_chunks}/{total_chunks}\n"
-                    f"{'▰' * processed_chunks}{'▱' * (total_chunks-processed_chunks)}",
-                    parse_mode=ParseMode.MARKDOWN
-                )
+            # In streaming mode each section gets its message on the first token, then edits
+            section_drafts = {}
 
-                if chunk_response:
-                    # Format chunk response
-                    section_text = (
-                        f"📍 *Section {processed_chunks}/{total_chunks}*\n\n"
-                        f"{chunk_response}"
+            async def open_draft(draft: Dict[str, Any]):
+                message = await self.outbox.send_message(context.bot, chat_id, draft['text'])
+                editor = self.outbox.progress(message, interval=STREAM_EDIT_INTERVAL, parse_mode=None)
+                # Partials that arrived while the message was being sent
+                editor.update(draft['text'])
+                return message, editor
+
+            async def show_partial(chunk_index: int, text: str) -> None:
+                header = f"📍 Section {chunk_index + 1}/{total_sections}\n\n"
+                # Drafts are plain text; keep the newest part if the answer outgrows one message
+                # Sized in UTF-16 units, as Telegram counts them; the header's emoji is two
+                text = header + utf16_tail(text, MESSAGE_LIMIT - utf16_len(header) - utf16_len(" ▌")) + " ▌"
+                # Called while the model call holds its scheduler slot, so never wait on Telegram's
+                # pacing here: the first draft is sent in the background, later ones are debounced edits
+                draft = section_drafts.get(chunk_index)
+                if draft is None:
+                    draft = section_drafts[chunk_index] = {'text': text}
+                    draft['task'] = asyncio.create_task(open_draft(draft))
+                elif draft['task'].done():
+                    if not draft['task'].cancelled() and draft['task'].exception() is None:
+                        draft['task'].result()[1].update(text)
+                else:
+                    draft['text'] = text
+
+            # Chunks complete in any order, so label sections by chunk index
+            if answer is None:
+                async for chunk_index, chunk_response in self.guide_manager.process_chunks_stream(
+                        question, routes=routes, user_id=update.effective_user.id,
+                        on_partial=show_partial if STREAM_RESPONSES and not synthesizer else None,
+                        question_key=question_key):
+                    processed_chunks += 1
+                    # A section with no answer is missing from what would be replayed
+                    failed = (failed or chunk_index < 0 or not chunk_response
+                              or chunk_response.startswith(CHUNK_ERROR))
+                
+                    # Update progress (debounced; only the latest state is sent)
+                    progress.update(
+                        f"📚 Processing section {processed_chunks}/{total_chunks}\n"
+                        f"{'▰' * processed_chunks}{'▱' * (total_chunks-processed_chunks)}"
                     )
+
+                    if chunk_response and synthesizer:
+                        section_responses[chunk_index] = chunk_response
+                    elif chunk_response:
+                        # Format chunk response
+                        if 0 <= chunk_index < total_sections:
+                            section_label = self.guide_manager.section_label(chunk_index, routes.get(chunk_index))
+                            header = (
+                                f"📍 *Section {chunk_index + 1}/{total_sections}*\n"
+                                f"_{escape(section_label)}_\n\n"
+                            )
+                        else:
+                            header = ""
+                        with span('render'):
+                            section_parts = render_messages(chunk_response, header=header)
+
+                        opened = None
+                        if chunk_index in section_drafts:
+                            try:
+                                opened = await section_drafts.pop(chunk_index)['task']
+                            except Exception as e:
+                                logging.warning(f"Draft for section {chunk_index + 1} was not sent: {str(e)}")
+                        if opened:
+                            # Replace the streamed draft with the final formatted answer
+                            message, editor = opened
+                            await editor.close()
+                            await self.outbox.edit_message_text(
+                                message, section_parts[0], parse_mode=ParseMode.MARKDOWN_V2
+                            )
+                            sent.append(section_parts[0])
+                            section_parts = section_parts[1:]
+                        # Send each chunk as separate message(s), split to fit Telegram's limit
+                        for part in section_parts:
+                            await self.outbox.send_message(context.bot, chat_id, part, parse_mode=ParseMode.MARKDOWN_V2)
+                            sent.append(part)
                     
-                    # Send each chunk as a separate message
-                    try:
-                        await context.bot.send_message(
-                            chat_id=update.effective_chat.id,
-                            text=section_text,
-                            parse_mode=ParseMode.MARKDOWN
-                        )
-                    except BadRequest:
-                        # Fallback without markdown if parsing fails
-                        clean_text = section_text.replace('*', '').replace('_', '')
-                        await context.bot.send_message(
-                            chat_id=update.effective_chat.id,
-                            text=clean_text
-                        )
-                    
-                    all_responses.append(chunk_response)
+                        all_responses.append(chunk_response)
+
+            if section_responses:
+                progress.update("🧩 Combining the sections into one answer...")
+                answer = await self.guide_manager.synthesize(
+                    question, question_key, section_responses, routes, user_id=update.effective_user.id
+                )
 
             # Clean up progress message
-            await progress_msg.delete()
+            await progress.close()
+            await self.outbox.delete_message(progress_msg)
+            progress_msg = None
+
+            message_id = str(update.message.message_id)
+            reply_markup = self._keyboard(ANSWER_BUTTONS, message_id)
+            payloads = [{'text': text, 'parse_mode': ParseMode.MARKDOWN_V2, 'keyboard': None} for text in sent]
 
-            # Send final summary message with buttons if we have responses
+            if answer:
+                # One message (more only if it outgrows Telegram's limit), buttons on the last
+                with span('render'):
+                    parts = render_messages(
+                        answer + "\n\n_Note: This is educational information only, not legal advice._",
+                        header="💡 *Answer*\n\n"
+                    )
+                for i, part in enumerate(parts):
+                    last = i == len(parts) - 1
+                    await self.outbox.send_message(
+                        context.bot, chat_id, part, parse_mode=ParseMode.MARKDOWN_V2,
+                        reply_markup=reply_markup if last else None
+                    )
+                    payloads.append({'text': part, 'parse_mode': ParseMode.MARKDOWN_V2,
+                                     'keyboard': ANSWER_BUTTONS if last else None})
+                all_responses.append(answer)
+
+            # Keep the answer for TL;DR
             if all_responses:
-                message_id = str(update.message.message_id)
-                self.response_cache[message_id] = "\n\n".join(all_responses)
+                combined_response = "\n\n".join(all_responses)
+                await self.answer_store.set(self._answer_key(chat_id, message_id), combined_response)
+                self.tldr_handler.speculate(combined_response, user_id=update.effective_user.id)
 
+            # Send final summary message with buttons if we sent sections
+            if all_responses and not answer:
                 final_text = (
                     "✅ *Analysis Complete*\n\n"
                     "I've analyzed all sections of the guide. "
@@ -147,30 +445,27 @@ class LexCommunisBot:
                     "_Note: This is educational information only, not legal advice._"
                 )
 
-                keyboard = [
-                    [
-                        InlineKeyboardButton("📝 TL;DR", callback_data=f'tldr_{message_id}'),
-                        InlineKeyboardButton("✍️ Feedback", callback_data=f'feedback_{message_id}')
-                    ]
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-
-                await context.bot.send_message(
-                    chat_id=update.effective_chat.id,
-                    text=final_text,
+                await self.outbox.send_message(
+                    context.bot, chat_id, final_text,
                     parse_mode=ParseMode.MARKDOWN,
                     reply_markup=reply_markup
                 )
+                payloads.append({'text': final_text, 'parse_mode': ParseMode.MARKDOWN, 'keyboard': ANSWER_BUTTONS})
+
+            # An answer missing a failed section is not worth replaying
+            if PAYLOAD_CACHE and all_responses and not failed:
+                await self.payload_cache.set(payload_key, json.dumps(
+                    {'messages': payloads, 'answer': combined_response}, ensure_ascii=False
+                ))
 
         except Exception as e:
             error_msg = "I apologize, but I encountered an error processing your question. Please try again."
             logging.error(f"Error processing question from user {update.effective_user.id}: {str(e)}")
-            if 'progress_msg' in locals():
-                await progress_msg.delete()
-            await context.bot.send_message(
-                chat_id=update.effective_chat.id,
-                text=error_msg
-            )
+            if progress:
+                await progress.close()
+            if progress_msg:
+                await self.outbox.delete_message(progress_msg)
+            await self.outbox.send_message(context.bot, chat_id, error_msg)
 
     async def handle_feedback(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Improved feedback handler"""
@@ -224,7 +519,8 @@ class LexCommunisBot:
                 user_id=update.effective_user.id,
                 username=update.effective_user.username,
                 message_id=message_id,
-                score=score
+                score=score,
+                chat_id=update.effective_chat.id
             )
             
             await update.message.reply_text(
@@ -256,7 +552,8 @@ class LexCommunisBot:
                 user_id=update.effective_user.id,
                 username=update.effective_user.username,
                 message_id=message_id,
-                comment=feedback_text
+                comment=feedback_text,
+                chat_id=update.effective_chat.id
             )
             
             await update.message.reply_text(
@@ -443,12 +740,13 @@ class LexCommunisBot:
 
     async def handle_tldr(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Improved TL;DR handler"""
+        start_trace()
         query = update.callback_query
         await query.answer()
         
         try:
             message_id = query.data.split('_')[1]
-            original_response = self.response_cache.get(message_id)
+            original_response = await self.answer_store.get(self._answer_key(query.message.chat_id, message_id))
             
             if not original_response:
                 await query.message.reply_text(
@@ -463,7 +761,7 @@ class LexCommunisBot:
                 parse_mode=ParseMode.MARKDOWN
             )
             
-            tldr = await self.tldr_handler.generate_tldr(original_response)
+            tldr = await self.tldr_handler.generate_tldr(original_response, user_id=update.effective_user.id)
             await processing_msg.delete()
             
             if tldr:
@@ -471,8 +769,8 @@ class LexCommunisBot:
                 reply_markup = InlineKeyboardMarkup(keyboard)
                 
                 await query.message.reply_text(
-                    f"📝 *TL;DR Summary:*\n\n{tldr}",
-                    parse_mode=ParseMode.MARKDOWN,
+                    render_messages(tldr, header="📝 *TL;DR Summary:*\n\n")[0],
+                    parse_mode=ParseMode.MARKDOWN_V2,
                     reply_markup=reply_markup
                 )
             else:
@@ -506,12 +804,26 @@ async def callback_handler(self, update: Update, context: ContextTypes.DEFAULT_T
     elif query.data.startswith('rate_'):
         await self.handle_rating(update, context)
 
-def main():
-    """Initialize and start the bot"""
-    logger.info("Starting LexCommunis Bot")
-    
-    bot = LexCommunisBot()
-    application = Application.builder().token(TELEGRAM_TOKEN).build()
+_bot: Optional[LexCommunisBot] = None
+_bot_lock = threading.Lock()
+
+def get_bot() -> LexCommunisBot:
+    """The process's bot, shared by the Telegram handlers and the web server"""
+    global _bot
+    with _bot_lock:
+        if _bot is None:
+            _bot = LexCommunisBot()
+        return _bot
+
+def build_application(bot: LexCommunisBot) -> Application:
+    """The telegram Application with every handler registered; used by polling and webhook mode"""
+    application = (
+        Application.builder()
+        .token(TELEGRAM_TOKEN)
+        .concurrent_updates(CONCURRENT_UPDATES)
+        .post_shutdown(bot.shutdown)
+        .build()
+    )
     
     # Add command handlers
     application.add_handler(CommandHandler("start", bot.start))
@@ -530,9 +842,25 @@ def main():
         filters.TEXT & ~filters.COMMAND,
         bot.process_message
     ))
+    return application
+
+def main():
+    """Initialize and start the bot"""
+    logger.info(f"Starting LexCommunis Bot ({BOT_MODE})")
+    
+    bot = get_bot()
+    # Load the guide while the application connects; the first question waits if it must
+    bot.warm_up()
+    application = build_application(bot)
     
-    logger.info("Bot is ready to accept connections")
-    application.run_polling()
+    if BOT_MODE == 'webhook':
+        from webhook_server import run_webhook
+        run_webhook(bot, application)
+    elif BOT_MODE == 'polling':
+        logger.info("Bot is ready to accept connections")
+        application.run_polling()
+    else:
+        raise ValueError(f"Unknown BOT_MODE: {BOT_MODE}")
 
 if __name__ == '__main__':
     logging.basicConfig(
@@ -0,0 +1,179 @@
+# chunking.py
+import json
+import logging
+import re
+from typing import List, Optional, Tuple
+
+# (label, start page, end page), pages zero-based and half-open
+Chunk = Tuple[str, int, int]
+
+# Gemini bills each PDF page as an image as well as its text, so no page is free
+MIN_PAGE_TOKENS = 258
+
+
+def estimate_tokens(text: str, chars_per_token: int = 4) -> int:
+    return max(len(text) // chars_per_token, MIN_PAGE_TOKENS)
+
+
+class ChunkingStrategy:
+    """Decides how the guide's pages are grouped into per-call chunks"""
+
+    name = "base"
+
+    def chunk(self, page_texts: List[str]) -> List[Chunk]:
+        raise NotImplementedError
+
+
+class QuarterChunking(ChunkingStrategy):
+    """The original layout: four equal page counts, the remainder going to the last"""
+
+    name = "quarters"
+
+    def chunk(self, page_texts: List[str]) -> List[Chunk]:
+        total_pages = len(page_texts)
+        chunk_size = total_pages // 4
+        return [
+            ("First Quarter", 0, chunk_size),
+            ("Second Quarter", chunk_size, chunk_size * 2),
+            ("Third Quarter", chunk_size * 2, chunk_size * 3),
+            ("Fourth Quarter", chunk_size * 3, total_pages)
+        ]
+
+
+class TokenBudgetChunking(ChunkingStrategy):
+    """Packs consecutive pages until the next one would push a chunk past the token budget"""
+
+    name = "tokens"
+
+    def __init__(self, target_tokens: int = 12000):
+        self.target_tokens = target_tokens
+
+    def chunk(self, page_texts: List[str]) -> List[Chunk]:
+        return [
+            (f"Part {part}", start, end)
+            for part, (start, end) in enumerate(self.pack(page_texts, 0, len(page_texts)), 1)
+        ]
+
+    def pack(self, page_texts: List[str], start: int, end: int) -> List[Tuple[int, int]]:
+        spans = []
+        span_start, span_tokens = start, 0
+        for page_num in range(start, end):
+            tokens = estimate_tokens(page_texts[page_num])
+            if span_tokens and span_tokens + tokens > self.target_tokens:
+                spans.append((span_start, page_num))
+                span_start, span_tokens = page_num, 0
+            span_tokens += tokens
+        if span_start < end:
+            spans.append((span_start, end))
+        return spans
+
+
+class ChapterChunking(ChunkingStrategy):
+    """One chunk per chapter, titled from the `title` entries in chapters.json.
+
+    Chapters start on the PDF page carrying their "CHAPTER nn" heading. The contents
+    pages list every heading first, so the last page a heading appears on is taken.
+    Without headings, the `pageRange` entries are used instead: printed page numbers
+    ("15" or "24-36") that `page_offset` maps to PDF pages. The gap between the two
+    varies through this guide, so no single offset is right for every chapter.
+
+    A chapter runs until the next one starts. Entries whose numbering goes backwards
+    belong to a differently numbered section and are skipped. Pages before the first
+    chapter become an "Introduction" chunk. Chapters larger than `max_tokens` are
+    split into numbered parts so no single call dominates.
+    """
+
+    name = "chapters"
+    _RANGE_RE = re.compile(r"^\s*(\d+)\s*(?:-\s*(\d+))?\s*$")
+    # Headings are upper case; "chapter 8 of PERG" in body text is not one
+    _HEADING_RE = re.compile(r"CHAPTER\s*(\d{1,2})(?!\d)")
+
+    def __init__(self, chapters_path: str, page_offset: int = 0, max_tokens: Optional[int] = None):
+        self.chapters_path = chapters_path
+        self.page_offset = page_offset
+        self.max_tokens = max_tokens
+
+    def chapters(self) -> List[Tuple[str, int]]:
+        """(title, printed start page) of each chapter, in order"""
+        with open(self.chapters_path, 'r', encoding='utf-8') as f:
+            chapters = json.load(f)['chapters']
+
+        entries: List[Tuple[str, int]] = []
+        skipped = []
+        for chapter in chapters:
+            match = self._RANGE_RE.match(str(chapter.get('pageRange', '')))
+            page = int(match.group(1)) if match else None
+            if page is None or (entries and page <= entries[-1][1]):
+                skipped.append(f"{chapter.get('title')} ({chapter.get('pageRange')})")
+                continue
+            entries.append((chapter['title'], page))
+
+        if skipped:
+            logging.info(f"Chapter chunking ignored {len(skipped)} out-of-order or invalid entries: {'; '.join(skipped)}")
+        return entries
+
+    def heading_starts(self, page_texts: List[str], titles: List[str]) -> List[Tuple[str, int]]:
+        """(title, PDF page) of each chapter whose "CHAPTER nn" heading is found"""
+        pages = {}
+        for page_num, text in enumerate(page_texts):
+            for match in self._HEADING_RE.finditer(text):
+                pages[int(match.group(1))] = page_num
+
+        starts: List[Tuple[str, int]] = []
+        for number in sorted(pages):
+            if starts and pages[number] <= starts[-1][1]:
+                continue
+            title = titles[number - 1] if 0 < number <= len(titles) else f"Chapter {number}"
+            starts.append((title, pages[number]))
+        return starts
+
+    def chapter_starts(self, page_texts: List[str]) -> List[Tuple[str, int]]:
+        total_pages = len(page_texts)
+        chapters = self.chapters()
+        starts = self.heading_starts(page_texts, [title for title, _ in chapters])
+        if starts:
+            logging.info(f"Chapter chunking found {len(starts)} chapter headings")
+            return starts
+
+        starts = []
+        for title, page in chapters:
+            start = page - 1 + self.page_offset
+            if 0 <= start < total_pages:
+                starts.append((title, start))
+        return starts
+
+    def chunk(self, page_texts: List[str]) -> List[Chunk]:
+        total_pages = len(page_texts)
+        starts = self.chapter_starts(page_texts)
+        if not starts:
+            logging.warning("No usable chapters found; falling back to quarters")
+            return QuarterChunking().chunk(page_texts)
+
+        if starts[0][1] > 0:
+            starts.insert(0, ("Introduction", 0))
+
+        chunks: List[Chunk] = []
+        packer = TokenBudgetChunking(self.max_tokens) if self.max_tokens else None
+        for i, (title, start) in enumerate(starts):
+            end = starts[i + 1][1] if i + 1 < len(starts) else total_pages
+            spans = packer.pack(page_texts, start, end) if packer else [(start, end)]
+            if len(spans) == 1:
+                chunks.append((title, start, end))
+            else:
+                chunks.extend(
+                    (f"{title} (part {part}/{len(spans)})", span_start, span_end)
+                    for part, (span_start, span_end) in enumerate(spans, 1)
+                )
+        return chunks
+
+
+def get_chunking_strategy(name: str, chapters_path: str, page_offset: int = 0,
+                          target_tokens: int = 12000) -> ChunkingStrategy:
+    """Strategy for the CHUNK_STRATEGY setting"""
+    if name == QuarterChunking.name:
+        return QuarterChunking()
+    if name == TokenBudgetChunking.name:
+        return TokenBudgetChunking(target_tokens)
+    if name == ChapterChunking.name:
+        return ChapterChunking(chapters_path, page_offset, max_tokens=target_tokens)
+    raise ValueError(f"Unknown chunking strategy: {name}")
@@ -8,4 +8,127 @@ TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 GOOGLE_PROJECT_ID = os.getenv('GOOGLE_CLOUD_PROJECT')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 CACHE_DIR = ".cache"
-MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
\ No newline at end of file
+MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+
+# Model fan-out
+CONCURRENT_CHUNKS = os.getenv('CONCURRENT_CHUNKS', 'true').lower() == 'true'
+MAX_CONCURRENT_MODEL_CALLS = int(os.getenv('MAX_CONCURRENT_MODEL_CALLS', '8'))
+
+# LLM scheduler pacing; match these to the project's provider quotas
+GEMINI_REQUESTS_PER_MINUTE = float(os.getenv('GEMINI_REQUESTS_PER_MINUTE', '60'))
+GEMINI_TOKENS_PER_MINUTE = float(os.getenv('GEMINI_TOKENS_PER_MINUTE', '1000000'))
+OPENAI_REQUESTS_PER_MINUTE = float(os.getenv('OPENAI_REQUESTS_PER_MINUTE', '500'))
+OPENAI_TOKENS_PER_MINUTE = float(os.getenv('OPENAI_TOKENS_PER_MINUTE', '200000'))
+OPENAI_MAX_CONCURRENCY = int(os.getenv('OPENAI_MAX_CONCURRENCY', '8'))
+
+# Vertex AI model that answers each chunk
+GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-1.5-pro-002')
+
+# Relevance screening before the answer model: "off", "keyword" (BM25 page scores, kept if at
+# least SCREENING_MIN_RATIO of the best) or "model" (SCREENING_MODEL rates each chunk 0-10,
+# kept from SCREENING_MIN_SCORE). Screening calls have their own scheduler quota.
+SCREENING = os.getenv('SCREENING', 'off')
+SCREENING_MODEL = os.getenv('SCREENING_MODEL', 'gemini-1.5-flash-002')
+SCREENING_MIN_RATIO = float(os.getenv('SCREENING_MIN_RATIO', '0.35'))
+SCREENING_MIN_SCORE = float(os.getenv('SCREENING_MIN_SCORE', '4'))
+SCREENING_REQUESTS_PER_MINUTE = float(os.getenv('SCREENING_REQUESTS_PER_MINUTE', '200'))
+SCREENING_TOKENS_PER_MINUTE = float(os.getenv('SCREENING_TOKENS_PER_MINUTE', '4000000'))
+
+# Answer synthesis: "off" (one message per section), "local" (section answers merged into one,
+# near-duplicate statements dropped, ordered by relevance) or "model" (the merged statements
+# rewritten by GEMINI_MODEL). Statements at least SYNTHESIS_DEDUPE_THRESHOLD similar are merged.
+SYNTHESIS = os.getenv('SYNTHESIS', 'off')
+SYNTHESIS_DEDUPE_THRESHOLD = float(os.getenv('SYNTHESIS_DEDUPE_THRESHOLD', '0.6'))
+SYNTHESIS_MAX_CHARS = int(os.getenv('SYNTHESIS_MAX_CHARS', '3000'))
+
+# Page retrieval: send only the top-k matching pages (0 sends whole chunks)
+RETRIEVAL_TOP_K = int(os.getenv('RETRIEVAL_TOP_K', '6'))
+RETRIEVAL_PAGE_WINDOW = int(os.getenv('RETRIEVAL_PAGE_WINDOW', '1'))
+
+# Durable tier of the response, TL;DR and answer caches: "" or sqlite:///<dir> (files local
+# to the instance), redis://host:6379/0 (shared by every instance) or memory:// (tests)
+CACHE_URL = os.getenv('CACHE_URL', '')
+CACHE_KEY_PREFIX = os.getenv('CACHE_KEY_PREFIX', 'lexcommunis:')
+REDIS_TIMEOUT = float(os.getenv('REDIS_TIMEOUT', '0.5'))
+
+# Response cache: memory LRU tier in front of the durable tier (TTL 0 = never expire)
+RESPONSE_CACHE_MEMORY_ENTRIES = int(os.getenv('RESPONSE_CACHE_MEMORY_ENTRIES', '1024'))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '100000'))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', str(30 * 24 * 3600)))
+
+# Answers kept for TL;DR and feedback follow-ups: memory LRU in front of compressed SQLite
+ANSWER_STORE_MEMORY_ENTRIES = int(os.getenv('ANSWER_STORE_MEMORY_ENTRIES', '256'))
+ANSWER_STORE_MAX_ENTRIES = int(os.getenv('ANSWER_STORE_MAX_ENTRIES', '50000'))
+ANSWER_STORE_MAX_BYTES = int(os.getenv('ANSWER_STORE_MAX_BYTES', str(128 * 1024 * 1024)))
+ANSWER_STORE_TTL = float(os.getenv('ANSWER_STORE_TTL', str(7 * 24 * 3600)))
+
+# Whole answers as sent (rendered messages and buttons), per guide version and question, so a
+# repeat question is replayed without the chunk pipeline
+PAYLOAD_CACHE = os.getenv('PAYLOAD_CACHE', 'true').lower() == 'true'
+PAYLOAD_CACHE_MEMORY_ENTRIES = int(os.getenv('PAYLOAD_CACHE_MEMORY_ENTRIES', '512'))
+PAYLOAD_CACHE_MAX_ENTRIES = int(os.getenv('PAYLOAD_CACHE_MAX_ENTRIES', '20000'))
+PAYLOAD_CACHE_MAX_BYTES = int(os.getenv('PAYLOAD_CACHE_MAX_BYTES', str(128 * 1024 * 1024)))
+PAYLOAD_CACHE_TTL = float(os.getenv('PAYLOAD_CACHE_TTL', str(30 * 24 * 3600)))
+
+# OpenAI client: base URL (empty = api.openai.com; point at a stub for testing), timeouts in
+# seconds, retries limited to a fraction of requests, and an optional hedge delay (0 = off)
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL', '')
+OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', '20'))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv('OPENAI_CONNECT_TIMEOUT', '5'))
+OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', '2'))
+OPENAI_RETRY_BUDGET_RATIO = float(os.getenv('OPENAI_RETRY_BUDGET_RATIO', '0.1'))
+OPENAI_HEDGE_AFTER = float(os.getenv('OPENAI_HEDGE_AFTER', '0'))
+OPENAI_POOL_CONNECTIONS = int(os.getenv('OPENAI_POOL_CONNECTIONS', '20'))
+
+# TL;DR engine: "remote" (OpenAI, falling back to local past the latency budget) or "local"
+TLDR_ENGINE = os.getenv('TLDR_ENGINE', 'remote')
+TLDR_LATENCY_BUDGET = float(os.getenv('TLDR_LATENCY_BUDGET', '8.0'))  # seconds, 0 = no limit
+
+# TL;DR cache (keyed by a hash of the answer) and background pre-generation
+TLDR_CACHE_MEMORY_ENTRIES = int(os.getenv('TLDR_CACHE_MEMORY_ENTRIES', '256'))
+TLDR_CACHE_TTL = float(os.getenv('TLDR_CACHE_TTL', str(30 * 24 * 3600)))
+TLDR_SPECULATIVE = os.getenv('TLDR_SPECULATIVE', 'false').lower() == 'true'
+TLDR_SPECULATIVE_MAX_PENDING = int(os.getenv('TLDR_SPECULATIVE_MAX_PENDING', '4'))
+TLDR_SPECULATIVE_TOKENS_PER_MINUTE = float(os.getenv('TLDR_SPECULATIVE_TOKENS_PER_MINUTE', '20000'))
+
+# Questions whose canonical forms are at least this similar share cached answers (>1 disables)
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv('NEAR_DUPLICATE_THRESHOLD', '0.8'))
+
+# Chunking: "chapters" (the PDF's CHAPTER nn headings, else chapters.json pageRange), "tokens"
+# (page packing) or "quarters"
+CHUNK_STRATEGY = os.getenv('CHUNK_STRATEGY', 'chapters')
+CHUNK_TARGET_TOKENS = int(os.getenv('CHUNK_TARGET_TOKENS', '12000'))
+CHAPTER_PAGE_OFFSET = int(os.getenv('CHAPTER_PAGE_OFFSET', '0'))  # printed page -> PDF page, without headings
+
+# Telegram output pacing (messages/second across all chats, seconds between calls per chat)
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', '25'))
+TELEGRAM_CHAT_INTERVAL = float(os.getenv('TELEGRAM_CHAT_INTERVAL', '1.0'))
+TELEGRAM_GROUP_INTERVAL = float(os.getenv('TELEGRAM_GROUP_INTERVAL', '3.0'))
+PROGRESS_EDIT_INTERVAL = float(os.getenv('PROGRESS_EDIT_INTERVAL', '2.0'))
+
+# Stream model answers into progressively edited section messages
+STREAM_RESPONSES = os.getenv('STREAM_RESPONSES', 'false').lower() == 'true'
+STREAM_EDIT_INTERVAL = float(os.getenv('STREAM_EDIT_INTERVAL', '2.5'))
+
+# Interaction log writer
+INTERACTION_QUEUE_SIZE = int(os.getenv('INTERACTION_QUEUE_SIZE', '10000'))
+INTERACTION_BATCH_SIZE = int(os.getenv('INTERACTION_BATCH_SIZE', '200'))
+INTERACTION_FLUSH_INTERVAL = float(os.getenv('INTERACTION_FLUSH_INTERVAL', '1.0'))
+INTERACTION_LOG_MAX_BYTES = int(os.getenv('INTERACTION_LOG_MAX_BYTES', str(64 * 1024 * 1024)))
+INTERACTION_LOG_BLOCK_WHEN_FULL = os.getenv('INTERACTION_LOG_BLOCK_WHEN_FULL', 'false').lower() == 'true'
+
+# Seconds /_ah/warmup waits for the guide and model clients to load
+WARMUP_TIMEOUT = float(os.getenv('WARMUP_TIMEOUT', '120'))
+
+# Update delivery: "polling" (local development) or "webhook" (one aiohttp server on the
+# bot's event loop). WEBHOOK_URL is the public base URL; when set, the webhook is
+# registered at startup. An empty secret is derived from the bot token.
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+PORT = int(os.getenv('PORT', '8080'))
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
+# Updates handled at once; questions wait on model calls, so one at a time starves other chats
+CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', '64'))
@@ -0,0 +1,88 @@
+# extractive_summarizer.py
+import re
+from collections import Counter
+from typing import List
+
+import numpy as np
+
+from page_index import STOPWORDS
+from question_matcher import stem
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(])")
+_MARKUP_RE = re.compile(r"[*_`#>]+")
+_BULLET_RE = re.compile(r"^\s*(?:[-•▪◦]|\d+[.)])\s*")
+MIN_SENTENCE_WORDS = 5
+
+
+def split_sentences(text: str) -> List[str]:
+    """Sentences from model output: lines first (bullets, headings), then punctuation"""
+    sentences = []
+    for line in text.splitlines():
+        line = _MARKUP_RE.sub("", _BULLET_RE.sub("", line)).strip()
+        if not line:
+            continue
+        for sentence in _SENTENCE_END_RE.split(line):
+            sentence = sentence.strip()
+            if len(sentence.split()) >= MIN_SENTENCE_WORDS:
+                sentences.append(sentence)
+    return sentences
+
+
+def _terms(sentence: str) -> List[str]:
+    return [stem(word) for word in _WORD_RE.findall(sentence.lower()) if word not in STOPWORDS and len(word) > 1]
+
+
+def rank_sentences(sentences: List[str], damping: float = 0.85, iterations: int = 50) -> np.ndarray:
+    """TextRank scores: PageRank over the TF-IDF cosine-similarity graph of sentences"""
+    n = len(sentences)
+    if n <= 2:
+        return np.ones(n)
+    term_counts = [Counter(_terms(sentence)) for sentence in sentences]
+    vocabulary = {term: i for i, term in enumerate({term for counts in term_counts for term in counts})}
+    if not vocabulary:
+        return np.ones(n)
+
+    tf = np.zeros((n, len(vocabulary)))
+    for row, counts in enumerate(term_counts):
+        for term, count in counts.items():
+            tf[row, vocabulary[term]] = count
+    idf = np.log((1 + n) / (1 + (tf > 0).sum(axis=0))) + 1
+    vectors = tf * idf
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.where(norms == 0, 1, norms)
+
+    similarity = vectors @ vectors.T
+    np.fill_diagonal(similarity, 0)
+    out_weight = similarity.sum(axis=1, keepdims=True)
+    # Sentences similar to nothing link uniformly so the matrix stays stochastic
+    transition = np.where(out_weight > 0, similarity / np.where(out_weight == 0, 1, out_weight), 1.0 / n)
+
+    scores = np.full(n, 1.0 / n)
+    for _ in range(iterations):
+        updated = (1 - damping) / n + damping * (transition.T @ scores)
+        if np.abs(updated - scores).sum() < 1e-6:
+            return updated
+        scores = updated
+    return scores
+
+
+def summarize(text: str, max_sentences: int = 3, max_chars: int = 600) -> str:
+    """The most central sentences of `text`, in their original order"""
+    sentences = split_sentences(text)
+    if not sentences:
+        return text.strip()[:max_chars]
+    scores = rank_sentences(sentences)
+    chosen, length, seen = [], 0, set()
+    for index in np.argsort(-scores, kind="stable"):
+        sentence = sentences[index]
+        if sentence.lower() in seen:
+            continue
+        if chosen and length + len(sentence) > max_chars:
+            continue
+        chosen.append(index)
+        seen.add(sentence.lower())
+        length += len(sentence)
+        if len(chosen) >= max_sentences:
+            break
+    return "\n".join(f"• {sentences[index]}" for index in sorted(chosen))
@@ -11,8 +11,11 @@ class FeedbackHandler:
         
     async def log_feedback(self, user_id: int, username: str, 
                           message_id: int, score: Optional[int] = None, 
-                          comment: Optional[str] = None):
-        """Log user feedback for a specific response."""
+                          comment: Optional[str] = None, chat_id: Optional[int] = None):
+        """Log user feedback for a specific response.
+
+        Message ids are only unique within a chat, so `chat_id` is needed to find the question.
+        """
         feedback = {
             'message_id': message_id,
             'score': score,
@@ -24,5 +27,6 @@ class FeedbackHandler:
             user_id=user_id,
             username=username,
             message_type='feedback',
-            content=json.dumps(feedback)
+            content=json.dumps(feedback),
+            chat_id=chat_id
         )
\ No newline at end of file
@@ -0,0 +1,264 @@
+# interaction_index.py
+import argparse
+import glob
+import gzip
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+from datetime import datetime, timedelta
+from typing import IO, Dict, Iterator, List, Optional, Tuple
+
+from question_matcher import canonicalize
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    identity TEXT PRIMARY KEY,  -- hash of a log segment's first line, stable across rotation
+    path TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    complete INTEGER NOT NULL DEFAULT 0  -- a rotated segment read to its end; never reopened
+);
+CREATE TABLE IF NOT EXISTS interactions (
+    id INTEGER PRIMARY KEY,
+    ts TEXT NOT NULL,
+    user_id INTEGER,
+    username TEXT,
+    type TEXT NOT NULL,
+    content TEXT,
+    response TEXT,
+    message_id INTEGER,
+    canonical TEXT,
+    chat_id INTEGER
+);
+CREATE TABLE IF NOT EXISTS feedback (
+    interaction_id INTEGER PRIMARY KEY REFERENCES interactions(id),
+    ts TEXT NOT NULL,
+    user_id INTEGER,
+    message_id INTEGER,
+    score INTEGER,
+    comment TEXT,
+    chat_id INTEGER
+);
+"""
+
+# Created after any missing columns are added to an index from before they existed
+INDEXES = """
+CREATE INDEX IF NOT EXISTS interactions_ts ON interactions(ts);
+CREATE INDEX IF NOT EXISTS interactions_user_ts ON interactions(user_id, ts);
+CREATE INDEX IF NOT EXISTS interactions_type_ts ON interactions(type, ts);
+DROP INDEX IF EXISTS interactions_question;
+CREATE INDEX IF NOT EXISTS interactions_chat_question ON interactions(chat_id, message_id) WHERE type = 'question';
+DROP INDEX IF EXISTS feedback_message;
+CREATE INDEX IF NOT EXISTS feedback_chat_message ON feedback(chat_id, message_id);
+CREATE INDEX IF NOT EXISTS feedback_ts ON feedback(ts);
+"""
+
+
+class InteractionIndex:
+    """SQLite mirror of the interaction log, kept up to date incrementally.
+
+    Each log segment (the live interactions.jsonl and every rotated .jsonl.gz) is
+    identified by a hash of its first line, which survives rotation and compression,
+    and the index remembers how many bytes of it were ingested. Rotated segments never
+    change, so once one has been read to its end it is marked complete and skipped
+    without being opened (seeking in a gzip stream decompresses everything before the
+    offset). sync() therefore only reads new lines, however large the history grows.
+    Feedback payloads are unpacked into their own table so ratings join to questions on (chat_id, message_id):
+    Telegram message ids are only unique within a chat. Records logged before
+    chat_id was recorded have none, and match each other on message_id alone.
+    """
+
+    def __init__(self, storage_dir: str = 'data', db_path: Optional[str] = None):
+        self.storage_dir = storage_dir
+        self.db_path = db_path or os.path.join(storage_dir, 'interactions.db')
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        for table, column in (('interactions', 'chat_id INTEGER'), ('feedback', 'chat_id INTEGER'),
+                              ('sources', 'complete INTEGER NOT NULL DEFAULT 0')):
+            columns = {row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+            if column.split()[0] not in columns:
+                self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column}")
+        self.conn.executescript(INDEXES)
+
+    def segments(self) -> List[str]:
+        """Rotated segments oldest first, then the live file"""
+        paths = sorted(glob.glob(os.path.join(self.storage_dir, 'interactions-*.jsonl.gz')))
+        live = os.path.join(self.storage_dir, 'interactions.jsonl')
+        if os.path.exists(live):
+            paths.append(live)
+        return paths
+
+    @staticmethod
+    def _open(path: str) -> IO[bytes]:
+        return gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')
+
+    def sync(self) -> int:
+        """Ingest lines appended since the last sync; returns the number of new records"""
+        total = 0
+        completed = {row[0] for row in self.conn.execute("SELECT path FROM sources WHERE complete = 1")}
+        for path in self.segments():
+            rotated = path.endswith('.gz')
+            if rotated and path in completed:
+                continue
+            try:
+                with self._open(path) as f:
+                    first_line = f.readline()
+                    if not first_line.endswith(b'\n'):
+                        continue
+                    identity = hashlib.sha1(first_line).hexdigest()
+                    row = self.conn.execute("SELECT offset FROM sources WHERE identity = ?", (identity,)).fetchone()
+                    offset = row[0] if row else 0
+                    f.seek(offset)
+                    records, consumed = self._read_complete_lines(f)
+            except EOFError:
+                continue  # a segment still being compressed; read it once it is whole
+            # Read to the end without error, a rotated segment has nothing more to give
+            complete = rotated
+            if not consumed and not complete:
+                continue
+            with self.conn:
+                self._insert(records)
+                self.conn.execute(
+                    "INSERT INTO sources (identity, path, offset, complete) VALUES (?, ?, ?, ?)"
+                    " ON CONFLICT(identity) DO UPDATE SET path = excluded.path, offset = excluded.offset,"
+                    " complete = excluded.complete",
+                    (identity, path, offset + consumed, int(complete))
+                )
+            total += len(records)
+        return total
+
+    @staticmethod
+    def _read_complete_lines(f: IO[bytes]) -> Tuple[List[Dict], int]:
+        records, consumed = [], 0
+        for line in f:
+            if not line.endswith(b'\n'):
+                break  # a write in progress; pick it up next time
+            consumed += len(line)
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                logging.warning("Skipping malformed interaction log line")
+        return records, consumed
+
+    def _insert(self, records: List[Dict]) -> None:
+        for record in records:
+            message_type = record.get('message_type')
+            content = record.get('content')
+            cursor = self.conn.execute(
+                "INSERT INTO interactions"
+                " (ts, user_id, username, type, content, response, message_id, canonical, chat_id)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    record.get('timestamp'), record.get('user_id'), record.get('username'), message_type,
+                    content, record.get('response'), record.get('message_id'),
+                    canonicalize(content) if message_type == 'question' and content else None,
+                    record.get('chat_id')
+                )
+            )
+            if message_type == 'feedback':
+                try:
+                    feedback = json.loads(content)
+                except (TypeError, ValueError):
+                    continue
+                self.conn.execute(
+                    "INSERT INTO feedback (interaction_id, ts, user_id, message_id, score, comment, chat_id)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (cursor.lastrowid, record.get('timestamp'), record.get('user_id'),
+                     feedback.get('message_id'), feedback.get('score'), feedback.get('comment'),
+                     record.get('chat_id'))
+                )
+
+    @staticmethod
+    def _since(days: Optional[float]) -> str:
+        return (datetime.now() - timedelta(days=days)).isoformat() if days else ''
+
+    def top_questions(self, days: Optional[float] = 7, limit: int = 20) -> List[Tuple]:
+        """Most asked questions, grouping rephrasings by canonical form"""
+        return self.conn.execute(
+            "SELECT COUNT(*) AS asked, COUNT(DISTINCT user_id) AS users, MIN(content) AS example"
+            " FROM interactions WHERE type = 'question' AND ts >= ?"
+            " GROUP BY canonical ORDER BY asked DESC LIMIT ?",
+            (self._since(days), limit)
+        ).fetchall()
+
+    def user_history(self, user_id: int, days: Optional[float] = None, limit: int = 50) -> List[Tuple]:
+        return self.conn.execute(
+            "SELECT ts, type, content FROM interactions WHERE user_id = ? AND ts >= ?"
+            " ORDER BY ts DESC LIMIT ?",
+            (user_id, self._since(days), limit)
+        ).fetchall()
+
+    def ratings(self, days: Optional[float] = 30, limit: int = 50) -> List[Tuple]:
+        """Average /rate score per answered message, joined to the question asked in that chat"""
+        # IS, not =, so legacy rows without a chat_id still pair up with each other
+        return self.conn.execute(
+            "SELECT f.chat_id, f.message_id, AVG(f.score) AS avg_score, COUNT(f.score) AS ratings,"
+            " COUNT(f.comment) AS comments,"
+            " (SELECT q.content FROM interactions q WHERE q.type = 'question'"
+            "  AND q.chat_id IS f.chat_id AND q.message_id = f.message_id"
+            "  ORDER BY q.ts DESC LIMIT 1) AS question"
+            " FROM feedback f WHERE f.ts >= ? GROUP BY f.chat_id, f.message_id ORDER BY MAX(f.ts) DESC LIMIT ?",
+            (self._since(days), limit)
+        ).fetchall()
+
+    def counts_by_type(self, days: Optional[float] = 7) -> List[Tuple]:
+        return self.conn.execute(
+            "SELECT type, COUNT(*), COUNT(DISTINCT user_id) FROM interactions WHERE ts >= ?"
+            " GROUP BY type ORDER BY COUNT(*) DESC",
+            (self._since(days),)
+        ).fetchall()
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def _print_rows(headers: List[str], rows: Iterator[Tuple]) -> None:
+    print("\t".join(headers))
+    for row in rows:
+        print("\t".join("" if value is None else str(value) for value in row))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Reports over the LexCommunis interaction log")
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--no-sync', action='store_true', help="query the index without ingesting new lines")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('sync', help="ingest new log lines")
+    top = commands.add_parser('top-questions', help="most asked questions")
+    top.add_argument('--days', type=float, default=7)
+    top.add_argument('--limit', type=int, default=20)
+    user = commands.add_parser('user', help="one user's history")
+    user.add_argument('user_id', type=int)
+    user.add_argument('--days', type=float)
+    user.add_argument('--limit', type=int, default=50)
+    ratings = commands.add_parser('ratings', help="average rating per answer, with its question")
+    ratings.add_argument('--days', type=float, default=30)
+    ratings.add_argument('--limit', type=int, default=50)
+    summary = commands.add_parser('summary', help="interaction counts by type")
+    summary.add_argument('--days', type=float, default=7)
+
+    args = parser.parse_args(argv)
+    index = InteractionIndex(args.data_dir)
+    try:
+        if not args.no_sync or args.command == 'sync':
+            added = index.sync()
+            if args.command == 'sync':
+                print(f"Ingested {added} new interactions")
+        if args.command == 'top-questions':
+            _print_rows(['asked', 'users', 'question'], index.top_questions(args.days, args.limit))
+        elif args.command == 'user':
+            _print_rows(['timestamp', 'type', 'content'], index.user_history(args.user_id, args.days, args.limit))
+        elif args.command == 'ratings':
+            _print_rows(['chat_id', 'message_id', 'avg_score', 'ratings', 'comments', 'question'],
+                        index.ratings(args.days, args.limit))
+        elif args.command == 'summary':
+            _print_rows(['type', 'count', 'users'], index.counts_by_type(args.days))
+    finally:
+        index.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,48 @@
 # interaction_tracker.py
+import asyncio
+import gzip
 import json
-from datetime import datetime
+import logging
 import os
+import shutil
+from datetime import date, datetime
+from typing import List, Optional
+
+from config import (
+    INTERACTION_QUEUE_SIZE, INTERACTION_BATCH_SIZE, INTERACTION_FLUSH_INTERVAL,
+    INTERACTION_LOG_MAX_BYTES, INTERACTION_LOG_BLOCK_WHEN_FULL
+)
 
 class InteractionTracker:
-    def __init__(self, storage_dir='data'):
+    """Appends interactions to data/interactions.jsonl from a background writer.
+
+    log_interaction only queues the record. The writer batches records (flushing at
+    `batch_size` or every `flush_interval` seconds) and appends them in a worker
+    thread, so handlers never wait on the filesystem. When the queue is full records
+    are dropped and counted, unless `block_when_full` asks callers to wait instead.
+    The live file is rotated when it passes `max_bytes` or the day changes; rotated
+    segments are gzipped as interactions-<timestamp>.jsonl.gz.
+    """
+
+    def __init__(self, storage_dir='data', queue_size: int = INTERACTION_QUEUE_SIZE,
+                 batch_size: int = INTERACTION_BATCH_SIZE, flush_interval: float = INTERACTION_FLUSH_INTERVAL,
+                 max_bytes: int = INTERACTION_LOG_MAX_BYTES, block_when_full: bool = INTERACTION_LOG_BLOCK_WHEN_FULL):
         self.storage_dir = storage_dir
         if not os.path.exists(storage_dir):
             os.makedirs(storage_dir)
         self.log_file = os.path.join(storage_dir, 'interactions.jsonl')
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.block_when_full = block_when_full
+        self.queue: Optional[asyncio.Queue] = None
+        self.writer_task: Optional[asyncio.Task] = None
+        self.segment_day = self._file_day()
+        self.stats = {'queued': 0, 'written': 0, 'dropped': 0, 'batches': 0, 'rotations': 0, 'write_errors': 0}
 
-    async def log_interaction(self, user_id, username, message_type, content, response=None):
+    async def log_interaction(self, user_id, username, message_type, content, response=None, message_id=None,
+                              chat_id=None):
         interaction = {
             'timestamp': datetime.now().isoformat(),
             'user_id': user_id,
@@ -19,6 +51,101 @@ class InteractionTracker:
             'content': content,
             'response': response
         }
-        
+        if message_id is not None:
+            # Lets feedback (which references the question's message_id) be joined to it
+            interaction['message_id'] = message_id
+        if chat_id is not None:
+            # Message ids are per chat; together they identify the question
+            interaction['chat_id'] = chat_id
+        line = json.dumps(interaction) + '\n'
+
+        self._ensure_writer()
+        if self.block_when_full:
+            await self.queue.put(line)
+        else:
+            try:
+                self.queue.put_nowait(line)
+            except asyncio.QueueFull:
+                self.stats['dropped'] += 1
+                if self.stats['dropped'] % 1000 == 1:
+                    logging.warning(f"Interaction log queue full; {self.stats['dropped']} records dropped so far")
+                return
+        self.stats['queued'] += 1
+
+    def _ensure_writer(self) -> None:
+        # Created lazily so the queue and task belong to the running event loop
+        if self.writer_task is None or self.writer_task.done():
+            if self.queue is None:
+                self.queue = asyncio.Queue(maxsize=self.queue_size)
+            self.writer_task = asyncio.create_task(self._run_writer())
+
+    async def _run_writer(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            line = await self.queue.get()
+            if line is None:
+                return
+            batch = [line]
+            deadline = loop.time() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    line = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if line is None:
+                    stop = True
+                    break
+                batch.append(line)
+            await self._flush(batch)
+            if stop:
+                return
+
+    async def _flush(self, batch: List[str]) -> None:
+        try:
+            await asyncio.to_thread(self._write_batch, batch)
+            self.stats['written'] += len(batch)
+            self.stats['batches'] += 1
+        except Exception as e:
+            self.stats['write_errors'] += 1
+            logging.error(f"Error writing {len(batch)} interactions: {str(e)}")
+
+    def _write_batch(self, batch: List[str]) -> None:
+        data = ''.join(batch)
+        if self._needs_rotation(len(data.encode('utf-8'))):
+            self._rotate()
         with open(self.log_file, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(interaction) + '\n')
+            f.write(data)
+
+    def _needs_rotation(self, incoming: int) -> bool:
+        if not os.path.exists(self.log_file):
+            self.segment_day = date.today()
+            return False
+        size = os.path.getsize(self.log_file)
+        return size > 0 and (size + incoming > self.max_bytes or self.segment_day != date.today())
+
+    def _rotate(self) -> None:
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        segment = os.path.join(self.storage_dir, f'interactions-{stamp}.jsonl')
+        os.replace(self.log_file, segment)
+        with open(segment, 'rb') as src, gzip.open(segment + '.gz', 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(segment)
+        self.segment_day = date.today()
+        self.stats['rotations'] += 1
+
+    def _file_day(self) -> date:
+        if os.path.exists(self.log_file):
+            return date.fromtimestamp(os.path.getmtime(self.log_file))
+        return date.today()
+
+    async def close(self) -> None:
+        """Flush everything queued and stop the writer; call on shutdown"""
+        if self.writer_task is None or self.writer_task.done():
+            return
+        await self.queue.put(None)
+        await self.writer_task
+        logging.info(f"Interaction log closed: {self.stats}")
@@ -0,0 +1,208 @@
+# llm_scheduler.py
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Hashable, Optional
+
+from config import (
+    MAX_CONCURRENT_MODEL_CALLS, GEMINI_REQUESTS_PER_MINUTE, GEMINI_TOKENS_PER_MINUTE,
+    OPENAI_REQUESTS_PER_MINUTE, OPENAI_TOKENS_PER_MINUTE, OPENAI_MAX_CONCURRENCY,
+    SCREENING_REQUESTS_PER_MINUTE, SCREENING_TOKENS_PER_MINUTE
+)
+from metrics import span
+
+# Lower value is served first
+INTERACTIVE = 0
+BACKGROUND = 1
+
+
+class TokenBucket:
+    """Refills continuously at `rate_per_minute`, holding at most `capacity`"""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` is available (0 if it is now)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate if self.rate else float('inf')
+
+    def take(self, amount: float) -> None:
+        self.level -= min(amount, self.capacity)
+
+
+class _Waiter:
+    __slots__ = ('future', 'tokens', 'enqueued_at', 'user')
+
+    def __init__(self, future: asyncio.Future, tokens: int, user: Hashable):
+        self.future = future
+        self.tokens = tokens
+        self.enqueued_at = time.monotonic()
+        self.user = user
+
+
+class _ProviderQueue:
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float, max_concurrency: int):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.active = 0
+        # priority -> user -> FIFO of that user's waiters; users are served round-robin
+        self.levels: Dict[int, "OrderedDict[Hashable, Deque[_Waiter]]"] = {}
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.stats = {'granted': 0, 'cancelled': 0, 'wait_seconds_total': 0.0, 'wait_seconds_max': 0.0}
+
+    def depth(self) -> Dict[int, int]:
+        return {priority: sum(len(q) for q in users.values()) for priority, users in self.levels.items()}
+
+
+class LLMScheduler:
+    """Single gate for every model call.
+
+    Each provider gets token buckets sized to its requests/tokens-per-minute quota and
+    a concurrency limit. Waiting calls are queued by priority (interactive before
+    background) and, within a priority, round-robin across users so one user sending
+    many questions only ever holds one place in the rotation.
+    """
+
+    def __init__(self):
+        self.providers: Dict[str, _ProviderQueue] = {}
+
+    def register(self, provider: str, requests_per_minute: float, tokens_per_minute: float,
+                 max_concurrency: int) -> None:
+        self.providers[provider] = _ProviderQueue(requests_per_minute, tokens_per_minute, max_concurrency)
+
+    @asynccontextmanager
+    async def slot(self, provider: str, user_id: Optional[Hashable] = None,
+                   priority: int = INTERACTIVE, tokens: int = 0) -> AsyncIterator[None]:
+        """Hold a call slot for `provider`; `tokens` is the estimated request size"""
+        queue = self.providers[provider]
+        await self._acquire(provider, queue, user_id, priority, tokens)
+        try:
+            yield
+        finally:
+            queue.active -= 1
+            self._dispatch(provider)
+
+    async def _acquire(self, provider: str, queue: _ProviderQueue, user_id: Optional[Hashable],
+                       priority: int, tokens: int) -> None:
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), tokens, user_id)
+        users = queue.levels.setdefault(priority, OrderedDict())
+        users.setdefault(user_id, deque()).append(waiter)
+        self._dispatch(provider)
+        try:
+            with span('scheduler_wait', provider=provider):
+                await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted just as we were cancelled: hand the slot back
+                queue.active -= 1
+            else:
+                # Still queued: leave the queue now, so depth() stops counting it and a
+                # timer set for its tokens no longer holds back the callers behind it
+                self._remove_waiter(queue, priority, waiter)
+            self._dispatch(provider)
+            queue.stats['cancelled'] += 1
+            raise
+
+    def _dispatch(self, provider: str) -> None:
+        queue = self.providers[provider]
+        if queue.timer is not None:
+            queue.timer.cancel()
+            queue.timer = None
+
+        now = time.monotonic()
+        while queue.active < queue.max_concurrency:
+            waiter = self._next_waiter(queue)
+            if waiter is None:
+                return
+            delay = max(queue.requests.wait_time(1, now), queue.tokens.wait_time(waiter.tokens, now))
+            if delay > 0:
+                # Quota exhausted: retry when the buckets have refilled enough for this caller
+                queue.timer = asyncio.get_running_loop().call_later(delay, self._dispatch, provider)
+                return
+            self._pop_waiter(queue, waiter)
+            queue.requests.take(1)
+            queue.tokens.take(waiter.tokens)
+            queue.active += 1
+            waited = now - waiter.enqueued_at
+            queue.stats['granted'] += 1
+            queue.stats['wait_seconds_total'] += waited
+            queue.stats['wait_seconds_max'] = max(queue.stats['wait_seconds_max'], waited)
+            waiter.future.set_result(None)
+
+    @staticmethod
+    def _next_waiter(queue: _ProviderQueue) -> Optional[_Waiter]:
+        """Head of the highest-priority level, from the user whose turn it is"""
+        for priority in sorted(queue.levels):
+            users = queue.levels[priority]
+            while users:
+                user, waiters = next(iter(users.items()))
+                while waiters and waiters[0].future.cancelled():
+                    waiters.popleft()
+                if waiters:
+                    return waiters[0]
+                del users[user]
+        return None
+
+    @staticmethod
+    def _pop_waiter(queue: _ProviderQueue, waiter: _Waiter) -> None:
+        for users in queue.levels.values():
+            waiters = users.get(waiter.user)
+            if waiters and waiters[0] is waiter:
+                waiters.popleft()
+                # Send this user to the back of the rotation
+                del users[waiter.user]
+                if waiters:
+                    users[waiter.user] = waiters
+                return
+
+    @staticmethod
+    def _remove_waiter(queue: _ProviderQueue, priority: int, waiter: _Waiter) -> None:
+        users = queue.levels.get(priority, {})
+        waiters = users.get(waiter.user)
+        if waiters is None:
+            return
+        try:
+            waiters.remove(waiter)
+        except ValueError:
+            return
+        if not waiters:
+            del users[waiter.user]
+
+    def metrics(self) -> Dict[str, Dict]:
+        """Queue depth by priority, active calls and wait-time totals per provider"""
+        result = {}
+        for provider, queue in self.providers.items():
+            granted = queue.stats['granted']
+            result[provider] = dict(
+                queue.stats,
+                active=queue.active,
+                queue_depth=queue.depth(),
+                wait_seconds_avg=queue.stats['wait_seconds_total'] / granted if granted else 0.0
+            )
+        return result
+
+
+def create_scheduler() -> LLMScheduler:
+    """Scheduler with the Gemini and OpenAI quotas from config"""
+    scheduler = LLMScheduler()
+    scheduler.register('gemini', GEMINI_REQUESTS_PER_MINUTE, GEMINI_TOKENS_PER_MINUTE, MAX_CONCURRENT_MODEL_CALLS)
+    scheduler.register('openai', OPENAI_REQUESTS_PER_MINUTE, OPENAI_TOKENS_PER_MINUTE, OPENAI_MAX_CONCURRENCY)
+    scheduler.register('gemini_screening', SCREENING_REQUESTS_PER_MINUTE, SCREENING_TOKENS_PER_MINUTE,
+                       MAX_CONCURRENT_MODEL_CALLS)
+    logging.info(f"LLM scheduler limits: gemini {GEMINI_REQUESTS_PER_MINUTE} rpm / {GEMINI_TOKENS_PER_MINUTE} tpm, "
+                 f"openai {OPENAI_REQUESTS_PER_MINUTE} rpm / {OPENAI_TOKENS_PER_MINUTE} tpm")
+    return scheduler
@@ -2,6 +2,7 @@
 import logging
 import os
 from datetime import datetime
+from metrics import TraceIdFilter
 
 def setup_logger():
     # Create logs directory if it doesn't exist
@@ -11,13 +12,16 @@ def setup_logger():
     # Set up file handler with daily rotation
     log_file = f'logs/bot_{datetime.now().strftime("%Y%m%d")}.log'
     
-    # Configure logging
+    # Configure logging; [trace_id] groups the lines of one request ("-" outside requests)
+    handlers = [
+        logging.FileHandler(log_file),
+        logging.StreamHandler()
+    ]
+    for handler in handlers:
+        handler.addFilter(TraceIdFilter())
     logging.basicConfig(
         level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_file),
-            logging.StreamHandler()
-        ]
+        format='%(asctime)s - %(name)s - %(levelname)s - [%(trace_id)s] %(message)s',
+        handlers=handlers
     )
     return logging.getLogger(__name__)
\ No newline at end of file
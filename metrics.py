@@ -0,0 +1,233 @@
+# metrics.py
+import contextvars
+import logging
+import math
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds; spans run from sub-millisecond cache hits to minute-long model calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+PREFIX = "lexcommunis_"
+_INF_BUCKET = 'le="+Inf"'
+
+LabelValues = Tuple[str, ...]
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str], lock: threading.Lock):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.lock = lock
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _format_labels(self, values: LabelValues, extra: str = "") -> str:
+        pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def set(self, value: float, **labels) -> None:
+        """Mirror a total that is already counted elsewhere (an existing stats dict)"""
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{self._format_labels(key)} {_number(value)}" for key, value in self.values.items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(*args)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [bucket counts..., sum, count]
+        self.values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self.lock:
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = []
+        for key, series in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = 'le="%s"' % _number(bound)
+                lines.append(f"{self.name}_bucket{self._format_labels(key, le)} {cumulative}")
+            lines.append(f"{self.name}_bucket{self._format_labels(key, _INF_BUCKET)} {series[-1]}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {_number(series[-2])}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {series[-1]}")
+        return lines
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if isinstance(value, float) and (math.isinf(value) or math.isnan(value)):
+        return "+Inf" if value > 0 else ("-Inf" if value < 0 else "NaN")
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    """Metrics by name, rendered in the Prometheus text exposition format.
+
+    Writers run on the bot's event loop and the scrape runs on the web server's
+    thread, so every update and the render share one lock. Callbacks registered
+    with on_collect() refresh gauges from existing stats just before each scrape.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics: Dict[str, _Metric] = {}
+        self.collectors: List[Callable[[], None]] = []
+
+    def _get(self, cls, name: str, help_text: str, labelnames: Sequence[str], **kwargs) -> _Metric:
+        name = PREFIX + name
+        metric = self.metrics.get(name)
+        if metric is None:
+            with self.lock:
+                metric = self.metrics.get(name)
+                if metric is None:
+                    metric = self.metrics[name] = cls(name, help_text, labelnames, self.lock, **kwargs)
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get(Counter, name, help_text, labelnames)
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def on_collect(self, callback: Callable[[], None]) -> None:
+        self.collectors.append(callback)
+
+    def render(self) -> str:
+        for callback in self.collectors:
+            try:
+                callback()
+            except Exception as e:
+                logging.error(f"Metrics collector failed: {str(e)}")
+        lines = []
+        with self.lock:
+            for name in sorted(self.metrics):
+                metric = self.metrics[name]
+                lines.append(f"# HELP {name} {metric.help}")
+                lines.append(f"# TYPE {name} {metric.kind}")
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "stage_seconds", "Time spent per request stage", ("stage", "outcome")
+)
+
+# Per-request trace id, and per-trace seconds by stage for the summary log line
+_trace_id: contextvars.ContextVar[str] = contextvars.ContextVar("trace_id", default="-")
+_trace_stages: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    "trace_stages", default=None
+)
+
+
+def start_trace() -> str:
+    """Give the current task (and tasks it creates) a fresh trace id"""
+    trace_id = uuid.uuid4().hex[:12]
+    _trace_id.set(trace_id)
+    _trace_stages.set({})
+    return trace_id
+
+
+def current_trace() -> str:
+    return _trace_id.get()
+
+
+def trace_summary() -> str:
+    """Seconds per stage for the current trace, slowest first"""
+    stages = _trace_stages.get() or {}
+    return ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in sorted(stages.items(), key=lambda s: -s[1]))
+
+
+@contextmanager
+def span(stage: str, **labels) -> Iterator[Dict[str, str]]:
+    """Time a block as `stage`.
+
+    The duration goes into the stage_seconds histogram labelled with the outcome
+    ("ok" or the exception type) and, if labels are given, into a per-stage
+    histogram with those labels. The yielded dict can be updated inside the block
+    to set label values discovered there (a cache hit/miss, say); a stage must use
+    the same label names on every call.
+    """
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield labels
+    except BaseException as e:
+        outcome = type(e).__name__
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=stage, outcome=outcome)
+        if labels:
+            REGISTRY.histogram(
+                f"{stage}_seconds", f"Time spent in {stage.replace('_', ' ')}", sorted(labels)
+            ).observe(elapsed, **labels)
+        stages = _trace_stages.get()
+        if stages is not None:
+            stages[stage] = stages.get(stage, 0.0) + elapsed
+        logging.debug(f"span {stage} {elapsed * 1000:.1f}ms {outcome} {labels or ''}")
+
+
+class TraceIdFilter(logging.Filter):
+    """Adds %(trace_id)s to every record so log lines can be grouped per request"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = _trace_id.get()
+        return True
@@ -0,0 +1,168 @@
+# openai_client.py
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from config import (
+    OPENAI_API_KEY, OPENAI_BASE_URL, OPENAI_TIMEOUT, OPENAI_CONNECT_TIMEOUT, OPENAI_MAX_RETRIES,
+    OPENAI_RETRY_BUDGET_RATIO, OPENAI_HEDGE_AFTER, OPENAI_POOL_CONNECTIONS
+)
+
+
+class RetryBudget:
+    """Caps retries (and hedges) at a fraction of recent first attempts.
+
+    Each request deposits `ratio` tokens and each retry withdraws one, so during an
+    outage retries add at most `ratio` extra load instead of multiplying it. A small
+    floor lets a quiet process still retry the odd failure.
+    """
+
+    def __init__(self, ratio: float = 0.1, min_per_second: float = 0.5, window: float = 20.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.capacity = max(1.0, min_per_second * window)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def deposit(self) -> None:
+        self.level = min(self.capacity, self.level + self.ratio)
+
+    def withdraw(self) -> bool:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.min_per_second)
+        self.updated = now
+        if self.level < 1:
+            return False
+        self.level -= 1
+        return True
+
+
+class ChatClient:
+    """One long-lived AsyncOpenAI client shared by every caller.
+
+    The underlying httpx pool keeps connections alive between calls. Each attempt is
+    bounded by the configured timeouts. Failed attempts are retried with full-jitter
+    exponential backoff while the retry budget allows. If `hedge_after` is set and the
+    first attempt has not answered by then, a second identical request is raised and
+    the first response wins. The SDK's own retries are disabled so that only this
+    policy applies.
+    """
+
+    def __init__(self, api_key: str = OPENAI_API_KEY, base_url: Optional[str] = OPENAI_BASE_URL or None,
+                 timeout: float = OPENAI_TIMEOUT, connect_timeout: float = OPENAI_CONNECT_TIMEOUT,
+                 max_retries: int = OPENAI_MAX_RETRIES, retry_budget_ratio: float = OPENAI_RETRY_BUDGET_RATIO,
+                 hedge_after: float = OPENAI_HEDGE_AFTER, pool_connections: int = OPENAI_POOL_CONNECTIONS):
+        self.max_retries = max_retries
+        self.hedge_after = hedge_after
+        self.retry_budget = RetryBudget(retry_budget_ratio)
+        self.settings = dict(api_key=api_key, base_url=base_url, timeout=timeout,
+                             connect_timeout=connect_timeout, pool_connections=pool_connections)
+        self._client = None
+        self._errors = None
+        self.stats = {
+            'requests': 0, 'attempts': 0, 'retries': 0, 'retries_denied': 0,
+            'hedges': 0, 'hedge_wins': 0, 'failures': 0
+        }
+
+    @property
+    def client(self):
+        """The AsyncOpenAI client, built on first use so importing openai stays off the startup path"""
+        if self._client is None:
+            self.warm_up()
+        return self._client
+
+    def warm_up(self) -> None:
+        """Import openai and build the client now; safe to call from a worker thread"""
+        if self._client is not None:
+            return
+        import openai
+        settings = self.settings
+        timeout = httpx.Timeout(settings['timeout'], connect=settings['connect_timeout'])
+        pool_connections = settings['pool_connections']
+        self._errors = (
+            # Retryable; APIConnectionError includes APITimeoutError
+            (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError),
+            openai.APIError,
+        )
+        self._client = openai.AsyncOpenAI(
+            api_key=settings['api_key'] or "unset",
+            base_url=settings['base_url'],
+            max_retries=0,
+            timeout=timeout,
+            http_client=openai.DefaultAsyncHttpxClient(
+                limits=httpx.Limits(max_connections=pool_connections, max_keepalive_connections=pool_connections),
+                timeout=timeout,
+            ),
+        )
+
+    async def complete(self, model: str, messages: List[Dict[str, str]], **kwargs) -> Any:
+        """chat.completions.create with retries and optional hedging"""
+        self.stats['requests'] += 1
+        self.retry_budget.deposit()
+        self.warm_up()
+        retryable_errors, api_error = self._errors
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await self._attempt(model, messages, kwargs)
+            except retryable_errors as e:
+                if attempt == self.max_retries or not self.retry_budget.withdraw():
+                    if attempt < self.max_retries:
+                        self.stats['retries_denied'] += 1
+                    self.stats['failures'] += 1
+                    raise
+                delay = self._backoff(attempt, e)
+                logging.warning(f"OpenAI call failed ({type(e).__name__}); retry {attempt + 1} in {delay:.2f}s")
+                self.stats['retries'] += 1
+                await asyncio.sleep(delay)
+            except api_error:
+                self.stats['failures'] += 1
+                raise
+
+    @staticmethod
+    def _backoff(attempt: int, error: Exception) -> float:
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), 30.0)
+            except ValueError:
+                pass
+        return random.uniform(0, min(8.0, 0.5 * 2 ** attempt))
+
+    async def _attempt(self, model: str, messages: List[Dict[str, str]], kwargs: Dict[str, Any]) -> Any:
+        def request() -> asyncio.Task:
+            self.stats['attempts'] += 1
+            return asyncio.ensure_future(self.client.chat.completions.create(model=model, messages=messages, **kwargs))
+
+        primary = request()
+        if not self.hedge_after:
+            return await primary
+
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+            if not done and self.retry_budget.withdraw():
+                self.stats['hedges'] += 1
+                tasks.append(request())
+            while True:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    tasks.remove(task)
+                    if task.exception() is None or not tasks:
+                        if task is not primary:
+                            self.stats['hedge_wins'] += 1
+                        return task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def metrics(self) -> Dict[str, Any]:
+        return dict(self.stats, retry_budget=round(self.retry_budget.level, 2))
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.close()
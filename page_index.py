@@ -0,0 +1,107 @@
+# page_index.py
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few for from further
+had has have having he her here hers him his how i if in into is it its itself just me more
+most my no nor not now of off on once only or other our ours out over own same she should so
+some such than that the their theirs them then there these they this those through to too
+under until up very was we were what when where which while who whom why will with would
+you your yours uk guide please tell explain know need
+""".split())
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+class PageIndex:
+    """BM25 index over the text of each PDF page.
+
+    The guide's extracted text has most spaces stripped ("thefcaregime"), so pages
+    are indexed by character n-grams rather than words. Query words are turned into
+    the same n-grams, which lets "fca" or "stablecoin" match inside run-together text.
+    """
+
+    def __init__(self, page_texts: List[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.page_count = len(page_texts)
+        self.postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self.page_lengths: List[int] = []
+
+        for page_num, text in enumerate(page_texts):
+            terms = Counter(self._page_terms(text))
+            self.page_lengths.append(sum(terms.values()))
+            for term, freq in terms.items():
+                self.postings[term][page_num] = freq
+
+        total = sum(self.page_lengths)
+        self.avg_length = total / self.page_count if self.page_count else 0.0
+
+    @staticmethod
+    def _page_terms(text: str) -> Iterable[str]:
+        for run in _WORD_RE.findall(text.lower()):
+            for n in (3, 4):
+                for i in range(len(run) - n + 1):
+                    yield run[i:i + n]
+
+    @staticmethod
+    def query_terms(question: str) -> List[str]:
+        """N-gram terms for the content words of a question"""
+        terms = []
+        for word in _WORD_RE.findall(question.lower()):
+            if word in STOPWORDS or len(word) < 3:
+                continue
+            if len(word) == 3:
+                terms.append(word)
+            else:
+                terms.extend(word[i:i + 4] for i in range(len(word) - 3))
+        return list(dict.fromkeys(terms))
+
+    def idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (self.page_count - df + 0.5) / (df + 0.5))
+
+    def score(self, question: str) -> List[Tuple[int, float]]:
+        """(page_number, score) for every page matching the question, best first"""
+        scores: Dict[int, float] = defaultdict(float)
+        for term in self.query_terms(question):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for page_num, freq in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.page_lengths[page_num] / self.avg_length)
+                scores[page_num] += idf * freq * (self.k1 + 1) / (freq + norm)
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+    def top_pages(self, question: str, k: int) -> List[int]:
+        """Page numbers of the k best pages, in page order"""
+        return sorted(page_num for page_num, _ in self.score(question)[:k])
+
+    def top_ranges(self, question: str, k: int, window: int = 0) -> List[Tuple[int, int]]:
+        """Top-k pages widened by `window` neighbours and merged into (start, end) ranges"""
+        return self.widen(self.top_pages(question, k), window)
+
+    def widen(self, pages: Iterable[int], window: int) -> List[Tuple[int, int]]:
+        """Pages plus `window` neighbours either side, merged into (start, end) ranges"""
+        widened = set()
+        for page_num in pages:
+            lo = max(0, page_num - window)
+            hi = min(self.page_count, page_num + window + 1)
+            widened.update(range(lo, hi))
+        return self.to_ranges(widened)
+
+    @staticmethod
+    def to_ranges(pages: Iterable[int]) -> List[Tuple[int, int]]:
+        """Collapse page numbers into sorted half-open (start, end) ranges"""
+        ranges: List[Tuple[int, int]] = []
+        for page_num in sorted(set(pages)):
+            if ranges and ranges[-1][1] == page_num:
+                ranges[-1] = (ranges[-1][0], page_num + 1)
+            else:
+                ranges.append((page_num, page_num + 1))
+        return ranges
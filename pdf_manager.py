@@ -2,165 +2,572 @@
 import os
 import logging
 import pypdf
+import hashlib
 import json
 import time
 import asyncio
-from typing import Dict, List, Tuple, AsyncGenerator
-import vertexai
-from vertexai.generative_models import GenerativeModel, Part
+import io
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional, Tuple, AsyncGenerator
+from config import (
+    CONCURRENT_CHUNKS, RETRIEVAL_TOP_K, RETRIEVAL_PAGE_WINDOW,
+    RESPONSE_CACHE_MEMORY_ENTRIES, RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_TTL,
+    NEAR_DUPLICATE_THRESHOLD, STREAM_RESPONSES, CHUNK_STRATEGY, CHUNK_TARGET_TOKENS, CHAPTER_PAGE_OFFSET,
+    GEMINI_MODEL, SCREENING, SCREENING_MODEL, SCREENING_MIN_RATIO, SCREENING_MIN_SCORE,
+    SYNTHESIS, SYNTHESIS_DEDUPE_THRESHOLD, SYNTHESIS_MAX_CHARS
+)
+from answer_synthesis import get_synthesizer
+from chunking import Chunk, estimate_tokens, get_chunking_strategy
+from metrics import REGISTRY, span
+from llm_scheduler import INTERACTIVE, LLMScheduler, create_scheduler
+from page_index import PageIndex
+from question_matcher import NearDuplicateIndex, canonicalize
+from relevance_screening import ModelScreener, Routes, get_screener
+from single_flight import SingleFlight
+from response_cache import LRUCache, TieredCache, create_cache_backend, create_key_set
+
+if TYPE_CHECKING:
+    from vertexai.generative_models import GenerativeModel
+
+# A page selection within one chunk: half-open (start, end) page ranges
+PageRanges = List[Tuple[int, int]]
+
+# Receives (chunk_index, text so far) while an answer streams in
+PartialCallback = Callable[[int, str], Awaitable[None]]
+
+# Output allowance used when estimating a call's token cost for the scheduler
+MAX_ANSWER_TOKENS = 1024
+
+# Starts the answer given in place of a section whose model call failed
+CHUNK_ERROR = "Error processing section"
+
+# Time to first token against time to the whole answer, to compare streaming with unary calls
+MODEL_LATENCY = REGISTRY.histogram(
+    "model_latency_seconds", "Answer model call latency by mode, to the first token and in total", ("mode", "phase")
+)
 
 class LegalGuideManager:
-    def __init__(self, project_id: str, location: str = "us-central1", cache_dir: str = ".cache"):
-        vertexai.init(project=project_id, location=location)
-        self.model = GenerativeModel("gemini-1.5-pro-002")
+    def __init__(self, project_id: str, location: str = "us-central1", cache_dir: str = ".cache",
+                 scheduler: Optional[LLMScheduler] = None, model: Optional["GenerativeModel"] = None,
+                 screening: str = SCREENING, screening_model: Optional["GenerativeModel"] = None,
+                 synthesis: str = SYNTHESIS):
+        """Cheap: the models, cache and guide are loaded by start(), in the background"""
+        self.project_id = project_id
+        self.location = location
+        self.model = model
+        # A cheap pass that drops irrelevant chunks before they reach the answer model
+        self.screener = get_screener(screening, SCREENING_MIN_RATIO, SCREENING_MIN_SCORE)
+        self.screening_model = screening_model
+        # Merges the section answers into one; None sends each section on its own
+        self.synthesizer = get_synthesizer(synthesis, SYNTHESIS_DEDUPE_THRESHOLD, SYNTHESIS_MAX_CHARS)
+        # Settings that change a whole answer (which pages are asked, how sections are merged),
+        # so merged and sent answers are only reused under the settings that produced them
+        settings = [
+            GEMINI_MODEL, CHUNK_STRATEGY, CHUNK_TARGET_TOKENS, CHAPTER_PAGE_OFFSET,
+            RETRIEVAL_TOP_K, RETRIEVAL_PAGE_WINDOW,
+            screening, SCREENING_MODEL, SCREENING_MIN_RATIO, SCREENING_MIN_SCORE,
+            synthesis, SYNTHESIS_DEDUPE_THRESHOLD, SYNTHESIS_MAX_CHARS,
+        ]
+        self.settings_digest = hashlib.sha256(json.dumps(settings).encode()).hexdigest()[:12]
         self.cache_dir = os.path.abspath(cache_dir)
         self.pdf_chunks = []
         self.chunk_ranges = []
-        self.cache = {}
-        
-        if not os.path.exists(self.cache_dir):
-            os.makedirs(self.cache_dir)
-            
-        self._load_cache()
+        self.chunk_spans = []
+        self.chunk_parts = []
+        self.page_tokens = []
+        self.guide_version = None
+        self.layout_digest = None  # Chunk layout; chunk indexes in cache keys only mean something under it
+        self.reader = None
+        self.reader_lock = threading.Lock()  # pypdf readers are not thread-safe
+        self.page_index = None
+        self.cache = None
+        self.question_index = NearDuplicateIndex(threshold=min(NEAR_DUPLICATE_THRESHOLD, 1.0))
+        self.questions = None  # Canonical questions answered, persisted for question_index
+        self.inflight = SingleFlight()  # stats['coalesced'] counts model calls saved
+        # Every Gemini call is paced and queued fairly by the scheduler shared with TL;DR
+        self.scheduler = scheduler or create_scheduler()
         
+        self.load_seconds: Dict[str, float] = {}
+        self._loading: Optional[Future] = None
+        self._loading_lock = threading.Lock()
+
+    def start(self) -> Future:
+        """Begin loading in a background thread; calls while it runs share one future"""
+        with self._loading_lock:
+            # A failed load is retried by the next caller rather than failing every question
+            if self._loading is None or (self._loading.done() and self._loading.exception() is not None):
+                executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='guide-load')
+                self._loading = executor.submit(self.load)
+                executor.shutdown(wait=False)
+        return self._loading
+
+    def loaded(self) -> bool:
+        """Whether the guide has finished loading, without starting or waiting for it"""
+        loading = self._loading
+        return loading is not None and loading.done() and loading.exception() is None
+
+    async def ready(self) -> None:
+        """Wait until the guide has loaded, starting the load if nothing has yet"""
+        await asyncio.wrap_future(self.start())
+
+    def load(self) -> None:
+        """Set up the model, open the response cache and load the guide, concurrently.
+
+        The three are independent, so a cold start costs the slowest of them (usually
+        importing vertexai) instead of their sum.
+        """
+        started = time.perf_counter()
+        os.makedirs(self.cache_dir, exist_ok=True)
         pdf_path = os.path.join(os.path.dirname(__file__), "uk_crypto_law_guide.pdf")
-        self._initialize_pdf(pdf_path)
+        steps = {
+            'model': self._load_model,
+            'response_cache': self._load_cache,
+            'guide': lambda: self._initialize_pdf(pdf_path),
+        }
+        with ThreadPoolExecutor(max_workers=len(steps), thread_name_prefix='guide-load') as pool:
+            futures = {name: pool.submit(self._timed, name, step) for name, step in steps.items()}
+            for future in futures.values():
+                future.result()
+        # Needs both the model library and the chunk files
+        self._timed('parts', self._build_parts)
+        self.load_seconds['total'] = time.perf_counter() - started
+        logging.info("Guide loaded in " + ", ".join(
+            f"{name} {seconds:.2f}s" for name, seconds in self.load_seconds.items()))
+
+    def _timed(self, name: str, step: Callable[[], None]) -> None:
+        started = time.perf_counter()
+        with span('startup', step=name):
+            step()
+        self.load_seconds[name] = time.perf_counter() - started
+
+    def _load_model(self) -> None:
+        # Deferred: importing vertexai takes about two seconds. Chunk parts need it
+        # even when a model was passed in.
+        import vertexai
+        from vertexai.generative_models import GenerativeModel
+        needs_screening_model = isinstance(self.screener, ModelScreener) and self.screening_model is None
+        if self.model is None or needs_screening_model:
+            vertexai.init(project=self.project_id, location=self.location)
+        if self.model is None:
+            self.model = GenerativeModel(GEMINI_MODEL)
+        if needs_screening_model:
+            self.screening_model = GenerativeModel(SCREENING_MODEL)
+
+    def _build_parts(self) -> None:
+        from vertexai.generative_models import Part
+        self.chunk_parts = []
+        for chunk_file in self.pdf_chunks:
+            with open(chunk_file, 'rb') as f:
+                self.chunk_parts.append(Part.from_data(data=f.read(), mime_type="application/pdf"))
 
-    async def process_chunk(self, question: str, chunk_index: int) -> str:
-        """Process a single chunk with improved error handling"""
-        cache_key = f"{question.lower().strip()}_{chunk_index}"
+    def resolve_question(self, question: str) -> str:
+        """Canonical cache key for a question, or that of a near-duplicate already answered.
+
+        Another question answered meanwhile can change the result, so resolve once per
+        question and pass the key to every later stage.
+        """
+        canonical = canonicalize(question)
+        if NEAR_DUPLICATE_THRESHOLD > 1:
+            return canonical
+        match = self.question_index.lookup(canonical)
+        if match and match[0] != canonical:
+            logging.info(f"Near-duplicate question (score {match[1]:.3f}): '{canonical}' -> '{match[0]}'")
+            return match[0]
+        return canonical
+
+    def cache_key(self, question_key: str, chunk_index: int, page_ranges: Optional[PageRanges] = None) -> str:
+        cache_key = f"{question_key}_{self.layout_digest}_{chunk_index}"
+        if page_ranges:
+            cache_key += "_p" + ",".join(f"{start}-{end}" for start, end in page_ranges)
+        return cache_key
+
+    async def process_chunk(self, question: str, chunk_index: int,
+                            page_ranges: Optional[PageRanges] = None,
+                            question_key: Optional[str] = None,
+                            user_id: Optional[int] = None, priority: int = INTERACTIVE,
+                            on_partial: Optional[PartialCallback] = None, lookup: bool = True) -> str:
+        """Process a single chunk, or only the given pages of it.
+
+        `lookup=False` skips the cache read when the caller has just missed it.
+        """
+        question_key = question_key or self.resolve_question(question)
+        cache_key = self.cache_key(question_key, chunk_index, page_ranges)
         
-        if cache_key in self.cache:
-            await asyncio.sleep(0.1)  # Small delay for cached responses
-            return self.cache[cache_key]
+        if lookup:
+            with span('cache_lookup', cache='response', result='miss') as labels:
+                cached = await self.cache.get(cache_key)
+                if cached is not None:
+                    labels['result'] = 'hit'
+            if cached is not None:
+                return cached
         
         try:
-            pdf_file = Part.from_data(
-                data=open(self.pdf_chunks[chunk_index], "rb").read(),
-                mime_type="application/pdf"
+            # Identical questions arriving together share one model call
+            return await self.inflight.do(
+                cache_key,
+                lambda: self._analyze_chunk(question, chunk_index, page_ranges, cache_key, question_key,
+                                            user_id, priority, on_partial)
             )
-            
-            prompt = (
-                f"{question}\n\n"
-                "Please analyze this section and provide:\n"
-                "1. Key relevant information\n"
-                "2. Brief, factual responses\n"
-                "3. Specific references when applicable\n"
-                "\nKeep the response clear and concise."
-            )
-            
-            chat = self.model.start_chat()
-            response = chat.send_message([pdf_file, prompt])
-            
-            if response and response.text:
-                # Clean the response
-                clean_text = self._sanitize_response(response.text)
-                self.cache[cache_key] = clean_text
-                self._save_cache()
-                return clean_text
-            
-            return None
-            
         except Exception as e:
             logging.error(f"Error processing chunk {chunk_index}: {str(e)}")
-            return f"Error processing section {chunk_index + 1}. Please try again."
+            return f"{CHUNK_ERROR} {chunk_index + 1}. Please try again."
 
-    async def process_chunks_stream(self, question: str) -> AsyncGenerator[str, None]:
-        """Improved async generator for chunk processing"""
-        if not self.pdf_chunks:
-            yield "Error: No document loaded. Please try again later."
-            return
+    async def _analyze_chunk(self, question: str, chunk_index: int, page_ranges: Optional[PageRanges],
+                             cache_key: str, question_key: str,
+                             user_id: Optional[int], priority: int,
+                             on_partial: Optional[PartialCallback] = None) -> Optional[str]:
+        """Ask the model about one chunk and cache the cleaned answer"""
+        pdf_file, tokens = await self.chunk_content(chunk_index, page_ranges)
+        
+        prompt = (
+            f"{question}\n\n"
+            "Please analyze this section and provide:\n"
+            "1. Key relevant information\n"
+            "2. Brief, factual responses\n"
+            "3. Specific references when applicable\n"
+            "\nKeep the response clear and concise."
+        )
+        
+        # Input pages plus prompt, and room for the answer
+        tokens += estimate_tokens(prompt) + MAX_ANSWER_TOKENS
+        async with self.scheduler.slot('gemini', user_id, priority, tokens):
+            chat = self.model.start_chat()
+            started = time.monotonic()
+            mode = 'stream' if STREAM_RESPONSES and on_partial else 'unary'
+            with span('model_call', chunk=str(chunk_index), mode=mode):
+                if mode == 'stream':
+                    text, first_token_at = await self._stream_answer(
+                        chat, [pdf_file, prompt], chunk_index, on_partial
+                    )
+                else:
+                    response = await chat.send_message_async([pdf_file, prompt])
+                    text = response.text if response else ""
+                    first_token_at = time.monotonic()
+            finished = time.monotonic()
+
+        MODEL_LATENCY.observe((first_token_at or finished) - started, mode=mode, phase='first_token')
+        MODEL_LATENCY.observe(finished - started, mode=mode, phase='total')
+        logging.info(f"Chunk {chunk_index} {mode} call: first token "
+                     f"{(first_token_at or finished) - started:.2f}s, total {finished - started:.2f}s")
+        
+        if text:
+            # Stored as the model wrote it; telegram_markdown renders it when it is sent
+            clean_text = text.strip()
+            await self.cache.set(cache_key, clean_text)
+            self.question_index.add(question_key)
+            await self.questions.add(question_key)
+            return clean_text
+        
+        return None
+
+    async def chunk_content(self, chunk_index: int, page_ranges: Optional[PageRanges] = None) -> Tuple[Any, int]:
+        """The PDF part to send for a chunk (or just the given pages of it), and its estimated tokens"""
+        if page_ranges:
+            with span('chunk_load', chunk=str(chunk_index)):
+                data = await asyncio.to_thread(self._extract_pages, page_ranges)
+            from vertexai.generative_models import Part
+            pdf_file = Part.from_data(data=data, mime_type="application/pdf")
+        else:
+            pdf_file = self.chunk_parts[chunk_index]
+            page_ranges = [self.chunk_spans[chunk_index]]
+        return pdf_file, sum(sum(self.page_tokens[start:end]) for start, end in page_ranges)
 
-        for chunk_index in range(len(self.pdf_chunks)):
+    @staticmethod
+    async def _stream_answer(chat, content, chunk_index: int,
+                             on_partial: PartialCallback) -> Tuple[str, Optional[float]]:
+        """Consume a streamed answer, reporting the text so far after each piece"""
+        text = ""
+        first_token_at = None
+        async for piece in await chat.send_message_async(content, stream=True):
             try:
-                response = await self.process_chunk(question, chunk_index)
-                if response:
-                    yield response
-                await asyncio.sleep(0.2)  # Small delay between chunks
+                piece_text = piece.text
+            except ValueError:
+                # Pieces carrying only finish/safety metadata have no text
+                continue
+            if not piece_text:
+                continue
+            if first_token_at is None:
+                first_token_at = time.monotonic()
+            text += piece_text
+            if on_partial is None:
+                continue
+            try:
+                await on_partial(chunk_index, text)
             except Exception as e:
-                logging.error(f"Error in chunk {chunk_index}: {str(e)}")
-                yield f"Error processing section {chunk_index + 1}. Continuing with remaining sections..."
+                # A failed preview must not cost the answer; stop previewing this one
+                logging.warning(f"Partial answer callback for chunk {chunk_index} failed: {str(e)}")
+                on_partial = None
+        return text, first_token_at
 
-    def _sanitize_response(self, text: str) -> str:
-        """Clean and format response text"""
-        if not text:
-            return ""
-            
-        # Remove problematic markdown
-        text = text.replace('```', '')
-        
-        # Ensure proper markdown formatting
-        lines = []
-        for line in text.splitlines():
-            line = line.strip()
-            if line:
-                # Fix unmatched markdown symbols
-                asterisk_count = line.count('*')
-                if asterisk_count % 2 != 0:
-                    line = line.replace('*', '')
-                
-                underscore_count = line.count('_')
-                if underscore_count % 2 != 0:
-                    line = line.replace('_', '')
-                
-                lines.append(line)
-        
-        # Join with proper spacing
-        return '\n\n'.join(lines)
+    def route_question(self, question: str, top_k: int = RETRIEVAL_TOP_K,
+                       window: int = RETRIEVAL_PAGE_WINDOW,
+                       question_key: Optional[str] = None) -> Dict[int, Optional[PageRanges]]:
+        """Map each chunk worth asking about to the page ranges to send (None = whole chunk).
+
+        Chunks come most relevant first, by the best BM25 score among their top pages.
+        """
+        all_chunks = {chunk_index: None for chunk_index in range(len(self.pdf_chunks))}
+        if top_k <= 0 or not self.page_index:
+            return all_chunks
+
+        # Route on the resolved key so near-duplicates pick the same pages (and cache keys)
+        top = self.page_index.score(question_key or self.resolve_question(question))[:top_k]
+        if not top:
+            # Nothing in the index matched; let the model look at everything
+            return all_chunks
+
+        routes: Dict[int, PageRanges] = {}
+        for start, end in self.page_index.widen([page_num for page_num, _ in top], window):
+            for chunk_index, (chunk_start, chunk_end) in enumerate(self.chunk_spans):
+                lo, hi = max(start, chunk_start), min(end, chunk_end)
+                if lo < hi:
+                    routes.setdefault(chunk_index, []).append((lo, hi))
+
+        # `top` is best first, so a chunk's first top page is its best; chunks reached only
+        # through the window's neighbours go last
+        order = []
+        for page_num, _ in top:
+            for chunk_index, (chunk_start, chunk_end) in enumerate(self.chunk_spans):
+                if chunk_start <= page_num < chunk_end and chunk_index not in order:
+                    order.append(chunk_index)
+        order += [chunk_index for chunk_index in routes if chunk_index not in order]
+        return {chunk_index: routes[chunk_index] for chunk_index in order}
+
+    async def screen(self, question: str, routes: Routes, user_id: Optional[int] = None,
+                     priority: int = INTERACTIVE, question_key: Optional[str] = None) -> Routes:
+        """The routes worth sending to the answer model, per the SCREENING setting"""
+        if self.screener is None:
+            return routes
+        return await self.screener.screen(self, question, question_key or self.resolve_question(question),
+                                          routes, user_id, priority)
+
+    def synthesis_key(self, question_key: str) -> str:
+        return f"{question_key}_{self.layout_digest}_synthesis-{self.synthesizer.name}-{self.settings_digest}"
+
+    async def cached_synthesis(self, question_key: str) -> Optional[str]:
+        """The merged answer to an earlier asking of this question, if it is cached"""
+        with span('cache_lookup', cache='synthesis', result='miss') as labels:
+            cached = await self.cache.get(self.synthesis_key(question_key))
+            if cached is not None:
+                labels['result'] = 'hit'
+        return cached
+
+    async def synthesize(self, question: str, question_key: str, responses: Dict[int, str], routes: Routes,
+                         user_id: Optional[int] = None, priority: int = INTERACTIVE) -> str:
+        """One answer from the section answers, cached under the question unless a section failed"""
+        # Routes are in relevance order; failed sections have nothing to contribute
+        order = list(routes) + sorted(set(responses) - set(routes))
+        failed = [chunk_index for chunk_index in order if chunk_index in responses
+                  and (chunk_index < 0 or responses[chunk_index].startswith(CHUNK_ERROR))]
+        # A routed section with no answer (the model returned nothing) leaves the answer incomplete
+        missing = [chunk_index for chunk_index in routes if not responses.get(chunk_index)]
+        sections = [
+            (self.section_label(chunk_index, routes.get(chunk_index)), responses[chunk_index])
+            for chunk_index in order if chunk_index in responses and chunk_index not in failed
+        ]
+        if not sections:
+            return "\n\n".join(responses[chunk_index] for chunk_index in failed)
+        key = self.synthesis_key(question_key)
+
+        async def synthesize() -> str:
+            answer = await self.synthesizer.synthesize(self, question, sections, user_id, priority)
+            if not failed and not missing:
+                await self.cache.set(key, answer)
+            return answer
+
+        if failed or missing:
+            return await synthesize()
+        return await self.inflight.do(key, synthesize)
+
+    def section_label(self, chunk_index: int, page_ranges: Optional[PageRanges] = None) -> str:
+        """Human-readable name for a chunk, narrowed to the pages actually sent"""
+        label = self.chunk_ranges[chunk_index]
+        if page_ranges:
+            pages = ", ".join(
+                f"{start + 1}" if end - start == 1 else f"{start + 1}-{end}"
+                for start, end in page_ranges
+            )
+            label += f" - relevant pages {pages}"
+        return label
+
+    async def process_chunks_stream(self, question: str,
+                                    concurrent: bool = CONCURRENT_CHUNKS,
+                                    routes: Optional[Dict[int, Optional[PageRanges]]] = None,
+                                    user_id: Optional[int] = None, priority: int = INTERACTIVE,
+                                    on_partial: Optional[PartialCallback] = None,
+                                    question_key: Optional[str] = None
+                                    ) -> AsyncGenerator[Tuple[int, Optional[str]], None]:
+        """Yield (chunk_index, response) pairs, in completion order when concurrent"""
+        if not self.pdf_chunks:
+            yield -1, "Error: No document loaded. Please try again later."
+            return
+
+        question_key = question_key or self.resolve_question(question)
+        if routes is None:
+            routes = self.route_question(question, question_key=question_key)
+
+        # Every section's cached answer in one lookup: a single MGET when the cache is shared
+        keys = {chunk_index: self.cache_key(question_key, chunk_index, page_ranges)
+                for chunk_index, page_ranges in routes.items()}
+        with span('cache_lookup', cache='response', result='miss') as labels:
+            cached = await self.cache.get_many(list(keys.values()))
+            if cached:
+                labels['result'] = 'hit' if len(cached) == len(keys) else 'partial'
+
+        if not concurrent:
+            for chunk_index, page_ranges in routes.items():
+                if keys[chunk_index] in cached:
+                    yield chunk_index, cached[keys[chunk_index]]
+                else:
+                    yield await self._process_indexed_chunk(question, chunk_index, page_ranges, question_key,
+                                                            user_id, priority, on_partial)
+            return
+
+        for chunk_index in routes:
+            if keys[chunk_index] in cached:
+                yield chunk_index, cached[keys[chunk_index]]
+        tasks = [
+            asyncio.create_task(self._process_indexed_chunk(question, chunk_index, page_ranges, question_key,
+                                                            user_id, priority, on_partial))
+            for chunk_index, page_ranges in routes.items()
+            if keys[chunk_index] not in cached
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Consumer stopped early (error or disconnect): don't leave calls running
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _process_indexed_chunk(self, question: str, chunk_index: int,
+                                     page_ranges: Optional[PageRanges] = None,
+                                     question_key: Optional[str] = None, user_id: Optional[int] = None,
+                                     priority: int = INTERACTIVE,
+                                     on_partial: Optional[PartialCallback] = None) -> Tuple[int, Optional[str]]:
+        try:
+            return chunk_index, await self.process_chunk(question, chunk_index, page_ranges, question_key,
+                                                         user_id, priority, on_partial, lookup=False)
+        except Exception as e:
+            logging.error(f"Error in chunk {chunk_index}: {str(e)}")
+            return chunk_index, f"{CHUNK_ERROR} {chunk_index + 1}. Continuing with remaining sections..."
 
     def _initialize_pdf(self, file_path: str) -> None:
-        """Initialize PDF with better error handling"""
+        """Load chunk artifacts for the guide, building them only if this PDF/chunking is new"""
         try:
             if not os.path.exists(file_path):
                 logging.error(f"PDF file not found at: {file_path}")
                 return
-                
-            reader = pypdf.PdfReader(file_path)
-            total_pages = len(reader.pages)
-            
-            # Split into quarters
-            chunk_size = total_pages // 4
-            chunks = [
-                ("First Quarter", 0, chunk_size),
-                ("Second Quarter", chunk_size, chunk_size * 2),
-                ("Third Quarter", chunk_size * 2, chunk_size * 3),
-                ("Fourth Quarter", chunk_size * 3, total_pages)
-            ]
+
+            with open(file_path, 'rb') as f:
+                pdf_bytes = f.read()
+            self.guide_version = hashlib.sha256(pdf_bytes).hexdigest()[:16]
+            reader = pypdf.PdfReader(io.BytesIO(pdf_bytes))
+            artifact_dir = os.path.join(self.cache_dir, "artifacts", self.guide_version)
+            page_texts = self._load_page_texts(reader, artifact_dir)
+
+            strategy = get_chunking_strategy(
+                CHUNK_STRATEGY,
+                os.path.join(os.path.dirname(os.path.abspath(file_path)), "chapters.json"),
+                page_offset=CHAPTER_PAGE_OFFSET,
+                target_tokens=CHUNK_TARGET_TOKENS
+            )
+            chunks = strategy.chunk(page_texts)
+
+            # Artifacts are content-addressed: the source PDF hash, then the exact chunk layout
+            layout_digest = hashlib.sha256(json.dumps(chunks).encode()).hexdigest()[:12]
+            chunk_dir = os.path.join(artifact_dir, f"chunks-{layout_digest}")
+            self._ensure_chunk_artifacts(reader, chunks, chunk_dir)
             
             # Clear existing chunks
             self.pdf_chunks = []
             self.chunk_ranges = []
+            self.chunk_spans = []
+            self.chunk_parts = []
             
             for chunk_index, (chunk_name, start, end) in enumerate(chunks):
-                writer = pypdf.PdfWriter()
-                for page_num in range(start, end):
-                    writer.add_page(reader.pages[page_num])
-                
-                chunk_file = os.path.join(self.cache_dir, f"chunk_{chunk_index}.pdf")
-                with open(chunk_file, 'wb') as f:
-                    writer.write(f)
-                
+                chunk_file = os.path.join(chunk_dir, f"chunk_{chunk_index}.pdf")
                 self.pdf_chunks.append(chunk_file)
                 self.chunk_ranges.append(f"{chunk_name} (Pages {start+1}-{end})")
+                self.chunk_spans.append((start, end))
+
+            self.reader = reader
+            self.layout_digest = layout_digest
+            self.page_tokens = [estimate_tokens(text) for text in page_texts]
+            self.page_index = PageIndex(page_texts)
             
         except Exception as e:
             logging.error(f"Error initializing PDF: {str(e)}")
             raise
 
-    def _load_cache(self):
-        cache_file = os.path.join(self.cache_dir, "response_cache.json")
-        if os.path.exists(cache_file):
-            with open(cache_file, 'r') as f:
-                self.cache = json.load(f)
+    def _ensure_chunk_artifacts(self, reader: pypdf.PdfReader, chunks: List[Chunk],
+                                chunk_dir: str) -> None:
+        """Write chunk PDFs unless a previous run (or another process) already has"""
+        manifest_path = os.path.join(chunk_dir, "manifest.json")
+        if os.path.exists(manifest_path):
+            return
 
-    def _save_cache(self):
-        with open(os.path.join(self.cache_dir, "response_cache.json"), 'w') as f:
-            json.dump(self.cache, f)
+        os.makedirs(chunk_dir, exist_ok=True)
+        for chunk_index, (_, start, end) in enumerate(chunks):
+            writer = pypdf.PdfWriter()
+            for page_num in range(start, end):
+                writer.add_page(reader.pages[page_num])
+            buffer = io.BytesIO()
+            writer.write(buffer)
+            self._atomic_write(os.path.join(chunk_dir, f"chunk_{chunk_index}.pdf"), buffer.getvalue())
 
-    def __del__(self):
-        try:
-            for chunk_file in self.pdf_chunks:
-                if os.path.exists(chunk_file):
-                    os.remove(chunk_file)
-        except:
-            pass
\ No newline at end of file
+        # The manifest is written last, so its presence means every chunk file is complete
+        self._atomic_write(manifest_path, json.dumps({'chunks': chunks}).encode())
+        logging.info(f"Built chunk artifacts in {chunk_dir}")
+
+    def _load_page_texts(self, reader: pypdf.PdfReader, artifact_dir: str) -> List[str]:
+        """Per-page text for the retrieval index; extraction is slow, so it is stored once per PDF"""
+        pages_path = os.path.join(artifact_dir, "pages.json")
+        if os.path.exists(pages_path):
+            with open(pages_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+
+        page_texts = [page.extract_text() or "" for page in reader.pages]
+        os.makedirs(artifact_dir, exist_ok=True)
+        self._atomic_write(pages_path, json.dumps(page_texts).encode('utf-8'))
+        return page_texts
+
+    @staticmethod
+    def _atomic_write(path: str, data: bytes) -> None:
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _extract_pages(self, page_ranges: PageRanges) -> bytes:
+        """Build an in-memory PDF holding only the given pages"""
+        with self.reader_lock:
+            writer = pypdf.PdfWriter()
+            for start, end in page_ranges:
+                for page_num in range(start, end):
+                    writer.add_page(self.reader.pages[page_num])
+            buffer = io.BytesIO()
+            writer.write(buffer)
+        return buffer.getvalue()
+
+    def _load_cache(self):
+        """Open the response cache and fill the near-duplicate index from the stored set of
+        answered questions"""
+        durable = create_cache_backend(
+            "response_cache",
+            cache_dir=self.cache_dir,
+            max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+            max_bytes=RESPONSE_CACHE_MAX_BYTES,
+            default_ttl=RESPONSE_CACHE_TTL or None
+        )
+        self.cache = TieredCache(
+            LRUCache(max_entries=RESPONSE_CACHE_MEMORY_ENTRIES, default_ttl=RESPONSE_CACHE_TTL or None),
+            durable
+        )
+        # Its own set, not the cache's keys: scanning a shared Redis keyspace would stall startup,
+        # and keys from older layouts or key formats name questions that no longer resolve
+        self.questions = create_key_set("questions", cache_dir=self.cache_dir)
+        for question_key in self.questions.members():
+            self.question_index.add(question_key)
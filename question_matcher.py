@@ -0,0 +1,156 @@
+# question_matcher.py
+import re
+import unicodedata
+import zlib
+from collections import OrderedDict, defaultdict
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+import numpy as np
+
+from page_index import STOPWORDS
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+# Contracted negations, spelled out so "isn't" and "is not" give the same terms
+_NEGATION_RES = (
+    (re.compile(r"\bcan(?:'t|not)\b"), "can not"),
+    (re.compile(r"\bwon't\b"), "will not"),
+    (re.compile(r"n't\b"), " not"),
+)
+# Longest suffix first; each rule is (suffix, replacement, minimum stem length)
+_SUFFIX_RULES = (
+    ("ational", "ate", 3), ("ization", "ize", 3), ("fulness", "ful", 3), ("iveness", "ive", 3),
+    ("ations", "ate", 3), ("ation", "ate", 3), ("ments", "", 4), ("ment", "", 4),
+    ("ness", "", 3), ("ings", "", 3), ("ing", "", 3), ("ies", "y", 2), ("ied", "y", 2),
+    ("ers", "er", 3), ("ed", "", 3), ("es", "", 3), ("ly", "", 3), ("s", "", 3),
+)
+
+
+def stem(word: str) -> str:
+    """Light suffix-stripping stemmer; enough to fold plurals and verb forms together"""
+    if len(word) <= 3 or word.isdigit():
+        return word
+    for suffix, replacement, min_stem in _SUFFIX_RULES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= min_stem:
+            if suffix == "s" and word.endswith("ss"):
+                return word
+            return word[:-len(suffix)] + replacement
+    return word
+
+
+# Stopwords for retrieval that change what a question asks: negation, time order and
+# direction. "Is a DAO a security?" and "Is a DAO not a security?" must not share a key.
+POLARITY_WORDS = frozenset("""
+no nor not against before after above below under over until during only more most few off up down
+""".split())
+CANONICAL_STOPWORDS = STOPWORDS - POLARITY_WORDS
+POLARITY_TERMS = frozenset(stem(word) for word in POLARITY_WORDS)
+
+
+def polarity(canonical: str) -> FrozenSet[str]:
+    """The polarity words in a canonical question; questions that differ in them differ in meaning"""
+    return frozenset(canonical.split()) & POLARITY_TERMS
+
+
+def expand_negations(text: str) -> str:
+    """Lowercase `text` with contracted negations spelled out ("isn't" -> "is not")"""
+    text = text.replace("\u2019", "'").lower()
+    for pattern, replacement in _NEGATION_RES:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def canonicalize(question: str) -> str:
+    """Normalise a question so trivially different phrasings share a cache key.
+
+    Case, accents, whitespace, punctuation, stopwords, inflection and word order are
+    all discarded: "What is a DAO?" and "dao - what is it" both become "dao".
+    Negation and other POLARITY_WORDS are kept.
+    """
+    text = unicodedata.normalize("NFKD", expand_negations(question)).encode("ascii", "ignore").decode()
+    words = _WORD_RE.findall(text)
+    terms = sorted({stem(word) for word in words if len(word) > 1 and word not in CANONICAL_STOPWORDS})
+    if not terms:
+        # All stopwords ("what is it?"): keep the words rather than collapse to ""
+        terms = sorted(set(words))
+    return " ".join(terms)
+
+
+class NearDuplicateIndex:
+    """MinHash/LSH index over canonical questions.
+
+    Questions are shingled into character trigrams, signed with `num_perm` MinHash
+    functions and bucketed by LSH bands, so a lookup only compares against the few
+    stored questions that share a band. Candidates are confirmed with exact Jaccard
+    similarity on their shingle sets, and must have the same polarity words: "dao
+    not security" is close to "dao security" in characters but asks the opposite.
+    """
+
+    _PRIME = (1 << 61) - 1
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 64, bands: int = 16,
+                 max_entries: int = 20000, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_entries = max_entries
+        rng = np.random.default_rng(seed)
+        self.perm_a = rng.integers(1, 1 << 31, size=num_perm, dtype=np.uint64)
+        self.perm_b = rng.integers(0, 1 << 31, size=num_perm, dtype=np.uint64)
+        self.entries: "OrderedDict[str, Tuple[FrozenSet[str], List[bytes]]]" = OrderedDict()
+        self.buckets: Dict[Tuple[int, bytes], Set[str]] = defaultdict(set)
+
+    @staticmethod
+    def shingles(canonical: str) -> FrozenSet[str]:
+        padded = f" {canonical} "
+        return frozenset(padded[i:i + 3] for i in range(max(1, len(padded) - 2)))
+
+    def _band_keys(self, shingles: FrozenSet[str]) -> List[bytes]:
+        hashes = np.array([zlib.crc32(s.encode()) for s in shingles], dtype=np.uint64)
+        # Universal hashing (a*x + b) mod p for every permutation at once; a*x + b stays below 2^64
+        signature = ((np.outer(hashes, self.perm_a) + self.perm_b) % np.uint64(self._PRIME)).min(axis=0)
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def add(self, canonical: str) -> None:
+        if canonical in self.entries:
+            self.entries.move_to_end(canonical)
+            return
+        shingles = self.shingles(canonical)
+        band_keys = self._band_keys(shingles)
+        self.entries[canonical] = (shingles, band_keys)
+        for band, key in enumerate(band_keys):
+            self.buckets[(band, key)].add(canonical)
+        while len(self.entries) > self.max_entries:
+            self._remove(next(iter(self.entries)))
+
+    def _remove(self, canonical: str) -> None:
+        _, band_keys = self.entries.pop(canonical)
+        for band, key in enumerate(band_keys):
+            bucket = self.buckets[(band, key)]
+            bucket.discard(canonical)
+            if not bucket:
+                del self.buckets[(band, key)]
+
+    def lookup(self, canonical: str) -> Optional[Tuple[str, float]]:
+        """Best stored match as (canonical, jaccard), or None below the threshold"""
+        if canonical in self.entries:
+            return canonical, 1.0
+        shingles = self.shingles(canonical)
+        candidates = set()
+        for band, key in enumerate(self._band_keys(shingles)):
+            candidates.update(self.buckets.get((band, key), ()))
+
+        best = None
+        wanted = polarity(canonical)
+        for candidate in candidates:
+            if polarity(candidate) != wanted:
+                continue
+            other = self.entries[candidate][0]
+            score = len(shingles & other) / len(shingles | other)
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (candidate, score)
+        return best
+
+    def __len__(self) -> int:
+        return len(self.entries)
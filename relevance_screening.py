@@ -0,0 +1,165 @@
+# relevance_screening.py
+import asyncio
+import logging
+import re
+from typing import TYPE_CHECKING, Dict, Optional
+
+from llm_scheduler import INTERACTIVE
+from metrics import REGISTRY, span
+from response_cache import LRUCache
+
+if TYPE_CHECKING:
+    from pdf_manager import LegalGuideManager, PageRanges
+
+# chunk_index -> page ranges to send (None = whole chunk), as returned by route_question
+Routes = Dict[int, Optional["PageRanges"]]
+
+SCREENED_CHUNKS = REGISTRY.counter(
+    "screened_chunks_total", "Chunks screened before the answer model, by decision", ("screener", "decision")
+)
+
+SCREENING_PROMPT = (
+    "Question: {question}\n\n"
+    "How useful is this section of the guide for answering the question? "
+    "Reply with a single integer from 0 (nothing relevant) to 10 (answers it directly)."
+)
+
+_SCORE_RE = re.compile(r"\d+")
+
+
+class Screener:
+    """Decides which routed chunks are worth a call to the answer model.
+
+    Subclasses score each chunk; chunks below the threshold are dropped. The best
+    chunk is always kept, so a question still gets an answer, and a chunk that
+    could not be scored is kept too.
+    """
+
+    name = ""
+
+    def __init__(self):
+        self.stats = {'questions': 0, 'kept': 0, 'skipped': 0}
+
+    async def screen(self, guide: "LegalGuideManager", question: str, question_key: str, routes: Routes,
+                     user_id: Optional[int] = None, priority: int = INTERACTIVE) -> Routes:
+        if len(routes) <= 1:
+            return routes
+        with span('screening', screener=self.name):
+            scores = await self.scores(guide, question, question_key, routes, user_id, priority)
+        if not scores:
+            return routes
+        best = max(scores, key=scores.get)
+        kept = {
+            chunk_index: page_ranges for chunk_index, page_ranges in routes.items()
+            if chunk_index == best or chunk_index not in scores or self.relevant(scores[chunk_index], scores)
+        }
+        skipped = len(routes) - len(kept)
+        self.stats['questions'] += 1
+        self.stats['kept'] += len(kept)
+        self.stats['skipped'] += skipped
+        SCREENED_CHUNKS.inc(len(kept), screener=self.name, decision='kept')
+        SCREENED_CHUNKS.inc(skipped, screener=self.name, decision='skipped')
+        if skipped:
+            logging.info(f"Screening ({self.name}) skipped chunks "
+                         f"{sorted(set(routes) - set(kept))} of {sorted(routes)}: {scores}")
+        return kept
+
+    async def scores(self, guide: "LegalGuideManager", question: str, question_key: str, routes: Routes,
+                     user_id: Optional[int], priority: int) -> Dict[int, float]:
+        raise NotImplementedError
+
+    def relevant(self, score: float, scores: Dict[int, float]) -> bool:
+        raise NotImplementedError
+
+
+class KeywordScreener(Screener):
+    """Scores chunks by their best-matching page in the BM25 page index; no model call.
+
+    A chunk is kept if that page scores at least `min_ratio` of the best page overall.
+    """
+
+    name = "keyword"
+
+    def __init__(self, min_ratio: float = 0.35):
+        super().__init__()
+        self.min_ratio = min_ratio
+
+    async def scores(self, guide: "LegalGuideManager", question: str, question_key: str, routes: Routes,
+                     user_id: Optional[int], priority: int) -> Dict[int, float]:
+        if not guide.page_index:
+            return {}
+        scores: Dict[int, float] = {}
+        for page_num, score in guide.page_index.score(question_key):
+            for chunk_index in routes:
+                start, end = guide.chunk_spans[chunk_index]
+                if start <= page_num < end:
+                    scores[chunk_index] = max(scores.get(chunk_index, 0.0), score)
+        # Chunks with no matching page at all score zero
+        return {chunk_index: scores.get(chunk_index, 0.0) for chunk_index in routes} if scores else {}
+
+    def relevant(self, score: float, scores: Dict[int, float]) -> bool:
+        return score >= self.min_ratio * max(scores.values())
+
+
+class ModelScreener(Screener):
+    """Asks a small, fast model to rate each chunk 0-10, concurrently; keeps those at `min_score` or above.
+
+    Ratings are remembered per question key and pages, so near-duplicate questions
+    are screened once. Calls go through the scheduler's "gemini_screening" queue.
+    """
+
+    name = "model"
+
+    def __init__(self, min_score: float = 4, cache_entries: int = 4096):
+        super().__init__()
+        self.min_score = min_score
+        self.ratings = LRUCache(max_entries=cache_entries)
+        self.stats.update(calls=0, failures=0)
+
+    async def scores(self, guide: "LegalGuideManager", question: str, question_key: str, routes: Routes,
+                     user_id: Optional[int], priority: int) -> Dict[int, float]:
+        ratings = await asyncio.gather(*(
+            self._rate(guide, question, question_key, chunk_index, page_ranges, user_id, priority)
+            for chunk_index, page_ranges in routes.items()
+        ))
+        return {chunk_index: rating for chunk_index, rating in zip(routes, ratings) if rating is not None}
+
+    async def _rate(self, guide: "LegalGuideManager", question: str, question_key: str, chunk_index: int,
+                    page_ranges: Optional["PageRanges"], user_id: Optional[int], priority: int) -> Optional[float]:
+        key = guide.cache_key(question_key, chunk_index, page_ranges)
+        cached = await self.ratings.get(key)
+        if cached is not None:
+            return float(cached)
+        prompt = SCREENING_PROMPT.format(question=question)
+        try:
+            content, tokens = await guide.chunk_content(chunk_index, page_ranges)
+            async with guide.scheduler.slot('gemini_screening', user_id, priority, tokens + len(prompt) // 4 + 8):
+                self.stats['calls'] += 1
+                with span('model_call', chunk=str(chunk_index), mode='screening'):
+                    response = await guide.screening_model.start_chat().send_message_async([content, prompt])
+            match = _SCORE_RE.search(response.text if response else "")
+            if not match:
+                raise ValueError(f"no rating in {response.text[:40] if response else None!r}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.stats['failures'] += 1
+            logging.warning(f"Screening chunk {chunk_index} failed, keeping it: {str(e)}")
+            return None
+        rating = float(min(int(match.group()), 10))
+        await self.ratings.set(key, str(rating))
+        return rating
+
+    def relevant(self, score: float, scores: Dict[int, float]) -> bool:
+        return score >= self.min_score
+
+
+def get_screener(name: str, min_ratio: float = 0.35, min_score: float = 4) -> Optional[Screener]:
+    """Screener for the SCREENING setting; None when screening is off"""
+    if name == 'off':
+        return None
+    if name == KeywordScreener.name:
+        return KeywordScreener(min_ratio)
+    if name == ModelScreener.name:
+        return ModelScreener(min_score)
+    raise ValueError(f"Unknown screening mode: {name}")
@@ -0,0 +1,558 @@
+# response_cache.py
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from config import CACHE_DIR, CACHE_KEY_PREFIX, CACHE_URL, REDIS_TIMEOUT
+
+
+class CacheBackend:
+    """Interface shared by the response cache tiers.
+
+    Values are strings; `ttl` is in seconds and None means the backend default.
+    """
+
+    def __init__(self):
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'writes': 0}
+
+    async def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    async def get_many(self, keys: List[str]) -> Dict[str, str]:
+        """Values for those keys that are present; network backends do this in one round trip"""
+        values = {}
+        for key in keys:
+            value = await self.get(key)
+            if value is not None:
+                values[key] = value
+        return values
+
+    async def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def keys(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+    def usage(self) -> Dict[str, int]:
+        return {'entries': len(self)}
+
+    def _record(self, value: Optional[str]) -> Optional[str]:
+        self.stats['hits' if value is not None else 'misses'] += 1
+        return value
+
+
+class LRUCache(CacheBackend):
+    """In-process tier: bounded by entry count, least recently used evicted first"""
+
+    def __init__(self, max_entries: int = 1024, default_ttl: Optional[float] = None):
+        super().__init__()
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.entries: "OrderedDict[str, Tuple[str, Optional[float]]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return self._record(None)
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.time():
+            del self.entries[key]
+            self.stats['expirations'] += 1
+            return self._record(None)
+        self.entries.move_to_end(key)
+        return self._record(value)
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        ttl = self.default_ttl if ttl is None else ttl
+        self.entries[key] = (value, time.time() + ttl if ttl else None)
+        self.entries.move_to_end(key)
+        self.stats['writes'] += 1
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    async def delete(self, key: str) -> None:
+        self.entries.pop(key, None)
+
+    def keys(self) -> Iterator[str]:
+        return iter(list(self.entries))
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+class SQLiteCache(CacheBackend):
+    """Durable tier backed by SQLite in WAL mode.
+
+    Each write is a single-row upsert in its own transaction, so a crash can lose at
+    most the write in progress and never corrupts existing entries. Entry count and
+    total value size are tracked in memory; once either limit is exceeded the least
+    recently accessed rows are evicted. With `compress` values are stored
+    zlib-compressed and the byte limit applies to the compressed size.
+
+    Database work runs in worker threads, off the event loop. Reads do not write:
+    access times only need to order evictions, so a hit is noted in memory when the
+    stored time is more than `access_resolution` seconds old, and the noted times
+    are written in one batch (when `access_batch` are pending, before evicting, or
+    on close).
+    """
+
+    def __init__(self, path: str, max_entries: int = 100_000, max_bytes: int = 256 * 1024 * 1024,
+                 default_ttl: Optional[float] = None, compress: bool = False,
+                 access_resolution: float = 60.0, access_batch: int = 256):
+        super().__init__()
+        self.access_resolution = access_resolution
+        self.access_batch = access_batch
+        self.accessed: Dict[str, float] = {}  # access times not yet written
+        self.path = path
+        self.compress = compress
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " expires_at REAL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed_at)")
+        self.entry_count, self.total_bytes = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+
+    async def get(self, key: str) -> Optional[str]:
+        return self._record((await asyncio.to_thread(self._get_rows, [key])).get(key))
+
+    async def get_many(self, keys: List[str]) -> Dict[str, str]:
+        if not keys:
+            return {}
+        values = await asyncio.to_thread(self._get_rows, keys)
+        for key in keys:
+            self._record(values.get(key))
+        return values
+
+    def _get_rows(self, keys: List[str]) -> Dict[str, str]:
+        now = time.time()
+        values = {}
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT key, value, expires_at, size, accessed_at FROM entries"
+                f" WHERE key IN ({','.join('?' * len(keys))})", keys
+            ).fetchall()
+            for key, value, expires_at, size, accessed_at in rows:
+                if expires_at is not None and expires_at <= now:
+                    self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    self.accessed.pop(key, None)
+                    self.entry_count -= 1
+                    self.total_bytes -= size
+                    self.stats['expirations'] += 1
+                    continue
+                if now - accessed_at > self.access_resolution:
+                    self.accessed[key] = now
+                values[key] = zlib.decompress(value).decode('utf-8') if isinstance(value, bytes) else value
+            if len(self.accessed) >= self.access_batch:
+                self._write_accessed()
+        return values
+
+    def _write_accessed(self) -> None:
+        """Write the access times noted since the last batch; call with the lock held"""
+        if not self.accessed:
+            return
+        self.conn.execute("BEGIN")
+        try:
+            self.conn.executemany(
+                "UPDATE entries SET accessed_at = ? WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self.accessed.items()]
+            )
+        except sqlite3.Error:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+        self.accessed.clear()
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        await asyncio.to_thread(self._upsert, key, value, ttl)
+
+    def _upsert(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        ttl = self.default_ttl if ttl is None else ttl
+        now = time.time()
+        encoded = value.encode('utf-8')
+        stored = zlib.compress(encoded) if self.compress else value
+        size = len(stored) if self.compress else len(encoded)
+        with self.lock:
+            previous = self.conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self.conn.execute(
+                "INSERT INTO entries (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET value = excluded.value, size = excluded.size,"
+                " expires_at = excluded.expires_at, accessed_at = excluded.accessed_at",
+                (key, stored, size, now + ttl if ttl else None, now)
+            )
+            self.accessed.pop(key, None)
+            if previous:
+                self.total_bytes += size - previous[0]
+            else:
+                self.entry_count += 1
+                self.total_bytes += size
+            self.stats['writes'] += 1
+            self._evict()
+
+    def _evict(self) -> None:
+        """Drop expired rows, then least recently accessed ones, until under both limits"""
+        if self.entry_count <= self.max_entries and self.total_bytes <= self.max_bytes:
+            return
+        # Evict by up-to-date access times
+        self._write_accessed()
+        removed = self.conn.execute(
+            "DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at <= ? RETURNING size",
+            (time.time(),)
+        ).fetchall()
+        self._forget(removed, 'expirations')
+        while self.entry_count > self.max_entries or self.total_bytes > self.max_bytes:
+            batch = max(1, self.entry_count - self.max_entries, self.entry_count // 100)
+            removed = self.conn.execute(
+                "DELETE FROM entries WHERE key IN"
+                " (SELECT key FROM entries ORDER BY accessed_at LIMIT ?) RETURNING size",
+                (batch,)
+            ).fetchall()
+            if not removed:
+                break
+            self._forget(removed, 'evictions')
+
+    def _forget(self, removed, counter: str) -> None:
+        self.entry_count -= len(removed)
+        self.total_bytes -= sum(size for (size,) in removed)
+        self.stats[counter] += len(removed)
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(self._delete, key)
+
+    def _delete(self, key: str) -> None:
+        with self.lock:
+            removed = self.conn.execute(
+                "DELETE FROM entries WHERE key = ? RETURNING size", (key,)
+            ).fetchall()
+            self.accessed.pop(key, None)
+            self.entry_count -= len(removed)
+            self.total_bytes -= sum(size for (size,) in removed)
+
+    def keys(self) -> Iterator[str]:
+        with self.lock:
+            rows = self.conn.execute("SELECT key FROM entries").fetchall()
+        return (key for (key,) in rows)
+
+    def __len__(self) -> int:
+        return self.entry_count
+
+    def usage(self) -> Dict[str, int]:
+        return {'entries': self.entry_count, 'bytes': self.total_bytes}
+
+    def close(self) -> None:
+        with self.lock:
+            self._write_accessed()
+            self.conn.close()
+
+
+class TieredCache(CacheBackend):
+    """A fast in-memory tier in front of a durable one; reads fill the memory tier"""
+
+    def __init__(self, memory: CacheBackend, durable: CacheBackend):
+        super().__init__()
+        self.memory = memory
+        self.durable = durable
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await self.memory.get(key)
+        if value is None:
+            value = await self.durable.get(key)
+            if value is not None:
+                await self.memory.set(key, value)
+        return self._record(value)
+
+    async def get_many(self, keys: List[str]) -> Dict[str, str]:
+        values = {}
+        for key in keys:
+            value = await self.memory.get(key)
+            if value is not None:
+                values[key] = value
+        missing = [key for key in keys if key not in values]
+        if missing:
+            found = await self.durable.get_many(missing)
+            for key, value in found.items():
+                await self.memory.set(key, value)
+            values.update(found)
+        for key in keys:
+            self._record(values.get(key))
+        return values
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        await self.durable.set(key, value, ttl)
+        await self.memory.set(key, value, ttl)
+        self.stats['writes'] += 1
+
+    async def delete(self, key: str) -> None:
+        await self.memory.delete(key)
+        await self.durable.delete(key)
+
+    def keys(self) -> Iterator[str]:
+        return self.durable.keys()
+
+    def __len__(self) -> int:
+        return len(self.durable)
+
+    def metrics(self) -> Dict[str, Dict[str, int]]:
+        """Counters per tier, plus current sizes"""
+        return {
+            'total': dict(self.stats),
+            'memory': dict(self.memory.stats, **self.memory.usage()),
+            'durable': dict(self.durable.stats, **self.durable.usage()),
+        }
+
+    def close(self) -> None:
+        self.memory.close()
+        self.durable.close()
+
+
+class RedisCache(CacheBackend):
+    """Shared tier on a Redis-protocol server, so every instance sees the same entries.
+
+    get_many() is a single MGET. Values of COMPRESS_MIN bytes or more are stored
+    zlib-compressed behind a one-byte marker. Expiry is left to Redis (SET EX), and
+    so are the size limits: run it with a maxmemory policy such as allkeys-lru. A
+    cache must never fail a request, so a Redis error counts as a miss, or as a
+    dropped write, and is logged.
+    """
+
+    COMPRESS_MIN = 512
+
+    def __init__(self, url: str, prefix: str = CACHE_KEY_PREFIX, default_ttl: Optional[float] = None,
+                 timeout: float = REDIS_TIMEOUT):
+        super().__init__()
+        # Deferred: redis is only needed when CACHE_URL points at it
+        import redis
+        import redis.asyncio
+        self.url = url
+        self.prefix = prefix
+        self.default_ttl = default_ttl
+        self.errors = (redis.RedisError, OSError)
+        self.client = redis.asyncio.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+        # keys() and __len__ are called from worker threads and the metrics scrape
+        self.sync_client = redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+        self.stats['errors'] = 0
+
+    @classmethod
+    def _encode(cls, value: str) -> bytes:
+        encoded = value.encode('utf-8')
+        if len(encoded) >= cls.COMPRESS_MIN:
+            return b'z' + zlib.compress(encoded)
+        return b's' + encoded
+
+    @staticmethod
+    def _decode(stored: Optional[bytes]) -> Optional[str]:
+        if stored is None:
+            return None
+        body = stored[1:]
+        return (zlib.decompress(body) if stored[:1] == b'z' else body).decode('utf-8')
+
+    def _failed(self, operation: str, error: Exception) -> None:
+        self.stats['errors'] += 1
+        logging.warning(f"Redis {operation} failed: {type(error).__name__}: {str(error)}")
+
+    async def get(self, key: str) -> Optional[str]:
+        try:
+            stored = await self.client.get(self.prefix + key)
+        except self.errors as e:
+            self._failed('GET', e)
+            stored = None
+        return self._record(self._decode(stored))
+
+    async def get_many(self, keys: List[str]) -> Dict[str, str]:
+        if not keys:
+            return {}
+        try:
+            stored = await self.client.mget([self.prefix + key for key in keys])
+        except self.errors as e:
+            self._failed('MGET', e)
+            stored = [None] * len(keys)
+        values = {}
+        for key, item in zip(keys, stored):
+            value = self._record(self._decode(item))
+            if value is not None:
+                values[key] = value
+        return values
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        ttl = self.default_ttl if ttl is None else ttl
+        try:
+            await self.client.set(self.prefix + key, self._encode(value), ex=int(ttl) if ttl else None)
+        except self.errors as e:
+            self._failed('SET', e)
+            return
+        self.stats['writes'] += 1
+
+    async def delete(self, key: str) -> None:
+        try:
+            await self.client.delete(self.prefix + key)
+        except self.errors as e:
+            self._failed('DEL', e)
+
+    def keys(self) -> Iterator[str]:
+        try:
+            keys = [key.decode('utf-8') for key in self.sync_client.scan_iter(match=self.prefix + '*', count=1000)]
+        except self.errors as e:
+            self._failed('SCAN', e)
+            keys = []
+        return (key[len(self.prefix):] for key in keys)
+
+    def usage(self) -> Dict[str, int]:
+        # Unknown: DBSIZE counts every prefix in the database, and counting one prefix is a SCAN
+        return {}
+
+    def close(self) -> None:
+        self.sync_client.close()
+        # The async pool's sockets are closed when the process exits
+
+
+class KeySet:
+    """A set of strings kept beside the caches, e.g. the questions answered so far.
+
+    Loading it reads only its own members, never the cache's keyspace. This base
+    class keeps them in memory; add() skips members already known, so a member is
+    written to the store once per process.
+    """
+
+    def __init__(self):
+        self.known = set()
+
+    async def add(self, member: str) -> None:
+        if member not in self.known:
+            self.known.add(member)
+            await self._store(member)
+
+    async def _store(self, member: str) -> None:
+        pass
+
+    def members(self) -> List[str]:
+        """Every member; called once at startup, from a worker thread"""
+        self.known.update(self._load())
+        return list(self.known)
+
+    def _load(self) -> List[str]:
+        return []
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteKeySet(KeySet):
+    """Members in a one-column SQLite table"""
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS members (member TEXT PRIMARY KEY)")
+
+    async def _store(self, member: str) -> None:
+        await asyncio.to_thread(self._insert, member)
+
+    def _insert(self, member: str) -> None:
+        with self.lock:
+            self.conn.execute("INSERT OR IGNORE INTO members (member) VALUES (?)", (member,))
+
+    def _load(self) -> List[str]:
+        with self.lock:
+            return [member for (member,) in self.conn.execute("SELECT member FROM members")]
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
+
+
+class RedisKeySet(KeySet):
+    """Members in one Redis set (SADD/SMEMBERS), shared by every instance; errors are logged"""
+
+    def __init__(self, url: str, key: str, timeout: float = REDIS_TIMEOUT):
+        super().__init__()
+        import redis
+        import redis.asyncio
+        self.key = key
+        self.errors = (redis.RedisError, OSError)
+        self.client = redis.asyncio.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+        self.sync_client = redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+
+    async def _store(self, member: str) -> None:
+        try:
+            await self.client.sadd(self.key, member)
+        except self.errors as e:
+            # Retried the next time this member is added
+            self.known.discard(member)
+            logging.warning(f"Redis SADD failed: {type(e).__name__}: {str(e)}")
+
+    def _load(self) -> List[str]:
+        try:
+            return [member.decode('utf-8') for member in self.sync_client.smembers(self.key)]
+        except self.errors as e:
+            logging.warning(f"Redis SMEMBERS failed: {type(e).__name__}: {str(e)}")
+            return []
+
+    def close(self) -> None:
+        self.sync_client.close()
+
+
+def create_key_set(name: str, url: str = CACHE_URL, cache_dir: str = CACHE_DIR) -> KeySet:
+    """The key set `name`, stored wherever CACHE_URL puts the caches"""
+    scheme = urlparse(url).scheme if url else 'sqlite'
+    if scheme in ('redis', 'rediss', 'unix'):
+        return RedisKeySet(url, f"{CACHE_KEY_PREFIX}{name}")
+    if scheme == 'memory':
+        return KeySet()
+    if scheme == 'sqlite':
+        directory = urlparse(url).path if url else cache_dir
+        os.makedirs(directory, exist_ok=True)
+        return SQLiteKeySet(os.path.join(directory, f"{name}.db"))
+    raise ValueError(f"Unsupported cache URL: {url}")
+
+
+def create_cache_backend(name: str, url: str = CACHE_URL, cache_dir: str = CACHE_DIR,
+                         max_entries: int = 100_000, max_bytes: int = 256 * 1024 * 1024,
+                         default_ttl: Optional[float] = None, compress: bool = False) -> CacheBackend:
+    """The durable tier for cache `name`, chosen by URL.
+
+    - "" or "sqlite:///<dir>": <dir>/<name>.db, local to the instance (cache_dir by default)
+    - "redis://host:port/db" or "rediss://...": shared, keys prefixed "<CACHE_KEY_PREFIX><name>:"
+    - "memory://": in-process and lost on exit, for tests and benchmarks
+    """
+    scheme = urlparse(url).scheme if url else 'sqlite'
+    if scheme in ('redis', 'rediss', 'unix'):
+        return RedisCache(url, prefix=f"{CACHE_KEY_PREFIX}{name}:", default_ttl=default_ttl)
+    if scheme == 'memory':
+        return LRUCache(max_entries=max_entries, default_ttl=default_ttl)
+    if scheme == 'sqlite':
+        directory = urlparse(url).path if url else cache_dir
+        os.makedirs(directory, exist_ok=True)
+        return SQLiteCache(os.path.join(directory, f"{name}.db"), max_entries=max_entries,
+                           max_bytes=max_bytes, default_ttl=default_ttl, compress=compress)
+    raise ValueError(f"Unsupported cache URL: {url}")
@@ -1,8 +1,9 @@
 # server.py
 import os
-from flask import Flask
+from flask import Flask, Response
 from threading import Thread
-from bot import main
+from config import BOT_MODE, WARMUP_TIMEOUT
+from metrics import REGISTRY
 
 app = Flask(__name__)
 
@@ -12,8 +13,18 @@ def home():
 
 @app.route('/_ah/warmup')
 def warmup():
+    # Imported here so the server can answer health checks while the bot module loads
+    from bot import get_bot
+    try:
+        get_bot().warm_up().result(timeout=WARMUP_TIMEOUT)
+    except Exception as e:
+        return f'Warmup failed: {type(e).__name__}', 503
     return '', 200
 
+@app.route('/metrics')
+def metrics():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 def run():
     port = int(os.environ.get('PORT', 8080))
     app.run(host='0.0.0.0', port=port)
@@ -24,7 +35,10 @@ def keep_alive():
     server.start()
 
 if __name__ == "__main__":
-    # Start the Flask server in a separate thread
-    keep_alive()
+    # In webhook mode the bot serves these routes itself, on its own event loop
+    if BOT_MODE != 'webhook':
+        # Start the Flask server in a separate thread
+        keep_alive()
     # Run the bot
+    from bot import main
     main()
\ No newline at end of file
@@ -0,0 +1,39 @@
+# single_flight.py
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key onto one in-flight task.
+
+    The first caller for a key (the leader) starts the work; callers arriving while it
+    runs await the same task and get the same result or exception. Each caller awaits
+    through `asyncio.shield`, so one caller being cancelled (a user giving up, a stream
+    closed early) does not cancel the work the others are waiting on. If the work
+    itself is cancelled, every waiter sees CancelledError. The key is released as soon
+    as the task finishes, so failures are retried by the next caller.
+    """
+
+    def __init__(self):
+        self.inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {'calls': 0, 'coalesced': 0, 'errors': 0}
+
+    async def do(self, key: str, work: Callable[[], Awaitable[Any]]) -> Any:
+        task = self.inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(work())
+            self.inflight[key] = task
+            task.add_done_callback(lambda done: self._release(key, done))
+            self.stats['calls'] += 1
+        else:
+            self.stats['coalesced'] += 1
+        return await asyncio.shield(task)
+
+    def _release(self, key: str, task: asyncio.Future) -> None:
+        if self.inflight.get(key) is task:
+            del self.inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            self.stats['errors'] += 1
+
+    def __len__(self) -> int:
+        return len(self.inflight)
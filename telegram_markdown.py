@@ -0,0 +1,200 @@
+# telegram_markdown.py
+import re
+from typing import List, Optional, Tuple
+
+MESSAGE_LIMIT = 4096
+
+_ESCAPES = str.maketrans({char: "\\" + char for char in "_*[]()~`>#+-=|{}.!\\"})
+# Code spans, links and emphasis markers in one alternation; the text between matches
+# only needs escaping, which is done per run rather than per character
+_TOKEN_RE = re.compile(
+    r"(?P<code>`[^`\n]+`)"
+    r"|\[(?P<link_text>[^\]\n]+)\]\((?P<link_url>[^)\s]+)\)"
+    r"|(?P<marker>\*\*|__|\*|_)"
+)
+_HEADING_RE = re.compile(r"^#{1,6}\s+(.*?)\s*#*$")
+_BULLET_RE = re.compile(r"^[-*+•]\s+")
+_NUMBERED_RE = re.compile(r"^(\d+)[.)]\s+")
+_BLANK_LINES_RE = re.compile(r"\n\s*\n")
+
+# Source marker -> MarkdownV2 entity. Legacy Telegram Markdown treated *x* as bold, and
+# so did every answer this bot has sent, so single asterisks stay bold here.
+_ENTITY = {'**': '*', '__': '*', '*': '*', '_': '_'}
+
+
+def escape(text: str) -> str:
+    """Escape plain text for MarkdownV2"""
+    return text.translate(_ESCAPES)
+
+
+def utf16_len(text: str) -> int:
+    """Length as Telegram counts it"""
+    return len(text.encode('utf-16-le')) // 2
+
+
+def utf16_tail(text: str, limit: int) -> str:
+    """The end of `text`, at most `limit` UTF-16 units, never splitting a surrogate pair"""
+    encoded = text.encode('utf-16-le')
+    if len(encoded) <= 2 * limit:
+        return text
+    # A cut through a pair leaves a lone low surrogate, which 'ignore' drops
+    return encoded[len(encoded) - 2 * max(limit, 0):].decode('utf-16-le', 'ignore')
+
+
+def render_line(line: str) -> str:
+    """Render one line of model Markdown as MarkdownV2 with every entity balanced.
+
+    Bold and italic markers only open before a non-space and close after one, so
+    "2 * 3" and snake_case stay literal. Entities must nest; a marker that would
+    cross another entity, or an opener still unclosed at the end of the line, is
+    emitted as an escaped literal instead.
+    """
+    heading = _HEADING_RE.match(line)
+    if heading:
+        title = heading.group(1).replace('*', '').replace('_', ' ').strip()
+        return f"*{escape(title)}*" if title else ""
+
+    out: List[str] = []
+    numbered = _NUMBERED_RE.match(line)
+    bullet = _BULLET_RE.match(line)
+    if numbered:
+        out.append(f"{numbered.group(1)}\\. ")
+        line = line[numbered.end():]
+    elif bullet:
+        out.append("• ")
+        line = line[bullet.end():]
+
+    # (entity, source marker, index of its opener in `out`)
+    stack: List[Tuple[str, str, int]] = []
+    # Set right after an entity closes, so an immediate reopen continues it instead
+    just_closed: Optional[Tuple[str, str, int]] = None
+    position = 0
+    for match in _TOKEN_RE.finditer(line):
+        if match.start() > position:
+            out.append(escape(line[position:match.start()]))
+            just_closed = None
+        position = match.end()
+
+        kind = match.lastgroup
+        if kind != 'marker':
+            just_closed = None
+            if kind == 'code':
+                body = match.group('code')[1:-1].replace('\\', '\\\\').replace('`', '\\`')
+                out.append(f"`{body}`")
+            else:
+                url = match.group('link_url').replace('\\', '\\\\').replace(')', '\\)')
+                out.append(f"[{escape(match.group('link_text'))}]({url})")
+            continue
+
+        marker = match.group('marker')
+        entity = _ENTITY[marker]
+        before = line[match.start() - 1] if match.start() else ' '
+        after = line[position] if position < len(line) else ' '
+        can_open = not after.isspace() and not (entity == '_' and before.isalnum())
+        can_close = not before.isspace() and not (entity == '_' and after.isalnum())
+
+        if stack and stack[-1][1] == marker and can_close:
+            opener = stack.pop()
+            if len(out) - 1 == opener[2]:
+                # Nothing between the markers; Telegram rejects empty entities
+                out.pop()
+                just_closed = None
+            else:
+                out.append(entity)
+                just_closed = opener
+        elif can_open and just_closed is not None and just_closed[1] == marker:
+            # "*a**b*": closing then reopening the same entity is one entity
+            out.pop()
+            stack.append(just_closed)
+            just_closed = None
+        elif can_open and all(open_entity != entity for open_entity, _, _ in stack):
+            stack.append((entity, marker, len(out)))
+            out.append(entity)
+            just_closed = None
+        else:
+            out.append(escape(marker))
+            just_closed = None
+    if position < len(line):
+        out.append(escape(line[position:]))
+
+    for _, marker, index in stack:
+        out[index] = escape(marker)
+    return "".join(out)
+
+
+def render(text: str) -> str:
+    """Render a whole model answer: lines rendered independently, blank runs collapsed"""
+    lines = []
+    previous_blank = True
+    for line in text.replace('```', '').splitlines():
+        line = line.strip()
+        if not line:
+            if not previous_blank:
+                lines.append("")
+            previous_blank = True
+            continue
+        lines.append(render_line(line))
+        previous_blank = False
+    return "\n".join(lines).strip("\n")
+
+
+def _pieces(text: str, budget: int) -> List[Tuple[str, str]]:
+    """Rendered pieces no longer than `budget`, each with the separator that precedes it.
+
+    Paragraphs are kept whole where they fit, otherwise split into lines, and a single
+    over-long line into word runs. Every piece is rendered on its own, so splitting
+    can never leave an entity open across messages.
+    """
+    pieces = []
+    for paragraph in _BLANK_LINES_RE.split(text.replace('```', '').strip()):
+        rendered = render(paragraph)
+        if not rendered:
+            continue
+        if utf16_len(rendered) <= budget:
+            pieces.append(("\n\n", rendered))
+            continue
+        separator = "\n\n"
+        for line in paragraph.splitlines():
+            rendered = render_line(line.strip())
+            if not rendered:
+                continue
+            if utf16_len(rendered) <= budget:
+                pieces.append((separator, rendered))
+                separator = "\n"
+                continue
+            # Escaping at most doubles the length, so half the budget of source always fits
+            half = budget // 2
+            words = [word[i:i + half] for word in line.split() for i in range(0, len(word), half)]
+            run, run_length = [], 0
+            for word in words:
+                if run and run_length + len(word) + 1 > half:
+                    pieces.append((separator, render_line(" ".join(run))))
+                    separator, run, run_length = " ", [], 0
+                run.append(word)
+                run_length += len(word) + 1
+            if run:
+                pieces.append((separator, render_line(" ".join(run))))
+            separator = "\n"
+    return pieces
+
+
+def render_messages(text: str, header: str = "", limit: int = MESSAGE_LIMIT) -> List[str]:
+    """Render `text` and split it into messages of at most `limit` characters.
+
+    `header` must already be MarkdownV2 and starts the first message. Splits fall on
+    paragraph boundaries when possible, then lines, then words.
+    """
+    header_length = utf16_len(header)
+    messages: List[str] = []
+    current, length = header, header_length
+    for separator, piece in _pieces(text, limit - header_length if header_length < limit // 2 else limit):
+        piece_length = utf16_len(piece)
+        joined = separator if current and current != header else ""
+        if current and length + utf16_len(joined) + piece_length > limit:
+            messages.append(current)
+            current, length, joined = "", 0, ""
+        current += joined + piece
+        length += utf16_len(joined) + piece_length
+    if current:
+        messages.append(current)
+    return messages
@@ -0,0 +1,186 @@
+# telegram_outbox.py
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from telegram import Bot, Message
+from telegram.constants import ParseMode
+from telegram.error import BadRequest, RetryAfter
+
+from config import TELEGRAM_GLOBAL_RATE, TELEGRAM_CHAT_INTERVAL, TELEGRAM_GROUP_INTERVAL, PROGRESS_EDIT_INTERVAL
+from llm_scheduler import TokenBucket
+from metrics import REGISTRY, span
+
+RETRY_AFTER_TOTAL = REGISTRY.counter(
+    "telegram_retry_after_total", "Telegram calls rejected with RetryAfter", ("method",)
+)
+
+MAX_TRACKED_CHATS = 10000
+
+
+class TelegramOutbox:
+    """Every outgoing send, edit and delete for process_question goes through here.
+
+    Calls to one chat are serialised and spaced by the chat interval (longer for
+    groups); all chats share a global messages-per-second bucket. A RetryAfter from
+    Telegram pauses that chat for the requested time and the call is retried.
+    Per-chat send latency is kept for the most recently active chats.
+    """
+
+    def __init__(self, global_rate: float = TELEGRAM_GLOBAL_RATE, chat_interval: float = TELEGRAM_CHAT_INTERVAL,
+                 group_interval: float = TELEGRAM_GROUP_INTERVAL, max_retries: int = 3):
+        self.global_bucket = TokenBucket(global_rate * 60, capacity=global_rate)
+        self.chat_interval = chat_interval
+        self.group_interval = group_interval
+        self.max_retries = max_retries
+        self.chats: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self.stats = {
+            'sent': 0, 'edits': 0, 'edits_skipped': 0, 'edits_coalesced': 0,
+            'deletes': 0, 'retry_after': 0, 'errors': 0
+        }
+
+    def _chat(self, chat_id: int) -> Dict[str, Any]:
+        state = self.chats.get(chat_id)
+        if state is None:
+            state = {'lock': asyncio.Lock(), 'next_at': 0.0, 'count': 0, 'latency_total': 0.0, 'latency_max': 0.0}
+            self.chats[chat_id] = state
+            if len(self.chats) > MAX_TRACKED_CHATS:
+                oldest_id, oldest = next(iter(self.chats.items()))
+                if not oldest['lock'].locked():
+                    del self.chats[oldest_id]
+        self.chats.move_to_end(chat_id)
+        return state
+
+    async def _wait_turn(self, chat_id: int, state: Dict[str, Any]) -> None:
+        delay = state['next_at'] - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        while True:
+            delay = self.global_bucket.wait_time(1, time.monotonic())
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        self.global_bucket.take(1)
+        # Negative ids are groups and channels, which Telegram limits more tightly
+        interval = self.group_interval if chat_id < 0 else self.chat_interval
+        state['next_at'] = time.monotonic() + interval
+
+    async def _call(self, chat_id: int, method: str, api_call: Callable[[], Awaitable[Any]]) -> Any:
+        state = self._chat(chat_id)
+        async with state['lock']:
+            for attempt in range(self.max_retries + 1):
+                with span('telegram_wait'):
+                    await self._wait_turn(chat_id, state)
+                started = time.monotonic()
+                try:
+                    with span('telegram_call', method=method):
+                        result = await api_call()
+                except RetryAfter as e:
+                    self.stats['retry_after'] += 1
+                    RETRY_AFTER_TOTAL.inc(method=method)
+                    retry_after = e.retry_after
+                    if isinstance(retry_after, timedelta):
+                        retry_after = retry_after.total_seconds()
+                    logging.warning(f"Telegram flood limit for chat {chat_id}, retrying in {retry_after}s")
+                    state['next_at'] = time.monotonic() + float(retry_after)
+                    if attempt == self.max_retries:
+                        self.stats['errors'] += 1
+                        raise
+                    continue
+                elapsed = time.monotonic() - started
+                state['count'] += 1
+                state['latency_total'] += elapsed
+                state['latency_max'] = max(state['latency_max'], elapsed)
+                return result
+
+    async def send_message(self, bot: Bot, chat_id: int, text: str, **kwargs) -> Message:
+        """Send a message; model output must already be rendered by telegram_markdown"""
+        message = await self._call(chat_id, 'send', lambda: bot.send_message(chat_id=chat_id, text=text, **kwargs))
+        self.stats['sent'] += 1
+        return message
+
+    async def edit_message_text(self, message: Message, text: str, **kwargs) -> None:
+        try:
+            await self._call(message.chat_id, 'edit', lambda: message.edit_text(text, **kwargs))
+            self.stats['edits'] += 1
+        except BadRequest as e:
+            # "Message is not modified" and edits to deleted messages are harmless
+            logging.debug(f"Skipped edit in chat {message.chat_id}: {str(e)}")
+
+    async def delete_message(self, message: Message) -> None:
+        try:
+            await self._call(message.chat_id, 'delete', message.delete)
+            self.stats['deletes'] += 1
+        except BadRequest as e:
+            logging.debug(f"Could not delete message in chat {message.chat_id}: {str(e)}")
+
+    def progress(self, message: Message, interval: float = PROGRESS_EDIT_INTERVAL,
+                 parse_mode: Optional[str] = ParseMode.MARKDOWN) -> "ProgressEditor":
+        return ProgressEditor(self, message, interval, parse_mode)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Global counters plus send latency for each recently active chat"""
+        return {
+            'totals': dict(self.stats),
+            'chats': {
+                chat_id: {
+                    'calls': state['count'],
+                    'latency_avg': state['latency_total'] / state['count'] if state['count'] else 0.0,
+                    'latency_max': state['latency_max']
+                }
+                for chat_id, state in self.chats.items()
+            }
+        }
+
+
+class ProgressEditor:
+    """Debounced edits of one progress message.
+
+    update() only records the latest text. At most one edit is sent per `interval`,
+    always with the newest text, and edits that would not change the message are
+    dropped.
+    """
+
+    def __init__(self, outbox: TelegramOutbox, message: Message, interval: float, parse_mode: Optional[str]):
+        self.outbox = outbox
+        self.message = message
+        self.interval = interval
+        self.parse_mode = parse_mode
+        self.last_text = message.text
+        self.last_edit_at = time.monotonic()  # the message itself was just sent
+        self.pending: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def update(self, text: str) -> None:
+        if self.pending is not None:
+            self.outbox.stats['edits_coalesced'] += 1
+        self.pending = text
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        # Loops: update() calls made while an edit is in flight find this task still running
+        while self.pending is not None:
+            delay = self.last_edit_at + self.interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            text, self.pending = self.pending, None
+            if text is None or text == self.last_text:
+                self.outbox.stats['edits_skipped'] += 1
+                continue
+            self.last_text = text
+            self.last_edit_at = time.monotonic()
+            await self.outbox.edit_message_text(self.message, text, parse_mode=self.parse_mode)
+
+    async def close(self) -> None:
+        """Drop any edit still waiting; the caller is about to replace or delete the message"""
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        self.pending = None
@@ -0,0 +1,24 @@
+# tests/test_answer_synthesis.py
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from answer_synthesis import merge_answers
+
+
+def test_statements_of_opposite_polarity_are_not_merged():
+    statements = merge_answers("Are utility tokens regulated?", [
+        "Utility tokens are regulated by the FCA in most cases.",
+        "Utility tokens aren't regulated by the FCA in most cases.",
+    ])
+    assert len(statements) == 2
+
+
+def test_repeated_statements_are_merged():
+    statements = merge_answers("Are utility tokens regulated?", [
+        "Utility tokens are not regulated by the FCA in most cases.",
+        "In most cases, utility tokens are not regulated by the FCA.",
+    ])
+    assert len(statements) == 1
+    assert statements[0].support == 2
@@ -0,0 +1,40 @@
+# tests/test_chunking.py
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chunking import ChapterChunking
+
+
+def _chapters(tmp_path):
+    path = tmp_path / "chapters.json"
+    path.write_text(json.dumps({'chapters': [
+        {'title': "Design", 'pageRange': "3"},
+        {'title': "Tokens", 'pageRange': "5"},
+        {'title': "Appendix", 'pageRange': "1-2"},
+    ]}))
+    return str(path)
+
+
+def test_chapters_start_at_their_headings(tmp_path):
+    pages = [
+        "CONTENTS\nCHAPTER01\nDesign-page3\nCHAPTER02\nTokens-page5",
+        "Introduction",
+        "Introduction, continued",
+        "end of the introduction.\nDESIGNCHAPTER01Tokenomics",
+        "See chapter 2 of the FCA handbook.",
+        "Design, continued",
+        "TOKENSCHAPTER02\nUtility tokens",
+    ]
+    assert ChapterChunking(_chapters(tmp_path)).chunk(pages) == [
+        ("Introduction", 0, 3), ("Design", 3, 6), ("Tokens", 6, 7),
+    ]
+
+
+def test_page_ranges_are_used_without_headings(tmp_path):
+    pages = ["page"] * 8
+    assert ChapterChunking(_chapters(tmp_path), page_offset=1).chunk(pages) == [
+        ("Introduction", 0, 3), ("Design", 3, 5), ("Tokens", 5, 8),
+    ]
@@ -0,0 +1,72 @@
+# tests/test_page_index.py
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from page_index import PageIndex
+
+# Spaces mostly stripped, as pypdf extracts the guide
+PAGES = [
+    "CONTENTS\nIntroduction-page3\nTokenomics-page5",
+    "Tokenomicsdesignsthesupplyanddistributionofaprojectstoken.",
+    "AdecentralisedautonomousorganisationorDAOisgovernedbyitstokenholders.",
+    "ManyDAOsadoptalegalwrappersuchasanLLCtolimittheirmembersliability.",
+    "StakingrewardsaretaxableasincomeandHMRCexpectsrecordsofeachdisposal.",
+    "VATisnotchargedonsalesofcryptoassets,whicharenotgoodsorservices.",
+    "ThefinancialpromotionregimerequirescryptoassetpromotionstobeapprovedbyanFCAauthorisedfirm.",
+    "FinfluencerspromotingcryptoassetswithoutapprovalcommitacriminaloffenceunderFSMA.",
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return PageIndex(PAGES)
+
+
+@pytest.mark.parametrize("question, page", [
+    ("How is token supply and distribution designed?", 1),
+    ("Do DAOs need a legal wrapper?", 3),
+    ("Are staking rewards taxable?", 4),
+    ("Is VAT charged on crypto sales?", 5),
+    ("Can finfluencers promote crypto?", 7),
+])
+def test_best_page(index, question, page):
+    assert index.score(question)[0][0] == page
+
+
+def test_scores_are_best_first(index):
+    scores = [score for _, score in index.score("financial promotion of cryptoassets")]
+    assert scores and scores == sorted(scores, reverse=True)
+    assert {page for page, _ in index.score("financial promotion of cryptoassets")[:2]} == {6, 7}
+
+
+def test_no_match(index):
+    assert index.score("zzzz qqqq") == []
+    assert index.top_ranges("zzzz qqqq", k=3, window=1) == []
+
+
+def test_stopwords_only(index):
+    assert index.query_terms("What is it?") == []
+
+
+def test_to_ranges_merges_adjacent_pages():
+    assert PageIndex.to_ranges([7, 3, 4, 5, 9, 4]) == [(3, 6), (7, 8), (9, 10)]
+    assert PageIndex.to_ranges([]) == []
+
+
+@pytest.mark.parametrize("window, ranges", [
+    (0, [(4, 5)]),
+    (1, [(3, 6)]),
+    (5, [(0, 8)]),  # clipped to the document
+])
+def test_top_ranges_window(index, window, ranges):
+    assert index.top_ranges("staking rewards taxable", k=1, window=window) == ranges
+
+
+def test_window_merges_neighbouring_hits(index):
+    # Pages 6 and 7 both match; a window of 1 joins them with their neighbours into one range
+    assert index.top_pages("finfluencers financial promotion", k=2) == [6, 7]
+    assert index.top_ranges("finfluencers financial promotion", k=2, window=1) == [(5, 8)]
@@ -0,0 +1,38 @@
+# tests/test_question_matcher.py
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from question_matcher import NearDuplicateIndex, canonicalize
+
+
+@pytest.mark.parametrize("question, opposite", [
+    ("Is a DAO a security?", "Is a DAO not a security?"),
+    ("Must I register tokens with the FCA before launch?", "Must I register tokens with the FCA after launch?"),
+    ("Is staking taxable?", "Is staking not taxable?"),
+    ("Are stablecoins regulated?", "Are no stablecoins regulated?"),
+    ("Can a token be issued for the company?", "Can a token be issued against the company?"),
+])
+def test_opposite_questions_get_different_keys(question, opposite):
+    assert canonicalize(question) != canonicalize(opposite)
+
+
+@pytest.mark.parametrize("question, rephrased", [
+    ("What is a DAO?", "dao - what is it"),
+    ("Is staking taxable?", "Staking: is it taxable"),
+    ("Isn't a DAO a security?", "Is a DAO not a security?"),
+    ("Isn’t a DAO a security?", "Is a DAO not a security?"),
+    ("Can't I sell tokens?", "Can I not sell tokens?"),
+])
+def test_rephrased_questions_share_a_key(question, rephrased):
+    assert canonicalize(question) == canonicalize(rephrased)
+
+
+def test_near_duplicates_keep_polarity():
+    index = NearDuplicateIndex(threshold=0.5)
+    index.add(canonicalize("Is a DAO a security under UK law?"))
+    assert index.lookup(canonicalize("Is a DAO a security under the UK laws?")) is not None
+    assert index.lookup(canonicalize("Is a DAO not a security under UK law?")) is None
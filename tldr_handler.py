@@ -1,29 +1,177 @@
 # tldr_handler.py
+import asyncio
+import hashlib
 import logging
-import openai
-from typing import Optional
-from config import OPENAI_API_KEY
+import time
+from typing import Dict, Optional
+from config import (
+    TLDR_CACHE_MEMORY_ENTRIES, TLDR_CACHE_TTL, TLDR_ENGINE, TLDR_LATENCY_BUDGET,
+    TLDR_SPECULATIVE, TLDR_SPECULATIVE_MAX_PENDING, TLDR_SPECULATIVE_TOKENS_PER_MINUTE
+)
+from extractive_summarizer import summarize
+from llm_scheduler import BACKGROUND, INTERACTIVE, LLMScheduler, TokenBucket, create_scheduler
+from metrics import span
+from openai_client import ChatClient
+from response_cache import LRUCache, TieredCache, create_cache_backend
+from single_flight import SingleFlight
+
+TLDR_MODEL = "gpt-3.5-turbo"
+MAX_TLDR_TOKENS = 150
 
 class TLDRHandler:
-    def __init__(self):
-        self.api_key = OPENAI_API_KEY
-        openai.api_key = self.api_key
-        
-    async def generate_tldr(self, content: str) -> Optional[str]:
-        """Generate a TL;DR version of the given content using OpenAI."""
+    """TL;DR summaries, cached by a hash of the text they summarise.
+
+    The engine is either "remote" (OpenAI) or "local" (extractive TextRank, no
+    network). With the remote engine, a click that waits longer than the latency
+    budget, or a failed call, is answered by the local summarizer instead; a slow
+    remote call keeps running and its result is cached for the next click.
+
+    speculate() may generate a TL;DR in the background as soon as an answer is sent,
+    at background priority in the scheduler. Speculation is bounded by a number of
+    pending tasks and a tokens-per-minute budget, is skipped while interactive OpenAI
+    calls are waiting, and is cancelled if the user asks before it has started.
+    """
+
+    def __init__(self, scheduler: Optional[LLMScheduler] = None, cache_dir: str = ".cache",
+                 speculative: bool = TLDR_SPECULATIVE, engine: str = TLDR_ENGINE,
+                 latency_budget: float = TLDR_LATENCY_BUDGET, client: Optional[ChatClient] = None):
+        self.client = client or ChatClient()
+        self.scheduler = scheduler or create_scheduler()
+        ttl = TLDR_CACHE_TTL or None
+        self.cache = TieredCache(
+            LRUCache(max_entries=TLDR_CACHE_MEMORY_ENTRIES, default_ttl=ttl),
+            create_cache_backend("tldr_cache", cache_dir=cache_dir, default_ttl=ttl, compress=True)
+        )
+        self.inflight = SingleFlight()
+        if engine not in ('remote', 'local'):
+            raise ValueError(f"Unknown TL;DR engine: {engine}")
+        self.engine = engine
+        self.latency_budget = latency_budget
+        self.speculative = speculative
+        self.speculation_budget = TokenBucket(TLDR_SPECULATIVE_TOKENS_PER_MINUTE)
+        self.speculations: Dict[str, asyncio.Task] = {}
+        self.speculations_started = set()
+        self.stats = {
+            'speculated': 0, 'speculation_skipped': 0, 'speculation_cancelled': 0,
+            'speculation_used': 0, 'local': 0, 'local_after_timeout': 0, 'local_after_error': 0
+        }
+
+    @staticmethod
+    def _cache_key(content: str) -> str:
+        return f"{TLDR_MODEL}:{hashlib.sha256(content.encode('utf-8')).hexdigest()}"
+
+    @staticmethod
+    def _estimate_tokens(content: str) -> int:
+        return len(content) // 4 + MAX_TLDR_TOKENS
+
+    async def generate_tldr(self, content: str, user_id: Optional[int] = None,
+                            priority: int = INTERACTIVE) -> Optional[str]:
+        """Generate a TL;DR version of the given content."""
+        with span('tldr', source='remote') as labels:
+            if self.engine == 'local':
+                self.stats['local'] += 1
+                labels['source'] = 'local'
+                return self._local_tldr(content)
+
+            key = self._cache_key(content)
+            cached = await self.cache.get(key)
+            if cached is not None:
+                labels['source'] = 'cache'
+                return cached
+
+            speculation = self.speculations.get(key)
+            if speculation is not None and key in self.speculations_started:
+                # Already running; waiting for it beats starting over
+                self.stats['speculation_used'] += 1
+                remote = asyncio.shield(speculation)
+            else:
+                if speculation is not None:
+                    # Still queued at background priority; the user should not wait behind it
+                    speculation.cancel()
+                remote = self.inflight.do(key, lambda: self._summarize(key, content, user_id, priority))
+            try:
+                # Both paths are shielded, so a timeout only stops the waiting, not the call
+                tldr = await asyncio.wait_for(remote, self.latency_budget or None)
+            except asyncio.TimeoutError:
+                logging.warning(f"TL;DR exceeded {self.latency_budget}s; using the local summary")
+                self.stats['local_after_timeout'] += 1
+                labels['source'] = 'local_after_timeout'
+                return self._local_tldr(content)
+            if tldr is None:
+                self.stats['local_after_error'] += 1
+                labels['source'] = 'local_after_error'
+                return self._local_tldr(content)
+            return tldr
+
+    @staticmethod
+    def _local_tldr(content: str) -> Optional[str]:
+        summary = summarize(content)
+        return "TL;DR:\n" + summary if summary else None
+
+    async def _summarize(self, key: str, content: str, user_id: Optional[int], priority: int) -> Optional[str]:
         try:
-            response = await openai.ChatCompletion.acreate(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "Create a brief TL;DR summary of the following text, focusing on the key points and actionable insights:"},
-                    {"role": "user", "content": content}
-                ],
-                max_tokens=150,
-                temperature=0.7
-            )
-            
-            return "TL;DR:\n" + response.choices[0].message.content.strip()
-            
+            async with self.scheduler.slot('openai', user_id, priority, self._estimate_tokens(content)):
+                if priority != INTERACTIVE:
+                    self.speculations_started.add(key)
+                with span('openai_call', model=TLDR_MODEL):
+                    response = await self.client.complete(
+                        model=TLDR_MODEL,
+                        messages=[
+                            {"role": "system", "content": "Create a brief TL;DR summary of the following text, focusing on the key points and actionable insights:"},
+                            {"role": "user", "content": content}
+                        ],
+                        max_tokens=MAX_TLDR_TOKENS,
+                        temperature=0.7
+                    )
+
+            tldr = "TL;DR:\n" + response.choices[0].message.content.strip()
+            await self.cache.set(key, tldr)
+            return tldr
+
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             logging.error(f"Error generating TL;DR: {str(e)}")
-            return None
\ No newline at end of file
+            return None
+
+    def speculate(self, content: str, user_id: Optional[int] = None) -> None:
+        """Start generating a TL;DR in the background, if enabled and within budget"""
+        if not self.speculative or self.engine == 'local':
+            return
+        key = self._cache_key(content)
+        if key in self.speculations or key in self.inflight.inflight:
+            return
+        tokens = self._estimate_tokens(content)
+        interactive_waiting = self.scheduler.providers['openai'].depth().get(INTERACTIVE, 0)
+        if (len(self.speculations) >= TLDR_SPECULATIVE_MAX_PENDING or interactive_waiting
+                or self.speculation_budget.wait_time(tokens, time.monotonic()) > 0):
+            self.stats['speculation_skipped'] += 1
+            return
+        self.speculation_budget.take(tokens)
+        self.stats['speculated'] += 1
+        task = asyncio.create_task(self._speculate(key, content, user_id))
+        self.speculations[key] = task
+        task.add_done_callback(lambda done: self._finish_speculation(key, done))
+
+    async def _speculate(self, key: str, content: str, user_id: Optional[int]) -> Optional[str]:
+        cached = await self.cache.get(key)
+        if cached is not None:
+            return cached
+        return await self._summarize(key, content, user_id, BACKGROUND)
+
+    def _finish_speculation(self, key: str, task: asyncio.Task) -> None:
+        if self.speculations.get(key) is task:
+            del self.speculations[key]
+        self.speculations_started.discard(key)
+        if task.cancelled():
+            self.stats['speculation_cancelled'] += 1
+
+    async def close(self) -> None:
+        """Cancel outstanding speculation; call on shutdown"""
+        tasks = list(self.speculations.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        logging.info(f"TL;DR stats: {self.stats}, cache: {self.cache.metrics()}, client: {self.client.metrics()}")
+        self.cache.close()
+        await self.client.close()
@@ -0,0 +1,119 @@
+# webhook_server.py
+import asyncio
+import hashlib
+import hmac
+import logging
+import signal
+from typing import Any, Awaitable, Callable, Dict
+
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application
+
+from config import (
+    PORT, TELEGRAM_TOKEN, WARMUP_TIMEOUT, WEBHOOK_MAX_CONNECTIONS, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_URL
+)
+from metrics import REGISTRY
+
+# Receives each verified update payload; must return quickly, since Telegram waits for the reply
+SubmitUpdate = Callable[[Dict[str, Any]], Awaitable[None]]
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+WEBHOOK_REQUESTS = REGISTRY.counter("webhook_requests_total", "Webhook deliveries by result", ("result",))
+
+
+def webhook_secret(token: str = TELEGRAM_TOKEN or "") -> str:
+    """WEBHOOK_SECRET, or one derived from the bot token so every instance agrees on it"""
+    # Telegram allows 1-256 characters from A-Z, a-z, 0-9, _ and -
+    return WEBHOOK_SECRET or hashlib.sha256(f"webhook:{token}".encode()).hexdigest()
+
+
+def create_app(bot, submit: SubmitUpdate, secret: str, path: str = WEBHOOK_PATH) -> web.Application:
+    """Routes for updates, health, warmup and metrics, all served on the bot's event loop.
+
+    An update is acknowledged as soon as it is queued. Telegram retries deliveries
+    that are not answered in time, so handling the update in the request would
+    only duplicate slow questions.
+    """
+    expected = secret.encode()
+
+    async def receive_update(request: web.Request) -> web.Response:
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, "").encode(), expected):
+            WEBHOOK_REQUESTS.inc(result='forbidden')
+            return web.Response(status=403)
+        try:
+            payload = await request.json()
+        except (ValueError, UnicodeDecodeError):
+            WEBHOOK_REQUESTS.inc(result='bad_request')
+            return web.Response(status=400)
+        await submit(payload)
+        WEBHOOK_REQUESTS.inc(result='accepted')
+        return web.Response()
+
+    async def home(request: web.Request) -> web.Response:
+        return web.Response(text='Bot is running!')
+
+    async def warmup(request: web.Request) -> web.Response:
+        try:
+            await asyncio.wait_for(asyncio.wrap_future(bot.warm_up()), WARMUP_TIMEOUT)
+        except Exception as e:
+            return web.Response(status=503, text=f'Warmup failed: {type(e).__name__}')
+        return web.Response()
+
+    async def metrics(request: web.Request) -> web.Response:
+        # Rendering takes the registry lock, which is only ever held briefly
+        return web.Response(body=REGISTRY.render().encode(),
+                            headers={'Content-Type': 'text/plain; version=0.0.4'})
+
+    app = web.Application()
+    app.router.add_post(path, receive_update)
+    app.router.add_get('/', home)
+    app.router.add_get('/_ah/warmup', warmup)
+    app.router.add_get('/metrics', metrics)
+    return app
+
+
+async def serve_webhook(bot, application: Application, host: str = '0.0.0.0', port: int = PORT) -> None:
+    """Run the application behind the web server until SIGTERM/SIGINT"""
+    secret = webhook_secret()
+
+    async def submit(payload: Dict[str, Any]) -> None:
+        await application.update_queue.put(Update.de_json(payload, application.bot))
+
+    runner = web.AppRunner(create_app(bot, submit, secret), access_log=None)
+    await runner.setup()
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stopping.set)
+
+    # Listen first, so health checks pass while the application connects
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    logging.info(f"Webhook server listening on {host}:{port}{WEBHOOK_PATH}")
+    try:
+        await application.initialize()
+        await application.start()
+        if WEBHOOK_URL:
+            await application.bot.set_webhook(
+                url=WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH,
+                secret_token=secret,
+                allowed_updates=Update.ALL_TYPES,
+                max_connections=WEBHOOK_MAX_CONNECTIONS
+            )
+            logging.info(f"Webhook registered at {WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}")
+        logging.info("Bot is ready to accept connections")
+        await stopping.wait()
+    finally:
+        # Stop taking updates, finish queued ones, then flush the bot's state
+        await runner.cleanup()
+        if application.running:
+            await application.stop()
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+
+
+def run_webhook(bot, application: Application) -> None:
+    asyncio.run(serve_webhook(bot, application))